@@ -0,0 +1,140 @@
+"""
+Масштабирование обработки webhook на несколько процессов.
+
+Для каждого количества процессов запускает main.py с BOT_WORKERS=N в режиме
+webhook (при N > 1 - маршрутизатор и N рабочих процессов), отправляет пачку
+обновлений /start от разных пользователей и измеряет, сколько обновлений
+в секунду обработано (каждое отправляет одно сообщение в заглушку Bot API).
+
+Рост пропускной способности ограничен количеством ядер процессора и базой
+данных: для честного замера используйте PostgreSQL (--database-url), SQLite
+подходит только для проверки работоспособности.
+
+Запуск из корня репозитория:
+    python benchmarks/cluster_scaling.py --workers 1,2,4 --updates 4000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientError, ClientSession
+
+from fake_bot_api import FakeBotAPI
+from webhook_load import make_update
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET = "scaling-test-secret"
+WEBHOOK_PATH = "/telegram/webhook"
+
+
+def start_bot(workers: int, args, api_url: str, database_url: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        BOT_WORKERS=str(workers),
+        BOT_MODE="webhook",
+        WEBHOOK_SECRET=SECRET,
+        WEBHOOK_PATH=WEBHOOK_PATH,
+        WEBAPP_HOST="127.0.0.1",
+        WEBAPP_PORT=str(args.port),
+        WORKER_BASE_PORT=str(args.port + 1),
+        TELEGRAM_BOT_TOKEN="123456:SCALING",
+        TELEGRAM_API_URL=api_url,
+        DATABASE_URL=database_url,
+        LOG_LEVEL="WARNING"
+    )
+    env.pop("WEBHOOK_BASE_URL", None)
+    return subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "main.py")],
+        env=env,
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(http: ClientSession, url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Бот завершился при запуске")
+        try:
+            async with http.get(f"{url}/healthz") as response:
+                if response.status == 200:
+                    return
+        except ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Бот не запустился")
+
+
+async def measure(workers: int, args, fake_api: FakeBotAPI, api_url: str, database_url: str) -> float:
+    process = start_bot(workers, args, api_url, database_url)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        async with ClientSession() as http:
+            await wait_ready(http, base_url, process)
+            # Дать рабочим процессам завершить стартовые запросы к Bot API
+            await asyncio.sleep(1)
+
+            headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+            semaphore = asyncio.Semaphore(args.concurrency)
+            baseline = fake_api.calls["sendmessage"]
+
+            async def send(i: int):
+                async with semaphore:
+                    update = make_update(workers * 10_000_000 + i, 100000 + i % args.users)
+                    async with http.post(f"{base_url}{WEBHOOK_PATH}", json=update, headers=headers) as response:
+                        await response.read()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(send(i) for i in range(1, args.updates + 1)))
+            while fake_api.calls["sendmessage"] - baseline < args.updates:
+                if time.perf_counter() - started > args.timeout:
+                    break
+                await asyncio.sleep(0.02)
+            elapsed = time.perf_counter() - started
+            return (fake_api.calls["sendmessage"] - baseline) / elapsed
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+
+async def run(args):
+    fake_api = FakeBotAPI(latency=args.api_latency)
+    api_url = await fake_api.start(port=args.api_port)
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/scaling.db"
+
+    print(f"Ядер процессора: {os.cpu_count()}, база данных: {database_url.split('://')[0]}")
+    print(f"Обновлений: {args.updates}, пользователей: {args.users}, параллельно: {args.concurrency}")
+    print(f"{'процессов':>10} {'обновл./с':>10} {'ускорение':>10} {'эффективность':>14}")
+
+    baseline = None
+    for workers in [int(value) for value in args.workers.split(",")]:
+        throughput = await measure(workers, args, fake_api, api_url, database_url)
+        baseline = baseline or throughput
+        speedup = throughput / baseline
+        print(f"{workers:>10} {throughput:>10.0f} {speedup:>9.2f}x {speedup / workers:>13.0%}")
+
+    await fake_api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Количества процессов через запятую")
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8190)
+    parser.add_argument("--api-port", type=int, default=8180)
+    parser.add_argument("--api-latency", type=float, default=0.02, help="Задержка ответа заглушки Bot API (с)")
+    parser.add_argument("--database-url", help="URL общей базы данных (по умолчанию временный SQLite)")
+    parser.add_argument("--timeout", type=float, default=300)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
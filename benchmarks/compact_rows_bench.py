@@ -0,0 +1,162 @@
+"""
+Размер таблиц и скорость поиска до и после компактного формата строк (миграция 3).
+
+Создает базу SQLite в старом формате (ID пользователей, номер и статус -
+строки), заполняет ее, измеряет размер таблиц и индексов и время поиска
+номера по самому номеру и по ID пользователя. Затем применяет миграции
+(ID - BIGINT, номер - BIGINT, статус - SMALLINT), сжимает базу (VACUUM)
+и повторяет измерения.
+
+Запуск из корня репозитория:
+    python benchmarks/compact_rows_bench.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+NUMBERS_PER_USER = 10
+INSERT_BATCH_SIZE = 20000
+STATUSES = ["waiting", "processed", "rejected", "failed", "pending"]
+
+# Схема до миграции 3, как ее создавал create_all
+LEGACY_SCHEMA = """
+CREATE TABLE users (id VARCHAR(50) NOT NULL PRIMARY KEY, username VARCHAR(100), first_name VARCHAR(100),
+    last_name VARCHAR(100), created_at DATETIME, updated_at DATETIME);
+CREATE TABLE phone_numbers (id INTEGER NOT NULL PRIMARY KEY, user_id VARCHAR(50) NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    phone_number VARCHAR(20) NOT NULL, phone_reversed VARCHAR(20), status VARCHAR(50), created_at DATETIME,
+    updated_at DATETIME, note TEXT);
+CREATE TABLE phone_details (id INTEGER NOT NULL PRIMARY KEY, phone_number_id INTEGER NOT NULL REFERENCES phone_numbers (id) ON DELETE CASCADE,
+    processed_at DATETIME, processor_id VARCHAR(50), code_sent BOOLEAN, code_accepted BOOLEAN);
+CREATE TABLE admins (id VARCHAR(50) NOT NULL PRIMARY KEY, is_main_admin BOOLEAN, created_at DATETIME);
+CREATE INDEX ix_users_username_lower ON users (lower(username));
+CREATE INDEX ix_phone_numbers_user_id ON phone_numbers (user_id);
+CREATE INDEX ix_phone_numbers_phone_number ON phone_numbers (phone_number);
+CREATE INDEX ix_phone_numbers_phone_reversed ON phone_numbers (phone_reversed);
+CREATE UNIQUE INDEX uq_phone_numbers_active_phone ON phone_numbers (phone_number)
+    WHERE status NOT IN ('processed', 'rejected', 'failed', 'canceled', 'expired');
+CREATE TABLE schema_migrations (version INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at DATETIME);
+INSERT INTO schema_migrations (version, name) VALUES (1, 'phone_search_indexes'), (2, 'unique_active_numbers');
+"""
+
+
+def fill(path: str, rows: int, seed: int) -> list:
+    """Заполняет базу старого формата и возвращает номера"""
+    rng = random.Random(seed)
+    users = max(rows // NUMBERS_PER_USER, 1)
+    phones = list({f"+7{rng.randrange(10 ** 10):010d}" for _ in range(rows)})
+    now = "2024-01-01 00:00:00.000000"
+
+    connection = sqlite3.connect(path)
+    connection.executescript(LEGACY_SCHEMA)
+    connection.executemany(
+        "INSERT INTO users (id, username, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        ((str(5000000000 + user_id), f"user{user_id}", now, now) for user_id in range(users))
+    )
+    for start in range(0, len(phones), INSERT_BATCH_SIZE):
+        connection.executemany(
+            "INSERT INTO phone_numbers (id, user_id, phone_number, phone_reversed, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (index + 1, str(5000000000 + index % users), phones[index], phones[index][:0:-1],
+                 "waiting" if index % 2 else STATUSES[index % len(STATUSES)], now, now)
+                for index in range(start, min(start + INSERT_BATCH_SIZE, len(phones)))
+            ]
+        )
+        connection.executemany(
+            "INSERT INTO phone_details (phone_number_id, code_sent) VALUES (?, 0)",
+            [(index + 1,) for index in range(start, min(start + INSERT_BATCH_SIZE, len(phones)))]
+        )
+    connection.commit()
+    connection.close()
+    return phones
+
+
+def sizes(path: str) -> dict:
+    """Размер таблиц phone_numbers, users и их индексов в байтах"""
+    connection = sqlite3.connect(path)
+    try:
+        tables = connection.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ('phone_numbers', 'users') GROUP BY name"
+        ).fetchall()
+        indexes = connection.execute(
+            "SELECT tbl_name, SUM(pgsize) FROM dbstat JOIN sqlite_master ON dbstat.name = sqlite_master.name "
+            "WHERE sqlite_master.type = 'index' AND tbl_name IN ('phone_numbers', 'users') GROUP BY tbl_name"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # SQLite собран без dbstat: только общий размер файла
+        return {"файл": os.path.getsize(path)}
+    finally:
+        connection.close()
+    result = {f"таблица {name}": size for name, size in tables}
+    result.update({f"индексы {name}": size for name, size in indexes})
+    return result
+
+
+def lookups(path: str, phones: list, users: list, encode) -> dict:
+    """Медиана времени поиска (мкс) по номеру и по ID пользователя"""
+    connection = sqlite3.connect(path)
+    timings = {"по номеру": [], "по пользователю": []}
+    for phone, user_id in zip(phones, users):
+        started = time.perf_counter()
+        connection.execute("SELECT id, status FROM phone_numbers WHERE phone_number = ?", (encode["phone"](phone),)).fetchall()
+        timings["по номеру"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        connection.execute("SELECT phone_number, status FROM phone_numbers WHERE user_id = ?", (encode["user"](user_id),)).fetchall()
+        timings["по пользователю"].append(time.perf_counter() - started)
+    connection.close()
+    return {name: statistics.median(values) * 1e6 for name, values in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000, help="Количество номеров в базе")
+    parser.add_argument("--queries", type=int, default=5000, help="Запросов каждого вида")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "compact_bench.db")
+    started = time.perf_counter()
+    phones = fill(path, args.rows, args.seed)
+    print(f"Номеров: {len(phones)}, заполнение базы: {time.perf_counter() - started:.1f} сек.")
+
+    rng = random.Random(args.seed + 1)
+    users = max(args.rows // NUMBERS_PER_USER, 1)
+    sample_phones = [rng.choice(phones) for _ in range(args.queries)]
+    sample_users = [str(5000000000 + rng.randrange(users)) for _ in range(args.queries)]
+
+    before_sizes = sizes(path)
+    before = lookups(path, sample_phones, sample_users, {"phone": str, "user": str})
+
+    # db_init читает DATABASE_URL при импорте
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    import storage_db
+    from phones import encode_phone
+
+    started = time.perf_counter()
+    storage_db.initialize_db_storage()
+    print(f"Миграция: {time.perf_counter() - started:.1f} сек.")
+    connection = sqlite3.connect(path)
+    connection.execute("VACUUM")
+    connection.close()
+
+    after_sizes = sizes(path)
+    after = lookups(path, sample_phones, sample_users, {"phone": encode_phone, "user": int})
+
+    print(f"{'':>24} {'до, МБ':>9} {'после, МБ':>10}")
+    for name in before_sizes:
+        print(f"{name:>24} {before_sizes[name] / 2 ** 20:>9.1f} {after_sizes.get(name, 0) / 2 ** 20:>10.1f}")
+    print(f"{'поиск (медиана)':>24} {'до, мкс':>9} {'после, мкс':>10}")
+    for name in before:
+        print(f"{name:>24} {before[name]:>9.1f} {after[name]:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
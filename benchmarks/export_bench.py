@@ -0,0 +1,95 @@
+"""
+Выгрузка номеров (export.write_export): время и пиковая память.
+
+Заполняет базу до каждого из указанных размеров и выгружает все номера в
+CSV и, если установлен openpyxl, в XLSX. Пиковая память Python измеряется
+отдельным прогоном через tracemalloc и не должна расти вместе с
+количеством номеров.
+
+Запуск из корня репозитория:
+    python benchmarks/export_bench.py --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+NUMBERS_PER_USER = 10
+INSERT_BATCH_SIZE = 20000
+STATUSES = ["waiting", "processed", "rejected", "failed", "pending"]
+
+
+def fill(start: int, stop: int, rng: random.Random) -> None:
+    """Добавляет номера с порядковыми номерами [start, stop) и их пользователей"""
+    from db_init import engine
+    from models import PhoneNumber, User
+    from utils import reverse_phone_digits
+
+    with engine.begin() as connection:
+        first_user = (start + NUMBERS_PER_USER - 1) // NUMBERS_PER_USER
+        last_user = (stop + NUMBERS_PER_USER - 1) // NUMBERS_PER_USER
+        for batch in range(first_user, last_user, INSERT_BATCH_SIZE):
+            connection.execute(User.__table__.insert(), [
+                {"id": str(1000 + user), "username": f"user{user}", "first_name": "Имя"}
+                for user in range(batch, min(batch + INSERT_BATCH_SIZE, last_user))
+            ])
+        for batch in range(start, stop, INSERT_BATCH_SIZE):
+            rows = []
+            for index in range(batch, min(batch + INSERT_BATCH_SIZE, stop)):
+                phone = f"+7{9000000000 + index}"
+                rows.append({
+                    "user_id": str(1000 + index // NUMBERS_PER_USER),
+                    "phone_number": phone,
+                    "phone_reversed": reverse_phone_digits(phone),
+                    "status": rng.choice(STATUSES),
+                    "code_sent": index % 3 == 0
+                })
+            connection.execute(PhoneNumber.__table__.insert(), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Размеры базы через запятую")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="URL базы данных (по умолчанию временный SQLite)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    # db_init читает DATABASE_URL при импорте
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{directory}/export_bench.db"
+    import export
+    import storage_db
+
+    storage_db.initialize_db_storage()
+    rng = random.Random(args.seed)
+    formats = ["csv"] + (["xlsx"] if export.openpyxl is not None else [])
+
+    print(f"{'формат':>7} {'строк':>9} {'сек.':>8} {'файл, МБ':>9} {'пик памяти, МБ':>15}")
+    filled = 0
+    for size in sorted(int(value) for value in args.sizes.split(",")):
+        fill(filled, size, rng)
+        filled = size
+        for fmt in formats:
+            path = os.path.join(directory, f"export.{fmt}")
+            started = time.perf_counter()
+            export.write_export(path, export.ExportFilter(fmt))
+            elapsed = time.perf_counter() - started
+            # tracemalloc замедляет выгрузку, поэтому память измеряется вторым прогоном
+            tracemalloc.start()
+            export.write_export(path, export.ExportFilter(fmt))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                f"{fmt:>7} {size:>9} {elapsed:>8.1f} {os.path.getsize(path) / 2 ** 20:>9.1f} "
+                f"{peak / 2 ** 20:>15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
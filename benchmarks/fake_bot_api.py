@@ -0,0 +1,68 @@
+"""
+Заглушка Telegram Bot API для нагрузочных тестов.
+
+Отвечает успехом на любой метод и считает вызовы. Бот направляется
+на заглушку через переменную окружения TELEGRAM_API_URL.
+"""
+import asyncio
+import itertools
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    """aiohttp-сервер, имитирующий https://api.telegram.org"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.last_call_at = 0.0
+        self._message_ids = itertools.count(1)
+        self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        self.calls[method] += 1
+        self.last_call_at = time.monotonic()
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        data = dict(await request.post())
+        if method == "getupdates":
+            # Имитация long polling без новых обновлений
+            await asyncio.sleep(min(float(data.get("timeout") or 0), 1.0))
+            result = []
+        elif method == "getme":
+            result = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        elif method == "getwebhookinfo":
+            result = {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        elif method.startswith("send") or method.startswith("edit"):
+            chat_id = int(data.get("chat_id") or 1)
+            result = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", "")
+            }
+        else:
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
@@ -0,0 +1,82 @@
+"""
+Накладные расходы хранилища FSM на одно обновление.
+
+Для каждого обновления выполняет типичную для обработчиков последовательность:
+get_state, затем set_state и update_data. Сравнивает MemoryStorage и
+DatabaseStorage (с кэшем и пакетной записью) и считает, сколько транзакций
+записи понадобилось DatabaseStorage.
+
+Запуск из корня репозитория:
+    python benchmarks/fsm_storage_bench.py --updates 20000 --users 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+async def run_updates(storage, updates: int, users: int) -> float:
+    from aiogram.fsm.storage.base import StorageKey
+
+    keys = [StorageKey(bot_id=1, chat_id=user_id, user_id=user_id) for user_id in range(1, users + 1)]
+    started = time.perf_counter()
+    for index in range(updates):
+        key = keys[index % users]
+        state = await storage.get_state(key)
+        await storage.set_state(key, "Form:phone" if state is None else None)
+        await storage.update_data(key, {"step": index})
+    elapsed = time.perf_counter() - started
+    await storage.close()
+    return elapsed
+
+
+async def run(args):
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    import storage_db
+    from fsm_storage import DatabaseStorage
+
+    storage_db.initialize_db_storage()
+
+    # Считаем транзакции записи, не меняя само хранилище
+    save_fsm_records = storage_db.save_fsm_records
+    batches = []
+
+    def counting_save(records):
+        batches.append(len(records))
+        return save_fsm_records(records)
+
+    storage_db.save_fsm_records = counting_save
+
+    print(f"Обновлений: {args.updates}, пользователей: {args.users}, размер кэша: {args.cache_size}")
+    print(f"{'хранилище':>16} {'мкс/обновл.':>12} {'транзакций':>11} {'записей':>9}")
+
+    elapsed = await run_updates(MemoryStorage(), args.updates, args.users)
+    print(f"{'MemoryStorage':>16} {elapsed / args.updates * 1e6:>12.1f} {'-':>11} {'-':>9}")
+
+    storage = DatabaseStorage(cache_size=args.cache_size, flush_interval=args.flush_interval)
+    elapsed = await run_updates(storage, args.updates, args.users)
+    print(f"{'DatabaseStorage':>16} {elapsed / args.updates * 1e6:>12.1f} {len(batches):>11} {sum(batches):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    parser.add_argument("--database-url", help="URL базы данных (по умолчанию временный SQLite)")
+    args = parser.parse_args()
+
+    # db_init читает DATABASE_URL при импорте
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/fsm_bench.db"
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
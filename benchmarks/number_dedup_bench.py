@@ -0,0 +1,111 @@
+"""
+Добавление номеров с глобальной проверкой дубликатов (storage_db.add_number_to_queue).
+
+Заполняет базу указанным количеством номеров, строит фильтр номеров
+(dedup.py) и добавляет новые номера двумя способами: с фильтром и без него,
+когда каждый номер проверяется запросами к базе. Часть добавляемых номеров -
+дубликаты уже стоящих в очереди. Выводит время построения фильтра, его
+размер, долю добавлений, которым понадобилась проверка в базе, и скорость.
+
+Запуск из корня репозитория:
+    python benchmarks/number_dedup_bench.py --rows 1000000 --adds 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+INSERT_BATCH_SIZE = 20000
+
+
+def fill(rows: int, users: int, rng: random.Random) -> list:
+    """Заполняет базу и возвращает созданные номера"""
+    from db_init import engine
+    from models import PhoneNumber, User
+    from utils import reverse_phone_digits
+
+    phones = list({f"+7{rng.randrange(10 ** 10):010d}" for _ in range(rows)})
+    with engine.begin() as connection:
+        for start in range(0, users, INSERT_BATCH_SIZE):
+            connection.execute(User.__table__.insert(), [
+                {"id": str(user_id)} for user_id in range(start, min(start + INSERT_BATCH_SIZE, users))
+            ])
+        for start in range(0, len(phones), INSERT_BATCH_SIZE):
+            connection.execute(PhoneNumber.__table__.insert(), [
+                {
+                    "user_id": str(index % users),
+                    "phone_number": phones[index],
+                    "phone_reversed": reverse_phone_digits(phones[index]),
+                    "status": "waiting"
+                }
+                for index in range(start, min(start + INSERT_BATCH_SIZE, len(phones)))
+            ])
+    return phones
+
+
+def run(numbers: list, users: int, rng: random.Random) -> tuple:
+    """Добавляет номера; возвращает (результаты, проверок в базе, секунд)"""
+    import dedup
+    from storage_db import add_number_to_queue
+
+    probes = sum(dedup.number_might_exist(number) for number in numbers)
+    results = {}
+    started = time.perf_counter()
+    for number in numbers:
+        result = add_number_to_queue(str(rng.randrange(users)), number)
+        results[result] = results.get(result, 0) + 1
+    return results, probes, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000, help="Количество номеров в базе")
+    parser.add_argument("--adds", type=int, default=5000, help="Добавлений в каждом прогоне")
+    parser.add_argument("--duplicates", type=float, default=0.05, help="Доля дубликатов среди добавлений")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="URL базы данных (по умолчанию временный SQLite)")
+    args = parser.parse_args()
+
+    # db_init читает DATABASE_URL при импорте
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/dedup_bench.db"
+    import dedup
+    import storage_db
+
+    storage_db.initialize_db_storage()
+    rng = random.Random(args.seed)
+    users = max(args.rows // 10, 1)
+    started = time.perf_counter()
+    existing = fill(args.rows, users, rng)
+    print(f"Номеров: {len(existing)}, заполнение базы: {time.perf_counter() - started:.1f} сек.")
+
+    started = time.perf_counter()
+    storage_db.build_number_filter()
+    number_filter = dedup._number_filter
+    print(
+        f"Фильтр: {time.perf_counter() - started:.1f} сек., {len(number_filter._bits) / 2 ** 20:.1f} МБ, "
+        f"{number_filter.hashes} хешей"
+    )
+
+    def batch() -> list:
+        return [
+            rng.choice(existing) if rng.random() < args.duplicates else f"+7{rng.randrange(10 ** 10):010d}"
+            for _ in range(args.adds)
+        ]
+
+    print(f"{'прогон':>12} {'проверок в базе':>16} {'добавлено':>10} {'дубликатов':>11} {'добавлений/сек.':>16}")
+    for name, enabled in (("с фильтром", True), ("без фильтра", False)):
+        dedup._number_filter = number_filter if enabled else None
+        results, probes, elapsed = run(batch(), users, rng)
+        print(
+            f"{name:>12} {probes / args.adds:>15.1%} {results.get(storage_db.NUMBER_ADDED, 0):>10} "
+            f"{results.get(storage_db.NUMBER_DUPLICATE, 0):>11} {args.adds / elapsed:>16,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
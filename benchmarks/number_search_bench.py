@@ -0,0 +1,103 @@
+"""
+Задержка поиска номеров администратором (storage_db.search_numbers).
+
+Заполняет базу указанным количеством номеров (по 10 номеров на пользователя),
+затем выполняет запросы всех видов - по началу номера, по последним цифрам
+и по имени пользователя - и выводит медиану и 95-й перцентиль задержки
+первой и пятой страниц результатов. Цель - меньше 50 мс на миллионе строк.
+
+Запуск из корня репозитория:
+    python benchmarks/number_search_bench.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+NUMBERS_PER_USER = 10
+INSERT_BATCH_SIZE = 20000
+
+
+def fill(rows: int, seed: int) -> list:
+    """Заполняет базу и возвращает созданные номера"""
+    from db_init import engine
+    from models import PhoneNumber, User
+    from utils import reverse_phone_digits
+
+    rng = random.Random(seed)
+    users = max(rows // NUMBERS_PER_USER, 1)
+    phones = [f"+7{rng.randrange(10 ** 10):010d}" for _ in range(rows)]
+
+    with engine.begin() as connection:
+        for start in range(0, users, INSERT_BATCH_SIZE):
+            connection.execute(User.__table__.insert(), [
+                {"id": str(user_id), "username": f"user{user_id}"}
+                for user_id in range(start, min(start + INSERT_BATCH_SIZE, users))
+            ])
+        for start in range(0, rows, INSERT_BATCH_SIZE):
+            connection.execute(PhoneNumber.__table__.insert(), [
+                {
+                    "user_id": str(index % users),
+                    "phone_number": phones[index],
+                    "phone_reversed": reverse_phone_digits(phones[index]),
+                    "status": "waiting"
+                }
+                for index in range(start, min(start + INSERT_BATCH_SIZE, rows))
+            ])
+    return phones
+
+
+def measure(queries: list, offset: int, page_size: int) -> list:
+    from storage_db import search_numbers
+
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        search_numbers(query, limit=page_size + 1, offset=offset)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000, help="Количество номеров в базе")
+    parser.add_argument("--queries", type=int, default=200, help="Запросов каждого вида")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="URL базы данных (по умолчанию временный SQLite)")
+    args = parser.parse_args()
+
+    # db_init читает DATABASE_URL при импорте
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/search_bench.db"
+    import storage_db
+
+    storage_db.initialize_db_storage()
+    started = time.perf_counter()
+    phones = fill(args.rows, args.seed)
+    print(f"Номеров: {args.rows}, заполнение базы: {time.perf_counter() - started:.1f} сек.")
+
+    rng = random.Random(args.seed + 1)
+    users = max(args.rows // NUMBERS_PER_USER, 1)
+    samples = [rng.choice(phones) for _ in range(args.queries)]
+    kinds = {
+        "начало номера": [phone[:6] for phone in samples],
+        "последние цифры": [phone[-4:] for phone in samples],
+        "имя пользователя": [f"@user{rng.randrange(users) // 10}" for _ in range(args.queries)],
+    }
+
+    print(f"{'запрос':>18} {'страница':>9} {'медиана, мс':>12} {'p95, мс':>9}")
+    for kind, queries in kinds.items():
+        for page in (1, 5):
+            timings = sorted(measure(queries, (page - 1) * args.page_size, args.page_size))
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{kind:>18} {page:>9} {statistics.median(timings):>12.2f} {p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Скорость нормализации номеров телефонов (phones.py).
+
+Генерирует номера в разных форматах ввода («+7 (999) 123-45-67»,
+«8 999 1234567», «00380...», с ошибками) и сравнивает разбор по одному
+номеру (parse_phone) с векторизованным разбором пакета
+(normalize_phone_array, требуется NumPy). Выводит номеров в секунду.
+
+Запуск из корня репозитория:
+    python benchmarks/phone_normalize_bench.py --numbers 2000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def generate(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    formats = [
+        lambda n: f"+7{n}",
+        lambda n: f"+7 ({n[:3]}) {n[3:6]}-{n[6:8]}-{n[8:]}",
+        lambda n: f"8 {n[:3]} {n[3:]}",
+        lambda n: f"00380{n[1:]}",
+        lambda n: f"+375 {n[1:]}",
+        lambda n: f"+7{n[:-3]}",          # слишком короткий
+        lambda n: f"+7{n[:4]}x{n[4:]}",   # лишний символ
+    ]
+    return [rng.choice(formats)(f"9{rng.randrange(10 ** 9):09d}") for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--numbers", type=int, default=2000000, help="Количество номеров в пакете")
+    parser.add_argument("--batch-size", type=int, default=100000, help="Размер одного векторизованного пакета")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    import phones
+
+    values = generate(args.numbers, args.seed)
+    print(f"Номеров: {args.numbers}")
+
+    # По одному номеру: достаточно части пакета, чтобы оценить скорость
+    sample = values[:min(len(values), 200000)]
+    started = time.perf_counter()
+    single = [phones.parse_phone(value) for value in sample]
+    elapsed = time.perf_counter() - started
+    print(f"{'по одному':>14}: {len(sample) / elapsed:>12,.0f} номеров/сек.")
+
+    if phones.np is None:
+        print("NumPy не установлен: векторизованный разбор недоступен")
+        return
+
+    array = phones.np.array(values)
+    started = time.perf_counter()
+    valid = 0
+    for start in range(0, len(array), args.batch_size):
+        e164, _, _ = phones.normalize_phone_array(array[start:start + args.batch_size])
+        valid += int((e164 != "").sum())
+    elapsed = time.perf_counter() - started
+    print(f"{'пакетами':>14}: {len(array) / elapsed:>12,.0f} номеров/сек. (пакет {args.batch_size})")
+
+    expected = sum(info.valid for info in single)
+    checked, _, _ = phones.normalize_phone_array(array[:len(sample)])
+    print(f"Корректных номеров: {valid}; совпадение с разбором по одному: {int((checked != '').sum()) == expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Горячие пути чтения: объекты ORM против запросов Core (queries.py).
+
+Заполняет базу до каждого из указанных размеров (по 10 номеров на
+пользователя) и сравнивает прежние реализации get_user_numbers,
+get_user_info, get_admin_ids, get_queue_count и get_all_numbers через
+session.query(Model) с запросами Core из queries.py. Кэш storage_db не
+участвует: измеряется только чтение из базы. Выводит время одного вызова.
+
+Запуск из корня репозитория:
+    python benchmarks/read_paths_bench.py --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+NUMBERS_PER_USER = 10
+INSERT_BATCH_SIZE = 20000
+
+
+def fill(start: int, stop: int, rng: random.Random) -> None:
+    """Добавляет номера с порядковыми номерами [start, stop) и их пользователей"""
+    from db_init import engine
+    from models import PhoneNumber, User
+    from utils import reverse_phone_digits
+
+    with engine.begin() as connection:
+        first_user = (start + NUMBERS_PER_USER - 1) // NUMBERS_PER_USER
+        last_user = (stop + NUMBERS_PER_USER - 1) // NUMBERS_PER_USER
+        for batch in range(first_user, last_user, INSERT_BATCH_SIZE):
+            connection.execute(User.__table__.insert(), [
+                {"id": str(1000 + user), "username": f"user{user}", "first_name": "Имя"}
+                for user in range(batch, min(batch + INSERT_BATCH_SIZE, last_user))
+            ])
+        for batch in range(start, stop, INSERT_BATCH_SIZE):
+            rows = []
+            for index in range(batch, min(batch + INSERT_BATCH_SIZE, stop)):
+                phone = f"+7{9000000000 + index}"
+                rows.append({
+                    "user_id": str(1000 + index // NUMBERS_PER_USER),
+                    "phone_number": phone,
+                    "phone_reversed": reverse_phone_digits(phone),
+                    "status": rng.choice(["waiting", "processed", "rejected"])
+                })
+            connection.execute(PhoneNumber.__table__.insert(), rows)
+
+
+# --- Прежние реализации через объекты ORM ---
+
+def orm_user_numbers(user_id: str) -> dict:
+    from db_init import Session
+    from models import PhoneNumber
+
+    session = Session()
+    try:
+        phones = session.query(PhoneNumber).filter(PhoneNumber.user_id == user_id).all()
+        return {phone.phone_number: phone.status for phone in phones}
+    finally:
+        session.close()
+
+
+def orm_user_info(user_id: str) -> dict:
+    from db_init import Session
+    from models import User
+
+    session = Session()
+    try:
+        user = session.query(User).filter(User.id == user_id).first()
+        return {
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "created_at": user.created_at.timestamp() if user.created_at else None
+        } if user else {}
+    finally:
+        session.close()
+
+
+def orm_admin_ids() -> list:
+    from db_init import Session
+    from models import Admin
+
+    session = Session()
+    try:
+        return [admin.id for admin in session.query(Admin).all()]
+    finally:
+        session.close()
+
+
+def orm_queue_count() -> int:
+    from db_init import Session
+    from models import PhoneNumber
+
+    session = Session()
+    try:
+        return session.query(PhoneNumber).count()
+    finally:
+        session.close()
+
+
+def orm_all_numbers() -> dict:
+    from db_init import Session
+    from models import PhoneNumber
+
+    session = Session()
+    try:
+        result = {}
+        for phone in session.query(PhoneNumber).all():
+            result.setdefault(phone.user_id, {})[phone.phone_number] = phone.status
+        return result
+    finally:
+        session.close()
+
+
+def core_user_numbers(user_id: str) -> dict:
+    import queries
+    return {phone_number: status for phone_number, status in queries.user_numbers(user_id)}
+
+
+def core_all_numbers() -> dict:
+    import queries
+    result = {}
+    for user_id, phone_number, status in queries.all_numbers():
+        result.setdefault(user_id, {})[phone_number] = status
+    return result
+
+
+def measure(func, arguments: list) -> float:
+    """Среднее время вызова в микросекундах"""
+    started = time.perf_counter()
+    for argument in arguments:
+        func(*argument)
+    return (time.perf_counter() - started) / len(arguments) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Размеры базы через запятую")
+    parser.add_argument("--calls", type=int, default=2000, help="Вызовов для точечных запросов")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="URL базы данных (по умолчанию временный SQLite)")
+    args = parser.parse_args()
+
+    # db_init читает DATABASE_URL при импорте
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/read_bench.db"
+    import queries
+    import storage_db
+
+    storage_db.initialize_db_storage()
+    rng = random.Random(args.seed)
+
+    print(f"{'функция':>18} {'строк':>9} {'ORM, мкс':>12} {'Core, мкс':>12} {'ускорение':>10}")
+    filled = 0
+    for size in sorted(int(value) for value in args.sizes.split(",")):
+        fill(filled, size, rng)
+        filled = size
+        users = [(str(1000 + rng.randrange(size // NUMBERS_PER_USER)),) for _ in range(args.calls)]
+        heavy_calls = [()] * max(1, 3 * 100000 // size)
+        cases = [
+            ("get_user_numbers", orm_user_numbers, core_user_numbers, users),
+            ("get_user_info", orm_user_info, queries.user_info, users),
+            ("get_admin_ids", orm_admin_ids, queries.admin_ids, [()] * args.calls),
+            ("get_queue_count", orm_queue_count, queries.queue_count, [()] * max(10, args.calls // 20)),
+            ("get_all_numbers", orm_all_numbers, core_all_numbers, heavy_calls),
+        ]
+        for name, orm_func, core_func, arguments in cases:
+            # Первый вызов компилирует запрос; он не входит в измерение
+            orm_func(*arguments[0])
+            core_func(*arguments[0])
+            orm_time = measure(orm_func, arguments)
+            core_time = measure(core_func, arguments)
+            print(f"{name:>18} {size:>9} {orm_time:>12,.0f} {core_time:>12,.0f} {orm_time / core_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
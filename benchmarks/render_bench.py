@@ -0,0 +1,90 @@
+"""
+Стоимость подготовки экрана меню на одно обновление.
+
+Для типичных экранов (главное меню, меню номеров, информация, прайсы)
+сравнивает два способа:
+- сборка заново: клавиатура создается из кнопок с валидацией pydantic,
+  текст собирается целиком, отпечаток для navigation.py считается
+  сериализацией клавиатуры в JSON (так было до реестра);
+- реестр: готовая клавиатура из templates.py, в шаблон подставляются
+  только изменяемые поля, отпечаток клавиатуры вычислен заранее.
+
+Запуск из корня репозитория:
+    python benchmarks/render_bench.py --updates 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def build_screens():
+    """Экраны: (имя, шаблон, значения полей, клавиатура)"""
+    from handlers.info import INFO_TEMPLATE
+    from handlers.menu import MAIN_MENU_TEMPLATE, PRICES_TEMPLATE
+    from keyboards import get_info_keyboard, get_main_menu_keyboard, get_numbers_menu_keyboard, get_back_keyboard
+
+    now = "19.10.2026 12:00:00"
+    main_slots = {
+        "moscow_time": now,
+        "work_emoji": "✅",
+        "queue_count": 128,
+        "user_queue_count": 3,
+        "moderator_emoji": "🟢",
+        "moderator_text": "онлайн",
+    }
+    return [
+        ("main_menu", MAIN_MENU_TEMPLATE, main_slots, get_main_menu_keyboard),
+        ("numbers_menu", None, {}, get_numbers_menu_keyboard),
+        ("info", INFO_TEMPLATE, {"moscow_time": now}, get_info_keyboard),
+        ("prices", PRICES_TEMPLATE, {"moscow_time": now}, lambda: get_back_keyboard("main_menu")),
+    ]
+
+
+def render_rebuilt(template, slots, keyboard_factory):
+    from aiogram.types import InlineKeyboardMarkup
+
+    # Клавиатура собирается из тех же кнопок, как раньше на каждое обновление
+    rows = keyboard_factory().model_dump(exclude_none=True)["inline_keyboard"]
+    keyboard = InlineKeyboardMarkup(inline_keyboard=rows)
+    text = template.text.format(**slots) if template is not None else ""
+    return text, hash((text, keyboard.model_dump_json(exclude_none=True)))
+
+
+def render_registry(template, slots, keyboard_factory):
+    from navigation import _fingerprint
+
+    keyboard = keyboard_factory()
+    text = template.render(**slots) if template is not None else ""
+    return text, _fingerprint(text, keyboard, "Markdown")
+
+
+def measure(render, screens, updates: int) -> float:
+    started = time.perf_counter()
+    for index in range(updates):
+        _, template, slots, keyboard_factory = screens[index % len(screens)]
+        render(template, slots, keyboard_factory)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20000, help="Количество обновлений")
+    args = parser.parse_args()
+
+    screens = build_screens()
+    # Прогрев: ленивые структуры pydantic строятся при первом использовании
+    measure(render_rebuilt, screens, len(screens))
+    measure(render_registry, screens, len(screens))
+
+    print(f"Экраны: {', '.join(name for name, _, _, _ in screens)}; обновлений: {args.updates}")
+    for label, render in (("сборка заново", render_rebuilt), ("реестр", render_registry)):
+        elapsed = measure(render, screens, args.updates)
+        print(f"{label:>14}: {elapsed / args.updates * 1e6:7.1f} мкс на обновление")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Нагрузочный тест приема обновлений через webhook.
+
+Запускает заглушку Bot API, webhook-сервер бота и отправляет в него
+пачку обновлений /start от разных пользователей. Измеряет задержку
+подтверждения (ответа на POST) и время до обработки всех обновлений.
+
+Запуск из корня репозитория:
+    python benchmarks/webhook_load.py --updates 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import ClientSession
+
+from fake_bot_api import FakeBotAPI
+
+SECRET = "load-test-secret"
+
+
+def make_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}]
+        }
+    }
+
+
+async def run(args):
+    fake_api = FakeBotAPI(latency=args.api_latency)
+    api_url = await fake_api.start(port=args.api_port)
+
+    # Настройки читаются модулем telegram_bot при импорте
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/load.db")
+    os.environ["TELEGRAM_API_URL"] = api_url
+    os.environ["BOT_MODE"] = "webhook"
+    os.environ["WEBHOOK_SECRET"] = SECRET
+    os.environ["WEBAPP_HOST"] = "127.0.0.1"
+    os.environ["WEBAPP_PORT"] = str(args.port)
+
+    import telegram_bot
+
+    # Журнал каждого запроса искажает измерения
+    logging.getLogger("aiohttp.access").setLevel(logging.WARNING)
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+    telegram_bot.prepare_storage()
+    bot = telegram_bot.create_bot("123456:LOADTEST")
+    dp = telegram_bot.create_dispatcher()
+    server = asyncio.create_task(telegram_bot.run_webhook(dp, bot))
+    await asyncio.sleep(1)
+
+    url = f"http://127.0.0.1:{args.port}{telegram_bot.WEBHOOK_PATH}"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    ack_latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    baseline_calls = fake_api.calls["sendmessage"]
+
+    async with ClientSession() as http:
+        # Запрос с неверным секретом должен быть отклонен
+        async with http.post(url, json=make_update(0, 1), headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as response:
+            print(f"Неверный секрет: HTTP {response.status}")
+
+        async def send(i: int):
+            async with semaphore:
+                started = time.perf_counter()
+                async with http.post(url, json=make_update(i, 100000 + i % args.users), headers=headers) as response:
+                    await response.read()
+                    assert response.status == 200, response.status
+                ack_latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(1, args.updates + 1)))
+        acked = time.perf_counter() - started
+
+        # Ждем, пока все обновления будут обработаны (каждое отправляет одно сообщение)
+        while fake_api.calls["sendmessage"] - baseline_calls < args.updates:
+            if time.perf_counter() - started > args.timeout:
+                break
+            await asyncio.sleep(0.05)
+        processed = time.perf_counter() - started
+
+    handled = fake_api.calls["sendmessage"] - baseline_calls
+    ack_latencies.sort()
+    print(f"Обновлений: {args.updates}, пользователей: {args.users}, параллельно: {args.concurrency}")
+    print(f"Подтверждено за {acked:.2f} с ({args.updates / acked:.0f} обновл./с)")
+    print(f"Задержка подтверждения: p50={statistics.median(ack_latencies) * 1000:.1f} мс, "
+          f"p99={ack_latencies[int(len(ack_latencies) * 0.99) - 1] * 1000:.1f} мс")
+    print(f"Обработано {handled} за {processed:.2f} с ({handled / processed:.0f} обновл./с)")
+
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+    await fake_api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--api-port", type=int, default=8091)
+    parser.add_argument("--api-latency", type=float, default=0.02, help="Задержка ответа заглушки Bot API (с)")
+    parser.add_argument("--timeout", type=float, default=120)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
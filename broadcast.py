@@ -0,0 +1,187 @@
+"""
+Рассылка сообщений с учетом ограничений Telegram.
+
+Сообщения отправляются параллельно, но не быстрее глобального лимита
+(около 30 сообщений в секунду) и лимита на один чат (около 1 сообщения
+в секунду). Ответ RetryAfter приостанавливает отправку на указанное время,
+временные ошибки повторяются с экспоненциальной задержкой.
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Union
+
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError
+)
+
+from ratelimit import TokenBucket
+
+# Лимиты Telegram Bot API
+GLOBAL_RATE = 30          # сообщений в секунду на бота
+PER_CHAT_RATE = 1         # сообщений в секунду в один чат
+PER_CHAT_BURST = 3        # допустимая пачка сообщений в один чат
+
+# Параметры повторных попыток
+MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5    # начальная задержка для временных ошибок (секунды)
+MAX_CONCURRENCY = 25      # одновременных запросов к Telegram
+
+# Сколько корзин для отдельных чатов хранить в памяти
+MAX_CHAT_BUCKETS = 10000
+
+
+@dataclass
+class DeliveryResult:
+    """Результат доставки одному получателю"""
+    chat_id: str
+    ok: bool
+    attempts: int = 0
+    error: Optional[str] = None
+    retryable: bool = True   # имеет ли смысл повторить доставку позже
+    result: Any = None
+
+
+@dataclass
+class BroadcastReport:
+    """Результаты рассылки по каждому получателю"""
+    results: List[DeliveryResult] = field(default_factory=list)
+
+    @property
+    def delivered(self) -> List[str]:
+        return [r.chat_id for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> List[DeliveryResult]:
+        return [r for r in self.results if not r.ok]
+
+    def summary(self) -> str:
+        return f"доставлено {len(self.delivered)} из {len(self.results)}"
+
+
+class Broadcaster:
+    """Отправляет запросы к Telegram с учетом глобального лимита и лимита на чат"""
+
+    def __init__(
+        self,
+        global_rate: float = GLOBAL_RATE,
+        per_chat_rate: float = PER_CHAT_RATE,
+        per_chat_burst: float = PER_CHAT_BURST,
+        max_attempts: int = MAX_ATTEMPTS,
+        max_concurrency: int = MAX_CONCURRENCY
+    ):
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_attempts = max_attempts
+        self.max_concurrency = max_concurrency
+        self._chat_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Семафор создается лениво, внутри работающего цикла событий
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+            self._chat_buckets[chat_id] = bucket
+            # Вытесняем самые давно использованные корзины
+            while len(self._chat_buckets) > MAX_CHAT_BUCKETS:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def deliver(self, chat_id: Union[int, str], call: Callable[[], Awaitable[Any]]) -> DeliveryResult:
+        """
+        Выполняет запрос к Telegram для одного чата с ограничением частоты и повторами.
+
+        Args:
+            chat_id: ID чата получателя
+            call: Функция без аргументов, возвращающая корутину запроса
+
+        Returns:
+            DeliveryResult с итогом доставки
+        """
+        chat_id = str(chat_id)
+        delivery = DeliveryResult(chat_id=chat_id, ok=False)
+        chat_bucket = self._chat_bucket(chat_id)
+
+        while delivery.attempts < self.max_attempts:
+            delivery.attempts += 1
+            await chat_bucket.acquire()
+            await self.global_bucket.acquire()
+
+            try:
+                async with self._get_semaphore():
+                    delivery.result = await call()
+                delivery.ok = True
+                delivery.error = None
+                return delivery
+            except TelegramRetryAfter as e:
+                # Flood control: Telegram сам сообщает, сколько ждать
+                delivery.error = str(e)
+                self.global_bucket.pause(e.retry_after)
+                chat_bucket.pause(e.retry_after)
+                logging.warning(f"RetryAfter {e.retry_after} сек. для чата {chat_id}")
+            except (TelegramNetworkError, TelegramServerError) as e:
+                # Временные ошибки повторяем с экспоненциальной задержкой
+                delivery.error = str(e)
+                await asyncio.sleep(RETRY_BASE_DELAY * 2 ** (delivery.attempts - 1))
+            except TelegramAPIError as e:
+                # Остальные ошибки (бот заблокирован, чат не найден и т.п.) не исправятся повтором
+                delivery.error = str(e)
+                delivery.retryable = False
+                return delivery
+
+        return delivery
+
+    async def send_message(self, bot, chat_id: Union[int, str], text: str, **kwargs) -> DeliveryResult:
+        """Отправляет одно сообщение через ограничитель частоты"""
+        return await self.deliver(
+            chat_id,
+            lambda: bot.send_message(chat_id=chat_id, text=text, **kwargs)
+        )
+
+    async def broadcast(self, bot, chat_ids: Iterable[Union[int, str]], text: str, **kwargs) -> BroadcastReport:
+        """
+        Отправляет одно и то же сообщение всем получателям параллельно.
+
+        Returns:
+            BroadcastReport с результатом для каждого получателя
+        """
+        # Убираем повторы, сохраняя порядок
+        recipients = list(dict.fromkeys(str(chat_id) for chat_id in chat_ids))
+
+        results = await asyncio.gather(*(
+            self.send_message(bot, chat_id, text, **kwargs)
+            for chat_id in recipients
+        ))
+
+        report = BroadcastReport(results=list(results))
+        for failure in report.failed:
+            logging.warning(f"Не удалось доставить сообщение в чат {failure.chat_id}: {failure.error}")
+        return report
+
+
+# Общий экземпляр для всего процесса, чтобы лимиты учитывались совместно
+_broadcaster: Optional[Broadcaster] = None
+
+
+def get_broadcaster() -> Broadcaster:
+    """Возвращает общий для процесса Broadcaster"""
+    global _broadcaster
+    if _broadcaster is None:
+        from cluster import BOT_WORKERS
+
+        # Лимит Telegram общий для бота, поэтому делится между процессами
+        _broadcaster = Broadcaster(global_rate=GLOBAL_RATE / BOT_WORKERS)
+    return _broadcaster
@@ -2,6 +2,8 @@
 Модуль для кэширования часто используемых данных.
 Это помогает избежать частых обращений к базе данных.
 """
+import json
+import os
 import time
 from typing import Dict, Any, Callable, Optional, TypeVar, List, Tuple
 
@@ -17,20 +19,40 @@ _admin_ids_cache: Optional[Tuple[List[str], float]] = None
 # Кэш для хранения информации о пользователях: user_id -> (инфо, временная метка)
 _user_info_cache: Dict[str, Tuple[Dict[str, Any], float]] = {}
 
+# Кэш для глобальных счетчиков (размер очереди и т.п.): ключ -> (значение, временная метка)
+_counters_cache: Dict[str, Tuple[int, float]] = {}
+
 # Время жизни кэша (в секундах)
 CACHE_TTL = {
     'settings': 30,      # Настройки кэшируются на 30 секунд
     'admin_ids': 60,     # Список админов кэшируется на 60 секунд
     'user_info': 300,    # Информация о пользователях кэшируется на 5 минут
+    'counters': 10,      # Глобальные счетчики кэшируются на 10 секунд
 }
 
+# Версия формата файла снимка кэша
+SNAPSHOT_VERSION = 1
+
+# Функция, которая сообщает о сбросе кэша другим процессам бота (cache_type, user_id)
+_invalidation_hook: Optional[Callable[[str, Optional[str]], Any]] = None
+
+def set_invalidation_hook(hook: Optional[Callable[[str, Optional[str]], Any]]):
+    """
+    Задает функцию, вызываемую при каждом сбросе кэша.
+    
+    Args:
+        hook: Функция (cache_type, user_id) или None, чтобы отключить оповещение
+    """
+    global _invalidation_hook
+    _invalidation_hook = hook
+
 def cached_setting(key: str) -> Callable[[Callable[[], T]], Callable[[], T]]:
     """
     Декоратор для кэширования системных настроек.
     
     Args:
         key: Ключ настройки
-        
+    
     Returns:
         Декорированная функция, которая использует кэш
     """
@@ -59,7 +81,7 @@ def cached_admin_ids(func: Callable[[], List[str]]) -> Callable[[], List[str]]:
     
     Args:
         func: Функция, которая возвращает список ID администраторов
-        
+    
     Returns:
         Декорированная функция, которая использует кэш
     """
@@ -85,7 +107,7 @@ def cached_user_info(func: Callable[[str], Dict[str, Any]]) -> Callable[[str], D
     
     Args:
         func: Функция, которая возвращает информацию о пользователе
-        
+    
     Returns:
         Декорированная функция, которая использует кэш
     """
@@ -105,14 +127,147 @@ def cached_user_info(func: Callable[[str], Dict[str, Any]]) -> Callable[[str], D
     
     return wrapper
 
-def clear_cache(cache_type: Optional[str] = None):
+def cached_counter(key: str) -> Callable[[Callable[[], int]], Callable[[], int]]:
+    """
+    Декоратор для кэширования глобальных счетчиков.
+    
+    Args:
+        key: Ключ счетчика
+    
+    Returns:
+        Декорированная функция, которая использует кэш
+    """
+    def decorator(func: Callable[[], int]) -> Callable[[], int]:
+        def wrapper() -> int:
+            # Проверяем наличие значения в кэше и его актуальность
+            if key in _counters_cache:
+                value, timestamp = _counters_cache[key]
+                if time.time() - timestamp < CACHE_TTL['counters']:
+                    return value
+            
+            value = func()
+            _counters_cache[key] = (value, time.time())
+            return value
+        
+        return wrapper
+    
+    return decorator
+
+def prime_setting(key: str, value: Any):
+    """Помещает значение настройки в кэш без обращения к базе данных"""
+    _settings_cache[key] = (value, time.time())
+
+def prime_admin_ids(admin_ids: List[str]):
+    """Помещает список администраторов в кэш без обращения к базе данных"""
+    global _admin_ids_cache
+    _admin_ids_cache = (list(admin_ids), time.time())
+
+def prime_user_info(user_id: str, info: Dict[str, Any]):
+    """Помещает информацию о пользователе в кэш без обращения к базе данных"""
+    _user_info_cache[str(user_id)] = (info, time.time())
+
+def prime_counter(key: str, value: int):
+    """Помещает значение счетчика в кэш без обращения к базе данных"""
+    _counters_cache[key] = (value, time.time())
+
+def save_snapshot(path: str) -> bool:
+    """
+    Сохраняет текущее содержимое кэша в файл.
+    
+    Файл записывается атомарно (через временный файл), чтобы прерванная
+    остановка не оставила поврежденный снимок.
+    
+    Args:
+        path: Путь к файлу снимка
+    
+    Returns:
+        True, если снимок успешно записан
+    """
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'saved_at': time.time(),
+        'settings': {key: value for key, (value, _) in _settings_cache.items()},
+        'admin_ids': _admin_ids_cache[0] if _admin_ids_cache else None,
+        'user_info': {user_id: info for user_id, (info, _) in _user_info_cache.items()},
+        'counters': {key: value for key, (value, _) in _counters_cache.items()},
+    }
+    
+    tmp_path = f"{path}.tmp"
+    try:
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Ошибка при сохранении снимка кэша: {e}")
+        return False
+
+def load_snapshot(path: str, max_age: float) -> List[str]:
+    """
+    Загружает содержимое кэша из файла снимка.
+    
+    Загруженные значения получают свежую временную метку и живут обычный TTL,
+    после чего перечитываются из базы данных.
+    
+    Args:
+        path: Путь к файлу снимка
+        max_age: Максимальный возраст снимка в секундах; более старые снимки игнорируются
+    
+    Returns:
+        Список типов кэша, которые были загружены из снимка
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        print(f"Ошибка при чтении снимка кэша: {e}")
+        return []
+    
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return []
+    if time.time() - snapshot.get('saved_at', 0) > max_age:
+        return []
+    
+    loaded = []
+    
+    if snapshot.get('settings'):
+        for key, value in snapshot['settings'].items():
+            prime_setting(key, value)
+        loaded.append('settings')
+    
+    if snapshot.get('admin_ids') is not None:
+        prime_admin_ids(snapshot['admin_ids'])
+        loaded.append('admin_ids')
+    
+    if snapshot.get('user_info'):
+        for user_id, info in snapshot['user_info'].items():
+            prime_user_info(user_id, info)
+        loaded.append('user_info')
+    
+    if snapshot.get('counters'):
+        for key, value in snapshot['counters'].items():
+            prime_counter(key, value)
+        loaded.append('counters')
+    
+    return loaded
+
+def clear_cache(cache_type: Optional[str] = None, propagate: bool = True):
     """
     Очищает кэш.
     
     Args:
-        cache_type: Тип кэша для очистки ('settings', 'admin_ids', 'user_info', None для очистки всего кэша)
+        cache_type: Тип кэша для очистки ('settings', 'admin_ids', 'user_info', 'counters', None для очистки всего кэша)
+        propagate: Сообщить о сбросе другим процессам бота
     """
-    global _settings_cache, _admin_ids_cache, _user_info_cache
+    global _settings_cache, _admin_ids_cache, _user_info_cache, _counters_cache
+    
+    if propagate and _invalidation_hook is not None:
+        _invalidation_hook(cache_type or 'all', None)
     
     if cache_type is None or cache_type == 'settings':
         _settings_cache = {}
@@ -122,15 +277,22 @@ def clear_cache(cache_type: Optional[str] = None):
     
     if cache_type is None or cache_type == 'user_info':
         _user_info_cache = {}
+    
+    if cache_type is None or cache_type == 'counters':
+        _counters_cache = {}
 
-def clear_user_cache(user_id: str):
+def clear_user_cache(user_id: str, propagate: bool = True):
     """
     Очищает кэш для конкретного пользователя.
     
     Args:
         user_id: ID пользователя
+        propagate: Сообщить о сбросе другим процессам бота
     """
     global _user_info_cache
     
+    if propagate and _invalidation_hook is not None:
+        _invalidation_hook('user_info', user_id)
+    
     if user_id in _user_info_cache:
         del _user_info_cache[user_id]
\ No newline at end of file
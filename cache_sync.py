@@ -0,0 +1,127 @@
+"""
+Согласование кэшей между несколькими процессами бота.
+
+Каждый сброс кэша (cache.clear_cache, cache.clear_user_cache) попадает в
+очередь процесса, а фоновая задача раз в CACHE_SYNC_INTERVAL секунд
+записывает накопленные сбросы в таблицу cache_invalidations одной
+транзакцией, читает новые записи других процессов и сбрасывает у себя те
+же данные. Так изменение, сделанное в одном процессе, становится видно
+остальным примерно через два интервала, а не через TTL кэша, и обработчики
+не ждут записи в журнал.
+
+Счетчики (кэш 'counters') не публикуются: они живут всего несколько секунд,
+и другие процессы пересчитают их сами.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from cache import clear_cache, clear_user_cache, set_invalidation_hook
+
+# Как часто читать журнал сбросов (в секундах)
+CACHE_SYNC_INTERVAL = 1.0
+
+# Сколько последних записей перечитывать: идентификаторы выдаются при вставке,
+# а транзакции фиксируются не строго по порядку
+CACHE_SYNC_LOOKBACK = 100
+
+# Сколько хранить записи журнала и как часто удалять старые (в секундах)
+CACHE_SYNC_RETENTION = 3600
+CACHE_SYNC_PRUNE_INTERVAL = 300
+
+# Кэши, сброс которых не передается другим процессам (короткий TTL)
+LOCAL_CACHE_TYPES = frozenset({"counters"})
+
+# Сбросы, еще не записанные в журнал; clear_cache вызывается и из потоков asyncio.to_thread
+_pending: "OrderedDict[Tuple[str, Optional[str]], None]" = OrderedDict()
+_pending_lock = threading.Lock()
+
+
+def publish_invalidation(cache_type: str, user_id: Optional[str] = None):
+    """Ставит сброс кэша в очередь на запись в общий журнал"""
+    if cache_type in LOCAL_CACHE_TYPES:
+        return
+    with _pending_lock:
+        _pending[(cache_type, user_id)] = None
+
+
+def flush_invalidations() -> int:
+    """
+    Записывает накопленные сбросы кэша в журнал одной транзакцией.
+
+    Returns:
+        Количество записанных сбросов (при ошибке они остаются в очереди)
+    """
+    from storage_db import add_cache_invalidations
+
+    with _pending_lock:
+        entries = list(_pending)
+        _pending.clear()
+    if not entries:
+        return 0
+    if not add_cache_invalidations(entries):
+        with _pending_lock:
+            for entry in entries:
+                _pending[entry] = None
+        return 0
+    return len(entries)
+
+
+def enable_cache_sync():
+    """Включает запись сбросов кэша в журнал для остальных процессов"""
+    set_invalidation_hook(publish_invalidation)
+
+
+def apply_invalidation(cache_type: str, user_id: Optional[str] = None):
+    """Сбрасывает кэш по записи журнала, не публикуя сброс повторно"""
+    if user_id is not None:
+        clear_user_cache(user_id, propagate=False)
+    else:
+        clear_cache(None if cache_type == "all" else cache_type, propagate=False)
+
+
+async def run_cache_sync(interval: float = CACHE_SYNC_INTERVAL):
+    """Фоновая задача: применяет сбросы кэша, сделанные другими процессами"""
+    from stats import mark_stats_dirty
+    from storage_db import (
+        get_cache_invalidations,
+        get_last_cache_invalidation_id,
+        prune_cache_invalidations
+    )
+
+    # Записи, сделанные до старта процесса, уже учтены при прогреве кэша
+    last_id = await asyncio.to_thread(get_last_cache_invalidation_id)
+    applied: "OrderedDict[int, None]" = OrderedDict()
+    for row in await asyncio.to_thread(get_cache_invalidations, max(0, last_id - CACHE_SYNC_LOOKBACK)):
+        applied[row["id"]] = None
+    pruned_at = time.monotonic()
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush_invalidations)
+            rows = await asyncio.to_thread(get_cache_invalidations, max(0, last_id - CACHE_SYNC_LOOKBACK))
+            changed = False
+            for row in rows:
+                if row["id"] in applied:
+                    continue
+                apply_invalidation(row["cache_type"], row["key"])
+                applied[row["id"]] = None
+                last_id = max(last_id, row["id"])
+                changed = True
+
+            # Помнить нужно только записи, попадающие в окно перечитывания
+            while len(applied) > 2 * CACHE_SYNC_LOOKBACK:
+                applied.popitem(last=False)
+
+            if changed:
+                mark_stats_dirty()
+
+            if time.monotonic() - pruned_at >= CACHE_SYNC_PRUNE_INTERVAL:
+                pruned_at = time.monotonic()
+                await asyncio.to_thread(prune_cache_invalidations, CACHE_SYNC_RETENTION)
+        except Exception as e:
+            logging.error(f"Ошибка при синхронизации кэша: {e}")
@@ -0,0 +1,158 @@
+"""
+Компактный формат callback_data для кнопок действий с номерами.
+
+Раньше кнопки содержали ID пользователя и сам номер
+(`set_status:{user_id}:{phone}:{status}`): такие строки близки к лимиту
+Telegram в 64 байта, а обработчику приходилось заново искать номер по паре
+(пользователь, номер). Теперь кнопка содержит только первичный ключ
+PhoneNumber.id и короткие коды действия и статуса:
+
+    ~1s:2n:p  ->  версия 1, действие set_status, номер с id=95, статус processed
+
+Строка проверяется целиком до обращения к базе данных: неизвестная версия,
+действие, статус или испорченный id отклоняются сразу.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Union
+
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery
+
+# Признак нового формата и его версия
+CALLBACK_PREFIX = "~"
+CALLBACK_VERSION = "1"
+
+# Действия: имя -> код
+ACTION_CODES = {
+    "number_action": "o",   # открыть действия с номером (администратор)
+    "set_status": "s",      # изменить статус (администратор)
+    "send_code": "c",       # отправить код (администратор)
+    "code_yes": "y",        # пользователь будет вводить код
+    "code_no": "n",         # пользователь отказался от кода
+}
+ACTIONS_BY_CODE = {code: action for action, code in ACTION_CODES.items()}
+
+# Статусы номера: имя -> код
+STATUS_CODES = {
+    "waiting": "w",
+    "processed": "p",
+    "rejected": "r",
+    "in_progress": "i",
+    "failed": "f",
+    "pending": "k",
+    "canceled": "x",
+    "expired": "e",
+}
+STATUSES_BY_CODE = {code: status for status, code in STATUS_CODES.items()}
+
+# Старые форматы кнопок, которые могли остаться в уже отправленных сообщениях
+LEGACY_PREFIXES = ("number_action:", "set_status:", "send_code:", "code_response:")
+
+# Ограничение Telegram на длину callback_data (в байтах)
+MAX_CALLBACK_LENGTH = 64
+
+# Ответ на кнопку, которая больше не действует
+STALE_BUTTON_TEXT = "⚠️ Кнопка устарела. Откройте список номеров заново."
+
+# Длина id в base36: 12 символов хватает для любого BigInteger
+_MAX_ID_LENGTH = 12
+
+_BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+@dataclass(frozen=True)
+class NumberCallback:
+    """Разобранная кнопка действия с номером"""
+    action: str
+    phone_id: int
+    status: Optional[str] = None
+
+
+def _to_base36(value: int) -> str:
+    digits = []
+    while True:
+        value, remainder = divmod(value, 36)
+        digits.append(_BASE36[remainder])
+        if not value:
+            return "".join(reversed(digits))
+
+
+def encode_number_callback(action: str, phone_id: int, status: Optional[str] = None) -> str:
+    """
+    Формирует callback_data для кнопки действия с номером.
+
+    Args:
+        action: Действие из ACTION_CODES
+        phone_id: Первичный ключ PhoneNumber.id
+        status: Новый статус (только для set_status)
+
+    Returns:
+        Строка callback_data, например "~1s:2n:p"
+    """
+    data = f"{CALLBACK_PREFIX}{CALLBACK_VERSION}{ACTION_CODES[action]}:{_to_base36(phone_id)}"
+    if status is not None:
+        data += f":{STATUS_CODES[status]}"
+    return data
+
+
+def decode_number_callback(data: Optional[str]) -> Optional[NumberCallback]:
+    """
+    Разбирает callback_data кнопки действия с номером без обращения к базе данных.
+
+    Returns:
+        NumberCallback или None, если строка не в текущем формате или испорчена
+    """
+    if not data or len(data) > MAX_CALLBACK_LENGTH or not data.startswith(CALLBACK_PREFIX + CALLBACK_VERSION):
+        return None
+
+    parts = data[len(CALLBACK_PREFIX) + len(CALLBACK_VERSION):].split(":")
+    if len(parts) not in (2, 3):
+        return None
+    action = ACTIONS_BY_CODE.get(parts[0])
+    if action is None:
+        return None
+
+    raw_id = parts[1]
+    if not raw_id or len(raw_id) > _MAX_ID_LENGTH or not all(char in _BASE36 for char in raw_id):
+        return None
+    phone_id = int(raw_id, 36)
+    if phone_id <= 0:
+        return None
+
+    # Статус обязателен для set_status и недопустим для остальных действий
+    status = None
+    if action == "set_status":
+        if len(parts) != 3:
+            return None
+        status = STATUSES_BY_CODE.get(parts[2])
+        if status is None:
+            return None
+    elif len(parts) != 2:
+        return None
+
+    return NumberCallback(action=action, phone_id=phone_id, status=status)
+
+
+def is_stale_callback(data: Optional[str]) -> bool:
+    """Кнопка старого формата, неизвестной версии или с испорченными данными"""
+    if not data:
+        return False
+    if data.startswith(LEGACY_PREFIXES):
+        return True
+    return data.startswith(CALLBACK_PREFIX) and decode_number_callback(data) is None
+
+
+class NumberCallbackFilter(BaseFilter):
+    """
+    Фильтр обработчика: пропускает кнопки с указанными действиями и передает
+    разобранные данные в обработчик под ключом `number_callback`.
+    """
+
+    def __init__(self, *actions: str):
+        self.actions = frozenset(actions)
+
+    async def __call__(self, callback: CallbackQuery) -> Union[bool, Dict[str, Any]]:
+        payload = decode_number_callback(callback.data)
+        if payload is None or payload.action not in self.actions:
+            return False
+        return {"number_callback": payload}
@@ -0,0 +1,255 @@
+"""
+Запуск бота в несколько процессов.
+
+При BOT_WORKERS > 1 main.py запускает BOT_WORKERS рабочих процессов, каждый
+со своим веб-сервером на локальном порту, и маршрутизатор на публичном
+порту. Маршрутизатор принимает webhook от Telegram и передает обновление
+процессу, выбранному по ID чата: все обновления одного чата обрабатываются
+одним процессом и по порядку. Остальные запросы (страница статуса, проверки)
+передаются первому процессу.
+
+Процессы работают с общей базой данных (PostgreSQL), состояния FSM хранятся
+в ней же (fsm_storage.py), а кэши согласуются через журнал сбросов
+(cache_sync.py).
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+# Количество рабочих процессов; 1 - обычный запуск в одном процессе
+BOT_WORKERS = max(1, int(os.getenv("BOT_WORKERS", "1")))
+
+# Номер текущего рабочего процесса (задается маршрутизатором); None вне кластера
+WORKER_INDEX = int(os.environ["BOT_WORKER_INDEX"]) if os.getenv("BOT_WORKER_INDEX") else None
+
+# Рабочие процессы слушают порты WORKER_BASE_PORT, WORKER_BASE_PORT + 1, ...
+WORKER_HOST = "127.0.0.1"
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", "5100"))
+
+# Сколько ждать запуска рабочих процессов (в секундах)
+WORKER_START_TIMEOUT = 60
+
+# Заголовки, которые передаются при проксировании GET-запросов
+_PROXY_REQUEST_HEADERS = ("Accept", "If-None-Match", "Last-Event-ID")
+_PROXY_RESPONSE_HEADERS = ("Content-Type", "ETag", "Cache-Control", "X-Accel-Buffering")
+
+# Поля обновления, в которых может быть чат или пользователь
+_CHAT_PATHS = (
+    ("message", "chat", "id"),
+    ("edited_message", "chat", "id"),
+    ("channel_post", "chat", "id"),
+    ("edited_channel_post", "chat", "id"),
+    ("callback_query", "message", "chat", "id"),
+    ("callback_query", "from", "id"),
+    ("inline_query", "from", "id"),
+    ("chosen_inline_result", "from", "id"),
+    ("shipping_query", "from", "id"),
+    ("pre_checkout_query", "from", "id"),
+    ("poll_answer", "user", "id"),
+    ("my_chat_member", "chat", "id"),
+    ("chat_member", "chat", "id"),
+    ("chat_join_request", "chat", "id"),
+)
+
+
+def is_cluster_worker() -> bool:
+    """Текущий процесс - рабочий процесс кластера"""
+    return WORKER_INDEX is not None
+
+
+def is_primary_worker() -> bool:
+    """Текущий процесс отвечает за общие действия (например, установку webhook)"""
+    return WORKER_INDEX in (None, 0)
+
+
+def chat_id_of(update: Dict[str, Any]) -> Optional[int]:
+    """
+    Находит ID чата (или пользователя) в обновлении Telegram.
+
+    Returns:
+        ID чата или None, если в обновлении его нет
+    """
+    for path in _CHAT_PATHS:
+        value: Any = update
+        for part in path:
+            if not isinstance(value, dict):
+                value = None
+                break
+            value = value.get(part)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def worker_for_update(update: Dict[str, Any], workers: int) -> int:
+    """Номер процесса для обновления: один и тот же для всех обновлений чата"""
+    chat_id = chat_id_of(update)
+    if chat_id is None:
+        return update.get("update_id", 0) % workers
+    return chat_id % workers
+
+
+class ClusterRouter:
+    """Маршрутизатор webhook: передает обновления рабочим процессам по ID чата"""
+
+    def __init__(self, worker_urls: List[str], webhook_path: str, secret: str):
+        self.worker_urls = worker_urls
+        self.webhook_path = webhook_path
+        self.secret = secret
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self, app: web.Application):
+        connector = aiohttp.TCPConnector(limit=0, limit_per_host=100)
+        self._session = aiohttp.ClientSession(connector=connector)
+
+    async def stop(self, app: web.Application):
+        if self._session:
+            await self._session.close()
+
+    async def handle_webhook(self, request: web.Request) -> web.Response:
+        """Проверяет секрет Telegram и передает обновление нужному процессу"""
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not secrets.compare_digest(token, self.secret):
+            return web.Response(status=401, text="Unauthorized")
+
+        body = await request.read()
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return web.Response(status=400, text="Bad Request")
+
+        worker = worker_for_update(update, len(self.worker_urls))
+        try:
+            async with self._session.post(
+                f"{self.worker_urls[worker]}{self.webhook_path}",
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Telegram-Bot-Api-Secret-Token": self.secret
+                }
+            ) as response:
+                # Ответ процесса (в том числе ошибка) возвращается Telegram, чтобы тот повторил доставку
+                return web.Response(status=response.status, body=await response.read())
+        except aiohttp.ClientError as e:
+            logging.error(f"Рабочий процесс {worker} недоступен: {e}")
+            return web.Response(status=502, text="Bad Gateway")
+
+    async def proxy_to_primary(self, request: web.Request) -> web.StreamResponse:
+        """Передает остальные GET-запросы первому процессу, в том числе поток /events"""
+        headers = {key: request.headers[key] for key in _PROXY_REQUEST_HEADERS if key in request.headers}
+        response = web.StreamResponse()
+        try:
+            async with self._session.get(
+                f"{self.worker_urls[0]}{request.rel_url}",
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=None)
+            ) as upstream:
+                response.set_status(upstream.status)
+                for key in _PROXY_RESPONSE_HEADERS:
+                    if key in upstream.headers:
+                        response.headers[key] = upstream.headers[key]
+                await response.prepare(request)
+                async for chunk in upstream.content.iter_any():
+                    await response.write(chunk)
+        except (aiohttp.ClientError, ConnectionResetError) as e:
+            # Процесс недоступен или соединение закрыто при остановке
+            if not response.prepared:
+                return web.Response(status=502, text=f"Bad Gateway: {e}")
+        return response
+
+
+def start_workers(workers: int, secret: str) -> List[subprocess.Popen]:
+    """Запускает рабочие процессы main.py на локальных портах"""
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    processes = []
+    for index in range(workers):
+        env = dict(os.environ)
+        env.update(
+            BOT_WORKER_INDEX=str(index),
+            BOT_MODE="webhook",
+            WEBHOOK_SECRET=secret,
+            WEBAPP_HOST=WORKER_HOST,
+            WEBAPP_PORT=str(WORKER_BASE_PORT + index)
+        )
+        processes.append(subprocess.Popen([sys.executable, main_path], env=env))
+    return processes
+
+
+def stop_workers(processes: List[subprocess.Popen], timeout: float = 30):
+    """Останавливает рабочие процессы и ждет их завершения"""
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+    for process in processes:
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def wait_for_workers(worker_urls: List[str], processes: List[subprocess.Popen]):
+    """Ждет, пока все рабочие процессы начнут отвечать на /healthz"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + WORKER_START_TIMEOUT
+    async with aiohttp.ClientSession() as session:
+        for url, process in zip(worker_urls, processes):
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Рабочий процесс {url} завершился при запуске")
+                try:
+                    async with session.get(f"{url}/healthz") as response:
+                        if response.status == 200:
+                            break
+                except aiohttp.ClientError:
+                    pass
+                if loop.time() > deadline:
+                    raise RuntimeError(f"Рабочий процесс {url} не запустился за {WORKER_START_TIMEOUT} сек.")
+                await asyncio.sleep(0.2)
+
+
+def run_cluster(host: str, port: int, webhook_path: str, secret: Optional[str] = None):
+    """
+    Запускает BOT_WORKERS рабочих процессов и маршрутизатор webhook на host:port.
+
+    Args:
+        host: Адрес публичного веб-сервера
+        port: Порт публичного веб-сервера
+        webhook_path: Путь webhook
+        secret: Секрет webhook (если не задан, генерируется общий для всех процессов)
+    """
+    from storage_db import initialize_db_storage
+
+    # Таблицы и начальные данные создаются один раз, до запуска процессов
+    initialize_db_storage()
+
+    secret = secret or secrets.token_urlsafe(32)
+    worker_urls = [f"http://{WORKER_HOST}:{WORKER_BASE_PORT + index}" for index in range(BOT_WORKERS)]
+    processes = start_workers(BOT_WORKERS, secret)
+    logging.info(f"Запущено рабочих процессов: {BOT_WORKERS}")
+
+    router = ClusterRouter(worker_urls, webhook_path, secret)
+
+    async def create_router_app() -> web.Application:
+        await wait_for_workers(worker_urls, processes)
+        app = web.Application()
+        app.on_startup.append(router.start)
+        # Закрытие сессии обрывает проксируемые потоки /events, чтобы остановка не ждала их
+        app.on_shutdown.append(router.stop)
+        app.router.add_post(webhook_path, router.handle_webhook)
+        app.router.add_get("/{tail:.*}", router.proxy_to_primary)
+        logging.info(f"Маршрутизатор webhook запущен на {host}:{port}{webhook_path}")
+        return app
+
+    try:
+        web.run_app(create_router_app(), host=host, port=port)
+    finally:
+        stop_workers(processes)
@@ -0,0 +1,194 @@
+"""
+Живая панель администратора.
+
+Администратор включает панель командой /dashboard (или кнопкой в меню
+администратора): бот отправляет и закрепляет сообщение со статистикой
+очереди, а фоновая задача периодически редактирует его, так что свежие
+данные видны без команд.
+
+Панель каждого вида отрисовывается один раз за проход и общая для всех
+подписанных администраторов. Сообщение редактируется, только если его
+содержимое изменилось; правки отправляются через общий Broadcaster и
+укладываются в лимиты Telegram вместе с остальными сообщениями бота.
+
+Подписки хранятся в таблице admin_dashboards, поэтому переживают
+перезапуск. При нескольких процессах панели обновляет только первый.
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, List, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from broadcast import get_broadcaster
+from templates import get_keyboard, register_keyboard
+
+# Как часто проверять, изменились ли данные панели (в секундах)
+DASHBOARD_REFRESH_INTERVAL = 5.0
+
+# Ошибки, после которых сообщение панели больше нельзя редактировать
+_GONE_ERRORS = ("message to edit not found", "message can't be edited", "chat not found", "bot was blocked")
+
+# (chat_id, message_id) -> отпечаток последнего показанного содержимого
+_shown: Dict[Tuple[str, int], int] = {}
+
+
+def render_queue_view(snapshot) -> str:
+    """
+    Формирует текст панели «Очередь» из снимка статистики.
+
+    Args:
+        snapshot: Снимок статистики StatsSnapshot
+
+    Returns:
+        Текст панели в разметке Markdown без времени обновления
+    """
+    from utils import format_date, format_duration
+
+    if not snapshot.count("waiting"):
+        eta = "очередь пуста"
+    elif snapshot.eta_seconds is None:
+        eta = "нет данных"
+    else:
+        eta = format_duration(snapshot.eta_seconds)
+    last_action = format_date(snapshot.last_admin_action_at) if snapshot.last_admin_action_at else "—"
+
+    return (
+        "📡 *Живая панель Narkoz Team*\n\n"
+        f"*Система:*\n"
+        f"├ Работа: {'✅ активна' if snapshot.work_status else '🚫 остановлена'}\n"
+        f"└ Модератор: {'🟢 в сети' if snapshot.moderator_status else '🔴 не в сети'}\n\n"
+        f"*Очередь:*\n"
+        f"├ В ожидании: {snapshot.count('waiting')}\n"
+        f"├ Ожидают кода: {snapshot.count('pending')}\n"
+        f"├ Обработано: {snapshot.count('processed')}\n"
+        f"├ Отклонено: {snapshot.count('rejected')}\n"
+        f"└ Всего номеров: {snapshot.total_numbers}\n\n"
+        f"*Темп:*\n"
+        f"├ Обработано за час: {snapshot.completed_recently}\n"
+        f"└ Очередь будет обработана: {eta}\n\n"
+        f"*Администраторы:*\n"
+        f"├ Активны за час: {snapshot.active_admins} из {snapshot.admin_count}\n"
+        f"└ Последнее действие: {last_action}"
+    )
+
+
+# Виды панели: имя -> функция отрисовки
+DASHBOARD_VIEWS: Dict[str, Callable] = {
+    "queue": render_queue_view,
+}
+
+
+register_keyboard("dashboard", [
+    [InlineKeyboardButton(text="⏹ Остановить панель", callback_data="dashboard_stop")]
+])
+
+
+def get_dashboard_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура под сообщением панели"""
+    return get_keyboard("dashboard")
+
+
+def render_dashboard(view: str = "queue") -> Tuple[str, int]:
+    """
+    Отрисовывает панель по текущему снимку статистики.
+
+    Returns:
+        (текст с временем обновления, отпечаток содержимого без времени)
+    """
+    from stats import get_stats_snapshot
+    from utils import get_moscow_time
+
+    render = DASHBOARD_VIEWS.get(view, render_queue_view)
+    body = render(get_stats_snapshot())
+    # Время обновления не входит в отпечаток, иначе панель менялась бы каждый проход
+    return f"{body}\n\n🔄 _Обновлено: {get_moscow_time()}_", hash(body)
+
+
+def mark_dashboard_shown(chat_id, message_id: int, fingerprint: int):
+    """Запоминает содержимое только что отправленной панели, чтобы не редактировать ее повторно"""
+    _shown[(str(chat_id), message_id)] = fingerprint
+
+
+async def refresh_dashboards(bot) -> int:
+    """
+    Один проход обновления: редактирует панели, содержимое которых изменилось.
+
+    Returns:
+        Количество отредактированных сообщений
+    """
+    from storage_db import get_admin_dashboards, get_admin_ids, remove_admin_dashboard
+    from utils import is_main_admin
+
+    dashboards = await asyncio.to_thread(get_admin_dashboards)
+    admin_ids = set(await asyncio.to_thread(get_admin_ids))
+
+    # Панели пользователей, которые больше не администраторы, отключаются
+    revoked = [
+        dashboard for dashboard in dashboards
+        if dashboard["admin_id"] not in admin_ids and not is_main_admin(dashboard["admin_id"])
+    ]
+    for dashboard in revoked:
+        logging.info(f"Панель отключена: {dashboard['admin_id']} больше не администратор")
+        await asyncio.to_thread(remove_admin_dashboard, dashboard["admin_id"])
+    if revoked:
+        dashboards = [dashboard for dashboard in dashboards if dashboard not in revoked]
+    active = {(dashboard["chat_id"], dashboard["message_id"]) for dashboard in dashboards}
+
+    # Забываем панели, которые были остановлены
+    for key in list(_shown):
+        if key not in active:
+            del _shown[key]
+
+    # Каждый вид отрисовывается один раз для всех подписанных администраторов
+    rendered: Dict[str, Tuple[str, int]] = {}
+    stale: List[dict] = []
+    for dashboard in dashboards:
+        view = dashboard["view"]
+        if view not in rendered:
+            rendered[view] = render_dashboard(view)
+        if _shown.get((dashboard["chat_id"], dashboard["message_id"])) != rendered[view][1]:
+            stale.append(dashboard)
+
+    if not stale:
+        return 0
+
+    broadcaster = get_broadcaster()
+    keyboard = get_dashboard_keyboard()
+
+    async def edit(dashboard: dict):
+        text, fingerprint = rendered[dashboard["view"]]
+        result = await broadcaster.deliver(
+            dashboard["chat_id"],
+            lambda: bot.edit_message_text(
+                text=text,
+                chat_id=dashboard["chat_id"],
+                message_id=dashboard["message_id"],
+                reply_markup=keyboard,
+                parse_mode="Markdown"
+            )
+        )
+        key = (dashboard["chat_id"], dashboard["message_id"])
+        if result.ok or "message is not modified" in (result.error or ""):
+            _shown[key] = fingerprint
+            return result.ok
+        if any(error in (result.error or "") for error in _GONE_ERRORS):
+            # Сообщение удалено или чат недоступен: панель больше не обновляем
+            logging.info(f"Панель администратора {dashboard['admin_id']} отключена: {result.error}")
+            await asyncio.to_thread(remove_admin_dashboard, dashboard["admin_id"], dashboard["message_id"])
+        else:
+            logging.warning(f"Не удалось обновить панель администратора {dashboard['admin_id']}: {result.error}")
+        return False
+
+    results = await asyncio.gather(*(edit(dashboard) for dashboard in stale))
+    return sum(1 for ok in results if ok)
+
+
+async def run_dashboard_refresher(bot, interval: float = DASHBOARD_REFRESH_INTERVAL):
+    """Фоновая задача: периодически обновляет живые панели администраторов"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_dashboards(bot)
+        except Exception as e:
+            logging.error(f"Ошибка при обновлении панелей администраторов: {e}")
@@ -2,6 +2,7 @@ import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 from models import Base, Admin, SystemSetting
+from metrics import instrument_engine
 
 # Получаем URL базы данных из переменных окружения
 DATABASE_URL = os.environ.get("DATABASE_URL")
@@ -31,6 +32,9 @@ else:
         pool_recycle=300
     )
 
+# Считаем запросы и их длительность для /metrics
+instrument_engine(engine)
+
 # Создаем фабрику сессий
 SessionFactory = sessionmaker(bind=engine)
 
@@ -42,6 +46,10 @@ def init_db():
     # Создаем все таблицы
     Base.metadata.create_all(engine)
     
+    # Добавляем колонки и индексы, которых нет в уже существующих таблицах
+    from migrations import run_migrations
+    run_migrations(engine)
+    
     session = Session()
     
     try:
@@ -0,0 +1,106 @@
+"""
+Проверка номеров на дубликаты без лишних запросов к базе.
+
+Один и тот же номер может стоять в очереди только у одного пользователя:
+это гарантирует уникальный индекс по phone_number среди незавершенных
+номеров (models.PhoneNumber). Чтобы не проверять базу при каждом
+добавлении, процесс держит в памяти фильтр Блума по всем номерам таблицы,
+построенный при запуске (storage_db.build_number_filter).
+
+Фильтр не дает ложноотрицательных ответов: если он говорит «номера нет»,
+номер в этом процессе не встречался, и его можно вставлять сразу. Ответ
+«возможно есть» означает обычную проверку запросом к базе. Номера,
+добавленные другими процессами после построения фильтра, сюда не попадают;
+для них дубликат ловит уникальный индекс при вставке.
+"""
+import hashlib
+import math
+import os
+from typing import Iterable, Optional
+
+# На сколько номеров рассчитан фильтр при запуске (фактический размер - не меньше удвоенного числа номеров)
+NUMBER_FILTER_CAPACITY = int(os.getenv("NUMBER_FILTER_CAPACITY", "1000000"))
+# Допустимая доля ложноположительных ответов при заполнении до расчетной емкости
+NUMBER_FILTER_ERROR_RATE = float(os.getenv("NUMBER_FILTER_ERROR_RATE", "0.01"))
+# Сколько номеров читается из базы за раз при построении фильтра
+NUMBER_FILTER_LOAD_BATCH = 10000
+
+
+class BloomFilter:
+    """Фильтр Блума над bytearray; k позиций получаются двойным хешированием blake2b"""
+
+    __slots__ = ("size", "hashes", "count", "_bits")
+
+    def __init__(self, capacity: int, error_rate: float = NUMBER_FILTER_ERROR_RATE):
+        capacity = max(capacity, 1)
+        # Стандартные формулы: m = -n*ln(p)/ln(2)^2 бит, k = m/n*ln(2) хешей
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for index in range(self.hashes):
+            yield (first + index * second) % self.size
+
+    def add(self, value: str) -> None:
+        """Добавляет значение в фильтр"""
+        bits = self._bits
+        for position in self._positions(value):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, value: str) -> bool:
+        """False - значения точно нет; True - значение, возможно, добавлялось"""
+        bits = self._bits
+        for position in self._positions(value):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __contains__(self, value: str) -> bool:
+        return self.might_contain(value)
+
+
+# Фильтр номеров этого процесса; None - еще не построен
+_number_filter: Optional[BloomFilter] = None
+
+
+def rebuild_number_filter(numbers: Iterable[str], expected: int = 0) -> BloomFilter:
+    """
+    Строит фильтр номеров заново и делает его текущим.
+
+    Args:
+        numbers: Все номера из таблицы phone_numbers
+        expected: Сколько номеров ожидается (для выбора размера фильтра)
+
+    Returns:
+        Новый фильтр
+    """
+    global _number_filter
+    number_filter = BloomFilter(max(NUMBER_FILTER_CAPACITY, expected * 2))
+    for number in numbers:
+        number_filter.add(number)
+    _number_filter = number_filter
+    return number_filter
+
+
+def number_might_exist(phone_number: str) -> bool:
+    """
+    Нужна ли проверка номера запросом к базе.
+
+    Пока фильтр не построен (например, в утилитах без запуска бота),
+    всегда возвращает True, и проверка идет по базе, как раньше.
+    """
+    if _number_filter is None:
+        return True
+    return _number_filter.might_contain(phone_number)
+
+
+def remember_number(phone_number: str) -> None:
+    """Добавляет номер в фильтр после успешной вставки"""
+    if _number_filter is not None:
+        _number_filter.add(phone_number)
@@ -0,0 +1,245 @@
+"""
+Выгрузка номеров в CSV или XLSX для администраторов (команда /export).
+
+Строки читаются из базы пачками (queries.export_rows) и сразу пишутся во
+временный файл, поэтому память не растет с количеством номеров. В файл
+попадают номер, статус, владелец (ID, имя пользователя, имя) и данные
+обработки: кто и когда обработал номер, отправлен и принят ли код.
+
+Даты в фильтрах и в файле - по московскому времени, как в сообщениях бота;
+в базе время хранится в UTC.
+
+XLSX требует openpyxl (необязательная зависимость, режим write_only пишет
+строки на диск по мере поступления). Без него доступен только CSV.
+
+Имена, примечания и другие строки, которые вводят пользователи, попадают в
+таблицу, открываемую в Excel. Значение, начинающееся с «=», «+», «-», «@»
+или табуляции, Excel выполнил бы как формулу, поэтому такие значения
+экранируются апострофом, а в XLSX еще и записываются явными строковыми
+ячейками. Управляющие символы удаляются: XLSX их не допускает.
+"""
+import csv
+import datetime
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import queries
+from utils import NUMBER_STATUS_CODES, get_status_text
+
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+except ImportError:  # openpyxl необязателен: без него выгрузка только в CSV
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "xlsx")
+# Ограничение Telegram на размер документа, отправляемого ботом
+EXPORT_MAX_FILE_SIZE = 50 * 1024 * 1024
+
+MOSCOW_TIMEZONE = datetime.timezone(datetime.timedelta(hours=3))
+_DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y")
+
+# Начало значения, с которого Excel читает формулу
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# Управляющие символы, недопустимые в XML (как openpyxl.cell.cell.ILLEGAL_CHARACTERS_RE)
+_CONTROL_CHARACTERS = re.compile(r"[\000-\010\013\014\016-\037]")
+
+EXPORT_COLUMNS = [
+    "ID", "Номер", "Статус", "ID пользователя", "Имя пользователя", "Имя", "Фамилия",
+    "Добавлен", "Изменен", "Обработан", "ID обработчика", "Код отправлен", "Код принят", "Примечание"
+]
+
+
+@dataclass(frozen=True)
+class ExportFilter:
+    """Параметры выгрузки: формат, статусы (пусто - все) и дни добавления (включительно)"""
+    fmt: str = "csv"
+    statuses: Tuple[str, ...] = ()
+    date_from: Optional[datetime.date] = None
+    date_to: Optional[datetime.date] = None
+
+
+def _parse_date(token: str) -> Optional[datetime.date]:
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(token, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_export_args(text: Optional[str]) -> ExportFilter:
+    """
+    Разбирает аргументы команды /export.
+
+    Порядок слов не важен: формат (csv или xlsx), статусы (waiting,
+    processed, ...) и до двух дат (ГГГГ-ММ-ДД или ДД.ММ.ГГГГ). Одна дата -
+    номера, добавленные с этого дня; две - за период включительно.
+
+    Args:
+        text: Аргументы команды
+
+    Returns:
+        Параметры выгрузки
+
+    Raises:
+        ValueError: Непонятное слово или неверный порядок дат (текст для пользователя)
+    """
+    fmt = "csv"
+    statuses: List[str] = []
+    dates: List[datetime.date] = []
+    for token in (text or "").split():
+        word = token.lower()
+        if word in EXPORT_FORMATS:
+            fmt = word
+        elif word in NUMBER_STATUS_CODES:
+            if word not in statuses:
+                statuses.append(word)
+        else:
+            date = _parse_date(word)
+            if date is None:
+                raise ValueError(f"Непонятный параметр: `{token.replace('`', '')}`")
+            dates.append(date)
+
+    if len(dates) > 2:
+        raise ValueError("Укажите не больше двух дат")
+    date_from = dates[0] if dates else None
+    date_to = dates[1] if len(dates) == 2 else None
+    if date_to is not None and date_to < date_from:
+        raise ValueError("Дата начала периода позже даты конца")
+    return ExportFilter(fmt, tuple(statuses), date_from, date_to)
+
+
+def _day_start_utc(date: datetime.date) -> datetime.datetime:
+    """Начало московского дня как наивное время UTC (в таком виде время хранится в базе)"""
+    start = datetime.datetime.combine(date, datetime.time(), tzinfo=MOSCOW_TIMEZONE)
+    return start.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _format_time(value: Optional[datetime.datetime]) -> str:
+    if value is None:
+        return ""
+    moscow_time = value.replace(tzinfo=datetime.timezone.utc).astimezone(MOSCOW_TIMEZONE)
+    return moscow_time.strftime("%d.%m.%Y %H:%M:%S")
+
+
+def _format_flag(value: Optional[bool]) -> str:
+    if value is None:
+        return ""
+    return "да" if value else "нет"
+
+
+def _safe_text(value: Optional[str]) -> str:
+    """Строка, которую Excel покажет как текст, а не выполнит как формулу"""
+    text = _CONTROL_CHARACTERS.sub("", value or "")
+    return "'" + text if text.startswith(_FORMULA_PREFIXES) else text
+
+
+def _export_row(row) -> list:
+    return [
+        row.id, row.phone_number, get_status_text(row.status), row.user_id,
+        _safe_text(row.username), _safe_text(row.first_name), _safe_text(row.last_name),
+        _format_time(row.created_at), _format_time(row.updated_at), _format_time(row.processed_at),
+        row.processor_id or "", _format_flag(row.code_sent), _format_flag(row.code_accepted), _safe_text(row.note)
+    ]
+
+
+def _csv_row(row) -> list:
+    values = _export_row(row)
+    # Номер «+7999...» Excel прочитал бы как число и потерял бы «+»
+    values[1] = _safe_text(values[1])
+    return values
+
+
+def _xlsx_row(sheet, row) -> list:
+    values = []
+    for value in _export_row(row):
+        if isinstance(value, str):
+            # Явная строковая ячейка: openpyxl не примет значение за формулу, Excel не переведет номер в число
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.data_type = "s"
+            value = cell
+        values.append(value)
+    return values
+
+
+def _rows(export_filter: ExportFilter):
+    created_from = _day_start_utc(export_filter.date_from) if export_filter.date_from else None
+    created_to = None
+    if export_filter.date_to is not None:
+        created_to = _day_start_utc(export_filter.date_to + datetime.timedelta(days=1))
+    return queries.export_rows(export_filter.statuses, created_from, created_to)
+
+
+def write_export(path: str, export_filter: ExportFilter) -> Optional[Dict[str, int]]:
+    """
+    Записывает выгрузку номеров в файл.
+
+    Args:
+        path: Путь к файлу (перезаписывается)
+        export_filter: Формат и фильтры
+
+    Returns:
+        Количество выгруженных номеров по статусам или None при ошибке базы данных или записи файла
+    """
+    counts: Counter = Counter()
+    try:
+        if export_filter.fmt == "xlsx":
+            workbook = openpyxl.Workbook(write_only=True)
+            sheet = workbook.create_sheet("Номера")
+            sheet.append(EXPORT_COLUMNS)
+            for row in _rows(export_filter):
+                counts[row.status] += 1
+                sheet.append(_xlsx_row(sheet, row))
+            summary = workbook.create_sheet("Статистика")
+            summary.append(["Статус", "Номеров"])
+            for status, count in counts.most_common():
+                summary.append([get_status_text(status), count])
+            summary.append(["Всего", sum(counts.values())])
+            workbook.save(path)
+        else:
+            # utf-8-sig и «;» - чтобы Excel открывал файл без мастера импорта
+            with open(path, "w", newline="", encoding="utf-8-sig") as file:
+                writer = csv.writer(file, delimiter=";")
+                writer.writerow(EXPORT_COLUMNS)
+                for row in _rows(export_filter):
+                    counts[row.status] += 1
+                    writer.writerow(_csv_row(row))
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in write_export: {e}")
+        return None
+    except OSError as e:
+        logger.error(f"Failed to write export file {path}: {e}")
+        return None
+    return dict(counts)
+
+
+def export_filename(export_filter: ExportFilter) -> str:
+    """Имя файла выгрузки с текущей датой по Москве"""
+    now = datetime.datetime.now(MOSCOW_TIMEZONE)
+    return f"numbers_{now.strftime('%Y%m%d_%H%M')}.{export_filter.fmt}"
+
+
+def export_summary(export_filter: ExportFilter, counts: Dict[str, int]) -> str:
+    """Подпись к файлу выгрузки: фильтры и количество номеров по статусам"""
+    lines = ["📤 *Выгрузка номеров*"]
+    if export_filter.statuses:
+        lines.append("├ Статусы: " + ", ".join(get_status_text(status) for status in export_filter.statuses))
+    if export_filter.date_from:
+        period = export_filter.date_from.strftime("%d.%m.%Y")
+        if export_filter.date_to:
+            period += " - " + export_filter.date_to.strftime("%d.%m.%Y")
+        else:
+            period = "с " + period
+        lines.append(f"├ Период: {period}")
+    for status, count in sorted(counts.items(), key=lambda item: -item[1]):
+        lines.append(f"├ {get_status_text(status)}: {count}")
+    lines.append(f"└ Всего: {sum(counts.values())}")
+    return "\n".join(lines)
@@ -0,0 +1,222 @@
+"""
+Хранилище состояний FSM в базе данных.
+
+MemoryStorage хранит состояния внутри одного процесса, поэтому при работе
+нескольких процессов бота (или после перезапуска) пользователь теряет
+начатый диалог, а брошенные состояния остаются в памяти навсегда.
+DatabaseStorage хранит состояние и данные в таблице fsm_states.
+
+Перед базой стоит ограниченный LRU-кэш: чтения обслуживаются из памяти,
+а изменения копятся и записываются пачкой в одной транзакции раз в
+FSM_FLUSH_INTERVAL секунд (или сразу, когда их набирается FSM_FLUSH_BATCH).
+Записи, к которым долго не обращались, вытесняются из памяти, а состояния,
+брошенные дольше FSM_STATE_TTL, удаляются и из базы.
+
+При нескольких процессах обновления одного чата всегда попадают в один и
+тот же процесс (cluster.py), поэтому кэш процесса не расходится с базой.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+# Сколько записей держать в памяти
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+
+# Через сколько секунд без обращений запись вытесняется из памяти
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "600"))
+
+# Через сколько секунд без изменений состояние считается брошенным и удаляется
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(24 * 3600)))
+
+# Пакетная запись изменений: интервал (в секундах) и размер пачки
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.5"))
+FSM_FLUSH_BATCH = 200
+
+# Как часто удалять брошенные состояния из базы (в секундах)
+FSM_SWEEP_INTERVAL = 600
+
+Record = Tuple[Optional[str], Dict[str, Any]]
+
+
+def build_storage_key(key: StorageKey) -> str:
+    """Строковый ключ записи: bot_id:chat_id:user_id:thread_id:destiny"""
+    thread_id = key.thread_id if key.thread_id is not None else ""
+    return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{thread_id}:{key.destiny}"
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class _Entry:
+    """Запись кэша: состояние, данные и время последнего обращения"""
+
+    __slots__ = ("state", "data", "touched_at")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any]):
+        self.state = state
+        self.data = data
+        self.touched_at = time.monotonic()
+
+
+class DatabaseStorage(BaseStorage):
+    """Хранилище FSM в таблице fsm_states с LRU-кэшем и пакетной записью"""
+
+    def __init__(
+        self,
+        cache_size: int = FSM_CACHE_SIZE,
+        cache_ttl: float = FSM_CACHE_TTL,
+        state_ttl: int = FSM_STATE_TTL,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        flush_batch: int = FSM_FLUSH_BATCH
+    ):
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.state_ttl = state_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Изменения, еще не записанные в базу: ключ -> (состояние, данные)
+        self._dirty: Dict[str, Record] = {}
+        self._flush_event: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+        self._swept_at = 0.0
+
+    async def _load(self, key: str) -> _Entry:
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry.touched_at <= self.cache_ttl:
+            entry.touched_at = now
+            self._entries.move_to_end(key)
+            return entry
+        if entry is not None:
+            # Запись устарела: перечитываем ее
+            del self._entries[key]
+
+        pending = self._dirty.get(key)
+        if pending is not None:
+            # Вытесненная, но еще не записанная запись
+            entry = _Entry(pending[0], pending[1])
+        else:
+            from storage_db import get_fsm_record
+
+            record = await asyncio.to_thread(get_fsm_record, key)
+            if key in self._entries:
+                # Пока шел запрос, запись загрузил параллельный обработчик того же чата
+                return await self._load(key)
+            entry = _Entry(record.get("state"), record.get("data") or {})
+
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: _Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        # Вытесняем давно не использованные записи; несохраненные остаются в self._dirty
+        while len(self._entries) > self.cache_size:
+            self._entries.popitem(last=False)
+
+    def _mark_dirty(self, key: str, entry: _Entry):
+        self._dirty[key] = (entry.state, dict(entry.data))
+        self._ensure_flusher()
+        if len(self._dirty) >= self.flush_batch:
+            self._flush_event.set()
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flush_event = asyncio.Event()
+            self._flusher = asyncio.create_task(self._run_flusher())
+
+    async def _run_flusher(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            if self._closing:
+                break
+            try:
+                await self.flush()
+                self._expire_idle()
+                if time.monotonic() - self._swept_at >= FSM_SWEEP_INTERVAL:
+                    await self.sweep()
+            except Exception as e:
+                logging.error(f"Ошибка при записи состояний FSM: {e}")
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные изменения в базу одной транзакцией.
+
+        Returns:
+            Количество записанных изменений
+        """
+        from storage_db import save_fsm_records
+
+        if not self._dirty:
+            return 0
+
+        batch = dict(self._dirty)
+        if not await asyncio.to_thread(save_fsm_records, batch):
+            # Изменения остаются в очереди и будут записаны следующей попыткой
+            return 0
+
+        # Записи, измененные во время сохранения, остаются в очереди
+        for key, record in batch.items():
+            if self._dirty.get(key) is record:
+                del self._dirty[key]
+        return len(batch)
+
+    def _expire_idle(self):
+        """Вытесняет из памяти записи, к которым давно не обращались"""
+        deadline = time.monotonic() - self.cache_ttl
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.touched_at > deadline:
+                break
+            self._entries.popitem(last=False)
+
+    async def sweep(self) -> int:
+        """Удаляет из базы состояния, брошенные дольше state_ttl секунд"""
+        from storage_db import delete_expired_fsm_records
+
+        self._swept_at = time.monotonic()
+        return await asyncio.to_thread(delete_expired_fsm_records, self.state_ttl)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record_key = build_storage_key(key)
+        entry = await self._load(record_key)
+        entry.state = _state_name(state)
+        self._mark_dirty(record_key, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = await self._load(build_storage_key(key))
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record_key = build_storage_key(key)
+        entry = await self._load(record_key)
+        entry.data = dict(data)
+        self._mark_dirty(record_key, entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = await self._load(build_storage_key(key))
+        return dict(entry.data)
+
+    async def close(self) -> None:
+        """Останавливает фоновую запись и сохраняет оставшиеся изменения"""
+        # Задача не отменяется, а завершается сама: отмена во время wait_for
+        # может потеряться, и остановка зависнет
+        self._closing = True
+        if self._flusher is not None:
+            self._flush_event.set()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
@@ -1,13 +1,30 @@
+import asyncio
+import logging
+import os
+import tempfile
+
 from aiogram import Dispatcher, F, types
-from aiogram.filters import Command
-from aiogram.types import CallbackQuery
+from aiogram.filters import Command, CommandObject
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import (
+    CallbackQuery,
+    FSInputFile,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent
+)
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from dataclasses import replace
+from typing import Union
 
 from keyboards import (
     get_admin_menu_keyboard,
     get_back_keyboard,
     get_admin_numbers_keyboard,
+    get_number_search_keyboard,
     get_work_status_keyboard,
     get_admin_number_actions_keyboard,
     get_admin_confirmation_keyboard,
@@ -15,15 +32,17 @@ from keyboards import (
 )
 
 from storage_db import (
-    get_all_numbers,
+    get_all_number_rows,
+    get_phone_by_id,
+    search_numbers,
     update_number_status,
-    get_work_status,
     set_work_status,
-    get_moderator_status,
     set_moderator_status,
     get_admin_ids,
     add_admin_id,
     remove_admin_id,
+    save_admin_dashboard,
+    remove_admin_dashboard,
     get_user_info,
     save_user_info,
     get_phone_details,
@@ -31,13 +50,21 @@ from storage_db import (
     update_number_status_with_notification
 )
 
+from broadcast import get_broadcaster
+from dashboard import get_dashboard_keyboard, mark_dashboard_shown, render_dashboard
+from export import EXPORT_MAX_FILE_SIZE, export_filename, export_summary, openpyxl, parse_export_args, write_export
+from callbacks import STALE_BUTTON_TEXT, NumberCallback, NumberCallbackFilter, encode_number_callback
+from middlewares import UserContext
+from navigation import show_screen
+from stats import get_stats_snapshot
+
 from utils import (
     get_status_emoji,
     get_status_text,
     get_status_description,
     format_date,
-    notify_user,
-    get_moscow_time
+    get_moscow_time,
+    is_admin
 )
 
 # Состояния для обработки скриншотов кодов и сообщений
@@ -50,16 +77,25 @@ class AdminChangeStatusForm(StatesGroup):
     waiting_for_status = State()
     waiting_for_confirmation = State()
 
+async def resolve_number_callback(callback: CallbackQuery, number_callback: NumberCallback, owner_id: str = None) -> dict:
+    """
+    Find the number a button refers to by primary key.
+    
+    If the number no longer exists (or belongs to another user when owner_id is given),
+    the callback is answered with an alert and an empty dict is returned.
+    """
+    phone = get_phone_by_id(number_callback.phone_id)
+    if not phone or (owner_id is not None and phone["user_id"] != owner_id):
+        await callback.answer(STALE_BUTTON_TEXT, show_alert=True)
+        return {}
+    return phone
+
 # Обработчик команды /work - проверка прав администратора
-async def work_command(message: types.Message):
+async def work_command(message: types.Message, user_context: UserContext):
     """Handler for /work command that gives access to admin panel"""
-    user_id = message.from_user.id
-    
     # Проверяем, является ли пользователь администратором
-    admin_ids = get_admin_ids()
-    
-    if str(user_id) in admin_ids or user_id in admin_ids:
-        await show_admin_menu(message)
+    if user_context.is_admin:
+        await show_admin_menu(message, user_context)
     else:
         await message.answer(
             "❌ *У вас нет доступа к административной панели*\n\n"
@@ -67,35 +103,32 @@ async def work_command(message: types.Message):
             parse_mode="Markdown"
         )
 
-async def show_admin_menu(message: types.Message):
-    """Display the admin panel menu"""
+async def show_admin_menu(target: Union[types.Message, CallbackQuery], user_context: UserContext):
+    """Display the admin panel menu (edits the menu message when target is a callback)"""
     # Получаем текущие статусы
-    work_status = get_work_status()
+    work_status = user_context.work_status
     work_emoji = "✅" if work_status else "🚫"
     
-    moderator_status = get_moderator_status()
+    moderator_status = user_context.moderator_status
     moderator_emoji = "🟢" if moderator_status else "🔴"
     
     # Получаем московское время
     moscow_time = get_moscow_time()
     
-    # Общее количество номеров
-    all_numbers = get_all_numbers()
-    total_users = len(all_numbers)
-    total_numbers = sum(len(nums) for nums in all_numbers.values())
+    # Общая статистика берется из снимка, который обновляется в фоне
+    snapshot = get_stats_snapshot()
+    total_users = snapshot.total_users
+    total_numbers = snapshot.total_numbers
     
-    waiting_count = len([n for user_nums in all_numbers.values() for n, status in user_nums.items() if status == "waiting"])
-    processed_count = len([n for user_nums in all_numbers.values() for n, status in user_nums.items() if status == "processed"])
-    rejected_count = len([n for user_nums in all_numbers.values() for n, status in user_nums.items() if status == "rejected"])
+    waiting_count = snapshot.count("waiting")
+    processed_count = snapshot.count("processed")
+    rejected_count = snapshot.count("rejected")
     
     # Проверяем, является ли пользователь главным администратором
-    from utils import is_main_admin
-    user_id = str(message.from_user.id)
-    is_user_main_admin = is_main_admin(user_id)
+    is_user_main_admin = user_context.is_main_admin
     
     # Получаем общее количество администраторов
-    from storage_db import get_admin_ids
-    admin_count = len(get_admin_ids())
+    admin_count = snapshot.admin_count
     
     # Форматируем сообщение администратора
     text = (
@@ -125,19 +158,19 @@ async def show_admin_menu(message: types.Message):
     # Получаем клавиатуру для админ-меню в соответствии с правами
     keyboard = get_admin_menu_keyboard(is_main_admin=is_user_main_admin)
     
-    await message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(target, text, reply_markup=keyboard, parse_mode="Markdown")
 
-async def callback_admin_menu(callback: CallbackQuery):
+async def callback_admin_menu(callback: CallbackQuery, user_context: UserContext):
     """Handler for returning to admin menu"""
     await callback.answer()  # Отвечаем на запрос
-    await show_admin_menu(callback.message)
+    await show_admin_menu(callback, user_context)
 
-async def callback_toggle_work(callback: CallbackQuery):
+async def callback_toggle_work(callback: CallbackQuery, user_context: UserContext):
     """Handler for toggling work status"""
     await callback.answer()  # Отвечаем на запрос
     
     # Получаем текущий статус работы
-    current_status = get_work_status()
+    current_status = user_context.work_status
     
     # Меняем статус на противоположный
     new_status = not current_status
@@ -152,14 +185,14 @@ async def callback_toggle_work(callback: CallbackQuery):
     )
     
     # Возвращаемся в меню администратора
-    await show_admin_menu(callback.message)
+    await show_admin_menu(callback.message, replace(user_context, work_status=new_status))
 
-async def callback_toggle_moderator(callback: CallbackQuery):
+async def callback_toggle_moderator(callback: CallbackQuery, user_context: UserContext):
     """Handler for toggling moderator status"""
     await callback.answer()  # Отвечаем на запрос
     
     # Получаем текущий статус модератора
-    current_status = get_moderator_status()
+    current_status = user_context.moderator_status
     
     # Меняем статус на противоположный
     new_status = not current_status
@@ -174,16 +207,17 @@ async def callback_toggle_moderator(callback: CallbackQuery):
     )
     
     # Возвращаемся в меню администратора
-    await show_admin_menu(callback.message)
+    await show_admin_menu(callback.message, replace(user_context, moderator_status=new_status))
 
 async def callback_admin_numbers(callback: CallbackQuery):
     """Handler for viewing all numbers as admin"""
     await callback.answer()  # Отвечаем на запрос
     
-    all_numbers = get_all_numbers()
+    all_numbers = get_all_number_rows()
     
     if not all_numbers:
-        await callback.message.answer(
+        await show_screen(
+            callback,
             "📭 *В системе пока нет номеров*",
             reply_markup=get_back_keyboard("admin_menu"),
             parse_mode="Markdown"
@@ -199,20 +233,198 @@ async def callback_admin_numbers(callback: CallbackQuery):
     # Получаем клавиатуру для всех номеров
     keyboard = get_admin_numbers_keyboard(all_numbers)
     
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(callback, text, reply_markup=keyboard, parse_mode="Markdown")
+
+# Размер страницы результатов поиска номеров (в сообщении и в inline-режиме)
+SEARCH_PAGE_SIZE = 10
+INLINE_SEARCH_PAGE_SIZE = 20
 
-async def callback_number_action(callback: CallbackQuery, state: FSMContext):
+SEARCH_HINT = (
+    "🔍 *Поиск номера*\n\n"
+    "Отправьте `/find` и запрос:\n"
+    "├ `/find +7999` - по началу номера\n"
+    "├ `/find 4567` - по последним цифрам\n"
+    "└ `/find @username` - по имени пользователя\n\n"
+    "Те же запросы работают в inline-режиме: наберите имя бота и запрос в любом чате."
+)
+
+async def show_search_page(target: Union[types.Message, CallbackQuery], query: str, offset: int):
+    """Display one page of number search results"""
+    rows = search_numbers(query, limit=SEARCH_PAGE_SIZE + 1, offset=offset)
+    has_more = len(rows) > SEARCH_PAGE_SIZE
+    rows = rows[:SEARCH_PAGE_SIZE]
+    
+    # Обратные кавычки в запросе сломали бы разметку
+    shown_query = query.replace("`", "")
+    if not rows:
+        await show_screen(
+            target,
+            f"🔍 По запросу `{shown_query}` ничего не найдено",
+            reply_markup=get_back_keyboard("admin_menu"),
+            parse_mode="Markdown"
+        )
+        return
+    
+    text = (
+        f"🔍 *Результаты поиска:* `{shown_query}`\n"
+        f"└ Показаны {offset + 1}-{offset + len(rows)}"
+    )
+    keyboard = get_number_search_keyboard(rows, offset, SEARCH_PAGE_SIZE, has_more)
+    
+    await show_screen(target, text, reply_markup=keyboard, parse_mode="Markdown")
+
+async def find_command(message: types.Message, command: CommandObject, state: FSMContext, user_context: UserContext):
+    """Handler for /find command that searches numbers by prefix, last digits or username"""
+    if not user_context.is_admin:
+        await message.answer(
+            "❌ *У вас нет доступа к административной панели*\n\n"
+            "Обратитесь к главному администратору для получения прав.",
+            parse_mode="Markdown"
+        )
+        return
+    
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer(SEARCH_HINT, reply_markup=get_back_keyboard("admin_menu"), parse_mode="Markdown")
+        return
+    
+    # Запрос сохраняется для кнопок перехода между страницами
+    await state.update_data(search_query=query)
+    await show_search_page(message, query, 0)
+
+EXPORT_HINT = (
+    "📤 *Выгрузка номеров*\n\n"
+    "`/export [csv|xlsx] [статусы] [с] [по]`\n"
+    "├ `/export` - все номера в CSV\n"
+    "├ `/export xlsx processed` - обработанные номера в Excel\n"
+    "├ `/export 01.05.2024` - добавленные с 1 мая\n"
+    "└ `/export waiting 2024-05-01 2024-05-31` - ожидающие, добавленные в мае\n\n"
+    "Статусы: `waiting`, `processed`, `rejected`, `in_progress`, `failed`, `pending`, `canceled`, `expired`."
+)
+
+async def export_command(message: types.Message, command: CommandObject, user_context: UserContext):
+    """Handler for /export command that sends numbers as a CSV or XLSX document"""
+    if not user_context.is_admin:
+        await message.answer(
+            "❌ *У вас нет доступа к административной панели*\n\n"
+            "Обратитесь к главному администратору для получения прав.",
+            parse_mode="Markdown"
+        )
+        return
+    
+    try:
+        export_filter = parse_export_args(command.args)
+    except ValueError as e:
+        await message.answer(f"❌ {e}\n\n{EXPORT_HINT}", parse_mode="Markdown")
+        return
+    if export_filter.fmt == "xlsx" and openpyxl is None:
+        await message.answer("❌ Выгрузка в XLSX недоступна: не установлен openpyxl. Используйте CSV.")
+        return
+    
+    await message.answer("⏳ Готовлю выгрузку...")
+    file_descriptor, path = tempfile.mkstemp(suffix=f".{export_filter.fmt}")
+    os.close(file_descriptor)
+    try:
+        # Файл пишется в отдельном потоке, чтобы не останавливать обработку других сообщений
+        counts = await asyncio.to_thread(write_export, path, export_filter)
+        if counts is None:
+            await message.answer("❌ Не удалось выгрузить номера. Попробуйте позже.")
+            return
+        if not counts:
+            await message.answer("📭 Нет номеров, подходящих под условия выгрузки.")
+            return
+        if os.path.getsize(path) > EXPORT_MAX_FILE_SIZE:
+            await message.answer(
+                "❌ Файл выгрузки больше 50 МБ, Telegram не примет его.\n"
+                "Сузьте выгрузку по статусам или датам."
+            )
+            return
+        
+        await message.answer_document(
+            FSInputFile(path, filename=export_filename(export_filter)),
+            caption=export_summary(export_filter, counts),
+            parse_mode="Markdown"
+        )
+    except TelegramAPIError as e:
+        logging.error(f"Failed to send export to {message.from_user.id}: {e}")
+        await message.answer("❌ Не удалось отправить файл выгрузки.")
+    finally:
+        os.remove(path)
+
+async def callback_find_page(callback: CallbackQuery, state: FSMContext, user_context: UserContext):
+    """Handler for switching pages of number search results"""
+    await callback.answer()  # Отвечаем на запрос
+    if not user_context.is_admin:
+        return
+    
+    raw_offset = callback.data.split(":")[1]
+    query = (await state.get_data()).get("search_query")
+    if query is None or not raw_offset.isdigit():
+        await show_screen(callback, SEARCH_HINT, reply_markup=get_back_keyboard("admin_menu"), parse_mode="Markdown")
+        return
+    
+    await show_search_page(callback, query, int(raw_offset))
+
+async def inline_number_search(inline_query: InlineQuery):
+    """Handler for inline number search: admins type the bot name and a query in any chat"""
+    if not is_admin(inline_query.from_user.id):
+        await inline_query.answer([], cache_time=300, is_personal=True)
+        return
+    
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    rows = search_numbers(inline_query.query, limit=INLINE_SEARCH_PAGE_SIZE + 1, offset=offset)
+    has_more = len(rows) > INLINE_SEARCH_PAGE_SIZE
+    
+    results = []
+    for phone in rows[:INLINE_SEARCH_PAGE_SIZE]:
+        status_text = f"{get_status_emoji(phone['status'])} {get_status_text(phone['status'])}"
+        user_mention = f"@{phone['username']}" if phone["username"] else f"ID:{phone['user_id']}"
+        
+        # Выбранный результат отправляется сообщением с кнопкой действий над номером
+        results.append(InlineQueryResultArticle(
+            id=str(phone["id"]),
+            title=f"{phone['phone_number']} - {status_text}",
+            description=user_mention,
+            input_message_content=InputTextMessageContent(
+                message_text=f"📱 *Номер:* `{phone['phone_number']}`\n├ Статус: {status_text}\n└ Пользователь: {user_mention}",
+                parse_mode="Markdown"
+            ),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(
+                    text="⚙️ Действия с номером",
+                    callback_data=encode_number_callback("number_action", phone["id"])
+                )
+            ]])
+        ))
+    
+    await inline_query.answer(
+        results,
+        cache_time=5,
+        is_personal=True,
+        next_offset=str(offset + INLINE_SEARCH_PAGE_SIZE) if has_more else ""
+    )
+
+async def callback_number_action(
+    callback: CallbackQuery,
+    state: FSMContext,
+    number_callback: NumberCallback,
+    user_context: UserContext
+):
     """Handler for selecting an action for a specific number"""
+    if not user_context.is_admin:
+        await callback.answer()
+        return
+    
+    # Номер ищется по первичному ключу из данных кнопки
+    phone = await resolve_number_callback(callback, number_callback)
+    if not phone:
+        return
     await callback.answer()  # Отвечаем на запрос
     
-    # Извлекаем номер из данных callback
-    # Формат данных: "number_action:user_id:phone_number"
-    data_parts = callback.data.split(":")
-    user_id = data_parts[1]
-    phone_number = data_parts[2]
+    phone_number = phone["phone_number"]
     
     # Сохраняем данные в state
-    await state.update_data(user_id=user_id, phone_number=phone_number)
+    await state.update_data(user_id=phone["user_id"], phone_number=phone_number, phone_id=phone["id"])
     
     text = (
         f"📱 *Действия с номером:* `{phone_number}`\n\n"
@@ -220,20 +432,29 @@ async def callback_number_action(callback: CallbackQuery, state: FSMContext):
     )
     
     # Клавиатура с действиями для номера
-    keyboard = get_admin_number_actions_keyboard(user_id, phone_number)
+    keyboard = get_admin_number_actions_keyboard(phone)
     
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(callback, text, reply_markup=keyboard, parse_mode="Markdown")
 
-async def callback_set_status(callback: CallbackQuery, state: FSMContext):
+async def callback_set_status(
+    callback: CallbackQuery,
+    state: FSMContext,
+    number_callback: NumberCallback,
+    user_context: UserContext
+):
     """Handler for setting status of a number"""
+    if not user_context.is_admin:
+        await callback.answer()
+        return
+    
+    phone = await resolve_number_callback(callback, number_callback)
+    if not phone:
+        return
     await callback.answer()  # Отвечаем на запрос
     
-    # Извлекаем данные из callback
-    # Формат данных: "set_status:user_id:phone_number:new_status"
-    data_parts = callback.data.split(":")
-    user_id = data_parts[1]
-    phone_number = data_parts[2]
-    new_status = data_parts[3]
+    user_id = phone["user_id"]
+    phone_number = phone["phone_number"]
+    new_status = number_callback.status
     
     # Получаем эмодзи и текст статуса
     status_emoji = get_status_emoji(new_status)
@@ -246,11 +467,7 @@ async def callback_set_status(callback: CallbackQuery, state: FSMContext):
         # Если информация о пользователе отсутствует, сохраняем базовые данные
         save_user_info(user_id, "", "Пользователь", f"ID:{user_id}")
     
-    # Обновляем статус номера с сохранением деталей для уведомления
-    note = f"Статус изменен администратором {callback.from_user.full_name}"
-    update_number_status_with_notification(user_id, phone_number, new_status, note)
-    
-    # Отправляем уведомление пользователю о смене статуса
+    # Текст уведомления пользователю о смене статуса
     status_description = get_status_description(new_status)
     notification_text = (
         f"📢 *Обновление статуса номера*\n\n"
@@ -259,13 +476,23 @@ async def callback_set_status(callback: CallbackQuery, state: FSMContext):
         f"{status_description}"
     )
     
-    # Асинхронно отправляем уведомление
-    bot = callback.bot
-    try:
-        await notify_user(bot, user_id, notification_text)
-        notification_result = "✅ Уведомление отправлено пользователю"
-    except Exception as e:
-        notification_result = f"❌ Ошибка при отправке уведомления: {str(e)}"
+    # Статус и уведомление сохраняются одной транзакцией;
+    # доставкой занимается фоновый диспетчер outbox
+    note = f"Статус изменен администратором {callback.from_user.full_name}"
+    updated = update_number_status_with_notification(
+        user_id,
+        phone_number,
+        new_status,
+        note,
+        notification_text=notification_text,
+        processor_id=callback.from_user.id,
+        phone_id=phone["id"]
+    )
+    
+    if updated:
+        notification_result = "📨 Уведомление поставлено в очередь на отправку пользователю"
+    else:
+        notification_result = "❌ Номер не найден, уведомление не отправлено"
     
     # Сообщаем админу об успешном изменении статуса
     admin_message = (
@@ -281,18 +508,26 @@ async def callback_set_status(callback: CallbackQuery, state: FSMContext):
         parse_mode="Markdown"
     )
 
-async def callback_send_code(callback: CallbackQuery, state: FSMContext):
+async def callback_send_code(
+    callback: CallbackQuery,
+    state: FSMContext,
+    number_callback: NumberCallback,
+    user_context: UserContext
+):
     """Handler for sending code screenshot to user"""
+    if not user_context.is_admin:
+        await callback.answer()
+        return
+    
+    phone = await resolve_number_callback(callback, number_callback)
+    if not phone:
+        return
     await callback.answer()  # Отвечаем на запрос
     
-    # Извлекаем данные из callback
-    # Формат данных: "send_code:user_id:phone_number"
-    data_parts = callback.data.split(":")
-    user_id = data_parts[1]
-    phone_number = data_parts[2]
+    phone_number = phone["phone_number"]
     
     # Сохраняем данные в state
-    await state.update_data(user_id=user_id, phone_number=phone_number)
+    await state.update_data(user_id=phone["user_id"], phone_number=phone_number, phone_id=phone["id"])
     
     # Устанавливаем состояние ожидания скриншота
     await state.set_state(AdminCodeForm.waiting_for_screenshot)
@@ -362,9 +597,10 @@ async def callback_confirm_code_sending(callback: CallbackQuery, state: FSMConte
     data = await state.get_data()
     target_user_id = data.get("user_id")
     phone_number = data.get("phone_number")
+    phone_id = data.get("phone_id")
     file_id = data.get("file_id")
     
-    if not all([target_user_id, phone_number, file_id]):
+    if not all([target_user_id, phone_number, phone_id, file_id]):
         await callback.message.answer(
             "❌ *Ошибка*\n\n"
             "Не удалось получить все необходимые данные. Попробуйте снова.",
@@ -382,8 +618,8 @@ async def callback_confirm_code_sending(callback: CallbackQuery, state: FSMConte
         # Создаем кнопки для пользователя: "Буду вводить" и "Не буду вводить"
         user_keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
             [
-                types.InlineKeyboardButton(text="✅ Буду вводить", callback_data=f"code_response:yes:{phone_number}"),
-                types.InlineKeyboardButton(text="❌ Не буду вводить", callback_data=f"code_response:no:{phone_number}")
+                types.InlineKeyboardButton(text="✅ Буду вводить", callback_data=encode_number_callback("code_yes", phone_id)),
+                types.InlineKeyboardButton(text="❌ Не буду вводить", callback_data=encode_number_callback("code_no", phone_id))
             ]
         ])
         
@@ -445,20 +681,21 @@ async def callback_cancel_code_sending(callback: CallbackQuery, state: FSMContex
         parse_mode="Markdown"
     )
 
-async def callback_code_response(callback: CallbackQuery):
+async def callback_code_response(callback: CallbackQuery, user_context: UserContext, number_callback: NumberCallback):
     """Handler for user's response to code"""
+    user_id = str(callback.from_user.id)
+    
+    # Ответить можно только по своему номеру
+    phone = await resolve_number_callback(callback, number_callback, owner_id=user_id)
+    if not phone:
+        return
     await callback.answer()  # Отвечаем на запрос
     
-    # Извлекаем данные из callback
-    # Формат данных: "code_response:response:phone_number"
-    data_parts = callback.data.split(":")
-    response = data_parts[1]  # yes или no
-    phone_number = data_parts[2]
-    user_id = str(callback.from_user.id)
+    response = "yes" if number_callback.action == "code_yes" else "no"
+    phone_number = phone["phone_number"]
     
     # Получаем информацию о пользователе
-    from storage_db import get_user_info
-    user_info = get_user_info(user_id) or {}
+    user_info = user_context.user_info
     username = user_info.get("username", "")
     first_name = user_info.get("first_name", "Неизвестный пользователь")
     last_name = user_info.get("last_name", "")
@@ -488,7 +725,6 @@ async def callback_code_response(callback: CallbackQuery):
         )
         
         # Отправляем уведомление всем администраторам
-        from storage_db import get_admin_ids
         admin_ids = get_admin_ids()
         
         # Формируем текст уведомления для админов
@@ -501,33 +737,26 @@ async def callback_code_response(callback: CallbackQuery):
             f"❗ Номер был автоматически удален из системы."
         )
         
-        # Отправляем уведомления всем администраторам
-        bot = callback.bot
-        for admin_id in admin_ids:
-            try:
-                await bot.send_message(
-                    chat_id=admin_id,
-                    text=admin_notification,
-                    parse_mode="Markdown"
-                )
-            except Exception:
-                # Игнорируем ошибки при отправке конкретному администратору
-                continue
+        # Отправляем уведомления всем администраторам параллельно;
+        # неудачные доставки записываются в лог рассыльщиком
+        await get_broadcaster().broadcast(
+            callback.bot,
+            admin_ids,
+            admin_notification,
+            parse_mode="Markdown"
+        )
 
 # Состояния для добавления администратора
 class AdminAddAdminForm(StatesGroup):
     waiting_for_user_id = State()
 
 # Обработчики для управления администраторами
-async def callback_manage_admins(callback: CallbackQuery):
+async def callback_manage_admins(callback: CallbackQuery, user_context: UserContext):
     """Handler for managing admins"""
     await callback.answer()  # Отвечаем на запрос
     
     # Проверяем, является ли пользователь главным администратором
-    from utils import is_main_admin
-    user_id = str(callback.from_user.id)
-    
-    if not is_main_admin(user_id):
+    if not user_context.is_main_admin:
         await callback.message.answer(
             "🚫 *Недостаточно прав*\n\n"
             "Только главные администраторы могут управлять списком администраторов.",
@@ -537,7 +766,6 @@ async def callback_manage_admins(callback: CallbackQuery):
         return
     
     # Получаем список администраторов
-    from storage_db import get_admin_ids
     admin_ids = get_admin_ids()
     
     # Получаем московское время
@@ -556,15 +784,12 @@ async def callback_manage_admins(callback: CallbackQuery):
     
     await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
 
-async def callback_add_admin(callback: CallbackQuery, state: FSMContext):
+async def callback_add_admin(callback: CallbackQuery, state: FSMContext, user_context: UserContext):
     """Handler for adding a new admin"""
     await callback.answer()  # Отвечаем на запрос
     
     # Проверяем, является ли пользователь главным администратором
-    from utils import is_main_admin
-    user_id = str(callback.from_user.id)
-    
-    if not is_main_admin(user_id):
+    if not user_context.is_main_admin:
         await callback.message.answer(
             "🚫 *Недостаточно прав*\n\n"
             "Только главные администраторы могут добавлять администраторов.",
@@ -601,7 +826,6 @@ async def process_add_admin(message: types.Message, state: FSMContext):
         return
     
     # Проверяем, не является ли пользователь уже администратором
-    from storage_db import get_admin_ids, add_admin_id
     admin_ids = get_admin_ids()
     
     if new_admin_id in admin_ids:
@@ -658,15 +882,12 @@ async def process_add_admin(message: types.Message, state: FSMContext):
         )
         await state.clear()
 
-async def callback_remove_admin(callback: CallbackQuery):
+async def callback_remove_admin(callback: CallbackQuery, user_context: UserContext):
     """Handler for removing an admin"""
     await callback.answer()  # Отвечаем на запрос
     
     # Проверяем, является ли пользователь главным администратором
-    from utils import is_main_admin
-    user_id = str(callback.from_user.id)
-    
-    if not is_main_admin(user_id):
+    if not user_context.is_main_admin:
         await callback.message.answer(
             "🚫 *Недостаточно прав*\n\n"
             "Только главные администраторы могут удалять администраторов.",
@@ -680,6 +901,7 @@ async def callback_remove_admin(callback: CallbackQuery):
     admin_id_to_remove = callback.data.split(":")[1]
     
     # Проверяем, не является ли удаляемый администратор главным
+    from utils import is_main_admin
     if is_main_admin(admin_id_to_remove):
         await callback.message.answer(
             "🚫 *Невозможно удалить главного администратора*\n\n"
@@ -690,7 +912,6 @@ async def callback_remove_admin(callback: CallbackQuery):
         return
     
     # Удаляем администратора
-    from storage_db import remove_admin_id
     success = remove_admin_id(admin_id_to_remove)
     
     if success:
@@ -730,16 +951,73 @@ async def callback_remove_admin(callback: CallbackQuery):
             parse_mode="Markdown"
         )
 
+async def start_dashboard(message: types.Message, admin_id: str):
+    """Send and pin a live dashboard message, replacing the admin's previous one"""
+    text, fingerprint = render_dashboard()
+    sent = await message.answer(text, reply_markup=get_dashboard_keyboard(), parse_mode="Markdown")
+    mark_dashboard_shown(sent.chat.id, sent.message_id, fingerprint)
+    
+    # Закрепление необязательно: без прав на закрепление панель просто обновляется
+    try:
+        await message.bot.pin_chat_message(sent.chat.id, sent.message_id, disable_notification=True)
+    except TelegramAPIError as e:
+        logging.info(f"Не удалось закрепить панель администратора {admin_id}: {e}")
+    
+    previous = save_admin_dashboard(admin_id, sent.chat.id, sent.message_id)
+    if previous:
+        try:
+            await message.bot.unpin_chat_message(previous["chat_id"], message_id=previous["message_id"])
+        except TelegramAPIError:
+            pass
+
+async def dashboard_command(message: types.Message, user_context: UserContext):
+    """Handler for /dashboard command that starts the live admin dashboard"""
+    if not user_context.is_admin:
+        await message.answer(
+            "❌ *У вас нет доступа к административной панели*\n\n"
+            "Обратитесь к главному администратору для получения прав.",
+            parse_mode="Markdown"
+        )
+        return
+    await start_dashboard(message, user_context.user_id)
+
+async def callback_dashboard_start(callback: CallbackQuery, user_context: UserContext):
+    """Handler for starting the live dashboard from the admin menu"""
+    await callback.answer()  # Отвечаем на запрос
+    if not user_context.is_admin:
+        return
+    await start_dashboard(callback.message, user_context.user_id)
+
+async def callback_dashboard_stop(callback: CallbackQuery):
+    """Handler for stopping the live dashboard"""
+    await callback.answer("Панель остановлена")
+    
+    remove_admin_dashboard(callback.from_user.id, callback.message.message_id)
+    try:
+        await callback.bot.unpin_chat_message(callback.message.chat.id, message_id=callback.message.message_id)
+        await callback.message.edit_reply_markup(reply_markup=None)
+    except TelegramAPIError:
+        pass
+
 def register_admin_handlers(dp: Dispatcher):
     """Register all admin-related handlers"""
     # Команды
     dp.message.register(work_command, Command("work"))
+    dp.message.register(dashboard_command, Command("dashboard"))
+    dp.message.register(find_command, Command("find"))
+    dp.message.register(export_command, Command("export"))
+    
+    # Поиск номеров в inline-режиме
+    dp.inline_query.register(inline_number_search)
     
     # Callback обработчики для админ-меню
     dp.callback_query.register(callback_admin_menu, F.data == "admin_menu")
     dp.callback_query.register(callback_toggle_work, F.data == "toggle_work")
     dp.callback_query.register(callback_toggle_moderator, F.data == "toggle_moderator")
     dp.callback_query.register(callback_admin_numbers, F.data == "admin_numbers")
+    dp.callback_query.register(callback_dashboard_start, F.data == "dashboard_start")
+    dp.callback_query.register(callback_dashboard_stop, F.data == "dashboard_stop")
+    dp.callback_query.register(callback_find_page, F.data.startswith("find_page:"))
     
     # Обработчики для управления администраторами
     dp.callback_query.register(callback_manage_admins, F.data == "manage_admins")
@@ -758,17 +1036,17 @@ def register_admin_handlers(dp: Dispatcher):
     # Callback обработчики для работы с номерами
     dp.callback_query.register(
         callback_number_action,
-        F.data.startswith("number_action:")
+        NumberCallbackFilter("number_action")
     )
     
     dp.callback_query.register(
         callback_set_status,
-        F.data.startswith("set_status:")
+        NumberCallbackFilter("set_status")
     )
     
     dp.callback_query.register(
         callback_send_code,
-        F.data.startswith("send_code:")
+        NumberCallbackFilter("send_code")
     )
     
     # Обработчики для подтверждения отправки кода
@@ -785,7 +1063,7 @@ def register_admin_handlers(dp: Dispatcher):
     # Обработчик ответа пользователя на код
     dp.callback_query.register(
         callback_code_response,
-        F.data.startswith("code_response:")
+        NumberCallbackFilter("code_yes", "code_no")
     )
     
     # Обработчики сообщений с состояниями
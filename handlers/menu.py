@@ -1,100 +1,114 @@
 from aiogram import Dispatcher, F, types
 from aiogram.filters import Command
 from aiogram.types import CallbackQuery
+from typing import Union
 
 from keyboards import get_main_menu_keyboard, get_back_keyboard
-from storage_db import get_work_status, get_queue_count, get_user_queue_count, get_moderator_status
+from middlewares import UserContext
+from navigation import show_screen
+from stats import get_stats_snapshot
+from storage_db import get_user_queue_count
+from templates import register_template
 from utils import get_moscow_time
 
-async def start_command(message: types.Message):
+# Тексты экранов разбираются один раз, при отправке подставляются только поля
+MAIN_MENU_TEMPLATE = register_template("main_menu", (
+    "👋 *Добро пожаловать в GOLD TEAM*\n\n"
+    "⏰ *Время сервера: {moscow_time}*\n\n"
+    "*О сервисе:*\n"
+    "Narkoz Team - команда, которая берёт WhatsApp аккаунты в аренду.\n\n"
+    "📊 *Информация:*\n"
+    "└ Статус работы: {work_emoji}\n"
+    "└ Общая очередь: {queue_count} номеров\n"
+    "└ Ваши номера: {user_queue_count} номеров\n\n"
+    "👥 *Модерация:*\n"
+    "└ Статус: {moderator_emoji} {moderator_text}\n"
+    "└ Время обработки: до 30 минут\n\n"
+    "*Часы работы:*\n"
+    "└ Ежедневно: с 9:00 до 20:00 (МСК)\n\n"
+    "ℹ️ Используйте кнопки меню ниже для навигации"
+))
+
+GROUP_TEMPLATE = register_template("group", (
+    "📢 *Наша группа Narkoz Team*\n\n"
+    "Подписывайтесь на нашу официальную группу, чтобы быть в курсе всех обновлений, акций и важных новостей!\n\n"
+    "🔗 [Narkoz Team Группа](https://t.me/+j28PRQtxybplMTMy)\n\n"
+    "В группе вы найдете:\n"
+    "- Анонсы новых функций\n"
+    "- Информацию о техническом обслуживании\n"
+    "- Советы по эффективному использованию сервиса\n"
+    "- Возможность задать вопросы администраторам\n\n"
+    "Присоединяйтесь сейчас!"
+))
+
+PRICES_TEMPLATE = register_template("prices", (
+    "💸 *Прайс-лист на услуги*\n"
+    "⏰ _Актуально на {moscow_time}_\n\n"
+    "1 час - 10$\n"
+    "2 часа - 13$\n"
+    "3 часа - 16$\n\n"
+    "‼️ Есть обьем - есть бонусы!"
+))
+
+async def start_command(message: types.Message, user_context: UserContext):
     """Handler for /start command that shows the main menu"""
-    await show_main_menu(message)
+    await show_main_menu(message, user_context)
 
-async def show_main_menu(message: types.Message):
-    """Display the main menu with status information"""
+async def show_main_menu(target: Union[types.Message, CallbackQuery], user_context: UserContext):
+    """Display the main menu with status information (edits the menu message when target is a callback)"""
     # Get current statuses
-    work_status = get_work_status()
+    work_status = user_context.work_status
     work_emoji = "✅" if work_status else "🚫"
     
-    queue_count = get_queue_count()
-    user_queue_count = get_user_queue_count(message.from_user.id)
+    queue_count = get_stats_snapshot().total_numbers
+    user_queue_count = get_user_queue_count(user_context.user_id)
     
-    moderator_status = get_moderator_status()
+    moderator_status = user_context.moderator_status
     moderator_emoji = "🟢" if moderator_status else "🔴"
     
-    # Получаем текущее время в московском часовом поясе
-    moscow_time = get_moscow_time()
-    
-    # Format the welcome message with improved design
-    text = (
-        "👋 *Добро пожаловать в GOLD TEAM*\n\n"
-        "⏰ *Время сервера: " + Moscow_time + "*\n\n"
-        "*О сервисе:*\n"
-        "Narkoz Team - команда, которая берёт WhatsApp аккаунты в аренду.\n\n"
-        "📊 *Информация:*\n"
-        f"└ Статус работы: {work_emoji}\n"
-        f"└ Общая очередь: {queue_count} номеров\n"
-        f"└ Ваши номера: {user_queue_count} номеров\n\n"
-        f"👥 *Модерация:*\n"
-        f"└ Статус: {moderator_emoji} {'онлайн' if moderator_status else 'оффлайн'}\n"
-        f"└ Время обработки: до 30 минут\n\n"
-        "*Часы работы:*\n"
-        "└ Ежедневно: с 9:00 до 20:00 (МСК)\n\n"
-        "ℹ️ Используйте кнопки меню ниже для навигации"
+    # Fill only the dynamic slots of the precompiled welcome message
+    text = MAIN_MENU_TEMPLATE.render(
+        moscow_time=get_moscow_time(),
+        work_emoji=work_emoji,
+        queue_count=queue_count,
+        user_queue_count=user_queue_count,
+        moderator_emoji=moderator_emoji,
+        moderator_text="онлайн" if moderator_status else "оффлайн"
     )
     
     # Get the keyboard for main menu
     keyboard = get_main_menu_keyboard()
     
     # Send message with keyboard
-    await message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(target, text, reply_markup=keyboard, parse_mode="Markdown")
 
-async def callback_return_to_main(callback: CallbackQuery):
+async def callback_return_to_main(callback: CallbackQuery, user_context: UserContext):
     """Handler for returning to the main menu via callback"""
     await callback.answer()  # Answer the callback query
-    await show_main_menu(callback.message)
+    await show_main_menu(callback, user_context)
 
 async def callback_group(callback: CallbackQuery):
     """Handler for the Group button in main menu"""
     await callback.answer()  # Answer the callback query
     
-    text = (
-        "📢 *Наша группа Narkoz Team*\n\n"
-        "Подписывайтесь на нашу официальную группу, чтобы быть в курсе всех обновлений, акций и важных новостей!\n\n"
-        "🔗 [Narkoz Team Группа](https://t.me/+j28PRQtxybplMTMy)\n\n"
-        "В группе вы найдете:\n"
-        "- Анонсы новых функций\n"
-        "- Информацию о техническом обслуживании\n"
-        "- Советы по эффективному использованию сервиса\n"
-        "- Возможность задать вопросы администраторам\n\n"
-        "Присоединяйтесь сейчас!"
-    )
+    text = GROUP_TEMPLATE.render()
     
     # Get back keyboard
     keyboard = get_back_keyboard("main_menu")
     
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown", disable_web_page_preview=True)
+    await show_screen(callback, text, reply_markup=keyboard, parse_mode="Markdown", disable_web_page_preview=True)
 
 async def callback_prices(callback: CallbackQuery):
     """Handler for the Prices button in main menu"""
     await callback.answer()  # Answer the callback query
     
-    # Получаем текущее время в московском часовом поясе
-    moscow_time = get_moscow_time()
-    
-    text = (
-        "💸 *Прайс-лист на услуги*\n"
-        f"⏰ _Актуально на {moscow_time}_\n\n"
-        "1 час - 10$\n"
-        "2 часа - 13$\n"
-        "3 часа - 16$\n\n"
-        "‼️ Есть обьем - есть бонусы!"
-    )
+    # Подставляем текущее время в московском часовом поясе
+    text = PRICES_TEMPLATE.render(moscow_time=get_moscow_time())
     
     # Get back keyboard
     keyboard = get_back_keyboard("main_menu")
     
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(callback, text, reply_markup=keyboard, parse_mode="Markdown")
 
 def register_menu_handlers(dp: Dispatcher):
     """Register all menu-related handlers"""
@@ -10,31 +10,36 @@ from keyboards import (
     get_delete_numbers_keyboard
 )
 from storage_db import (
+    NUMBER_ADDED,
+    NUMBER_DUPLICATE,
     add_number_to_queue,
+    get_active_number_owner,
     remove_number_from_queue,
     get_user_numbers,
     get_user_stats
 )
-from utils import validate_phone_number, format_phone_number, get_moscow_time
+from middlewares import UserContext
+from navigation import show_screen
+from utils import validate_phone_number, format_phone_number, get_moscow_time, notify_admins
 
 # Define states for adding a number
 class AddNumberForm(StatesGroup):
     waiting_for_number = State()
 
-async def callback_numbers_menu(callback: CallbackQuery):
+async def callback_numbers_menu(callback: CallbackQuery, user_context: UserContext):
     """Handler for the Numbers button in main menu"""
     await callback.answer()  # Answer the callback query
     
     # Проверяем статус работы
-    from storage_db import get_work_status
-    work_status = get_work_status()
+    work_status = user_context.work_status
     
     # Если работа не активна, то блокируем доступ к функционалу
     if not work_status:
         # Получаем московское время
         moscow_time = get_moscow_time()
         
-        await callback.message.answer(
+        await show_screen(
+            callback,
             "🚫 *Работа сейчас не активна*\n\n"
             f"⏰ Время проверки: {moscow_time}\n\n"
             "На данный момент использование бота невозможно. "
@@ -73,22 +78,22 @@ async def callback_numbers_menu(callback: CallbackQuery):
     # Get the keyboard for numbers menu
     keyboard = get_numbers_menu_keyboard()
     
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(callback, text, reply_markup=keyboard, parse_mode="Markdown")
 
-async def callback_add_number(callback: CallbackQuery, state: FSMContext):
+async def callback_add_number(callback: CallbackQuery, state: FSMContext, user_context: UserContext):
     """Handler for the Add Number button in numbers menu"""
     await callback.answer()  # Answer the callback query
     
     # Проверяем статус работы
-    from storage_db import get_work_status
-    work_status = get_work_status()
+    work_status = user_context.work_status
     
     # Если работа не активна, то блокируем доступ к функционалу
     if not work_status:
         # Получаем московское время
         moscow_time = get_moscow_time()
         
-        await callback.message.answer(
+        await show_screen(
+            callback,
             "🚫 *Работа сейчас не активна*\n\n"
             f"⏰ Время проверки: {moscow_time}\n\n"
             "На данный момент использование бота невозможно. "
@@ -105,7 +110,7 @@ async def callback_add_number(callback: CallbackQuery, state: FSMContext):
         "*Рекомендации:*\n"
         "├ Используйте только активные номера\n"
         "├ Убедитесь, что номер прогрет\n"
-        "└ Номер должен начинаться с '+' и содержать только цифры\n\n"
+        "└ Номер можно ввести с пробелами и дефисами: `+7 999 888-77-66`\n\n"
         "Введите номер телефона сейчас:"
     )
     
@@ -115,7 +120,7 @@ async def callback_add_number(callback: CallbackQuery, state: FSMContext):
     # Get back keyboard
     keyboard = get_back_keyboard("numbers_menu")
     
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(callback, text, reply_markup=keyboard, parse_mode="Markdown")
 
 async def process_add_number(message: types.Message, state: FSMContext):
     """Process the number input when adding a number"""
@@ -127,10 +132,10 @@ async def process_add_number(message: types.Message, state: FSMContext):
         await message.answer(
             "❌ *Некорректный формат номера*\n\n"
             "Номер должен:\n"
-            "• Начинаться со знака '+'\n"
-            "• Содержать не менее 10 цифр\n"
-            "• Содержать только цифры после '+'\n\n"
-            "Пример: `+79998887766`\n\n"
+            "• Начинаться с кода страны (`+7...`) или с `8` для России\n"
+            "• Содержать только цифры, пробелы, скобки и дефисы\n"
+            "• Иметь правильную для страны длину\n\n"
+            "Пример: `+79998887766` или `8 999 888-77-66`\n\n"
             "Пожалуйста, введите номер еще раз:",
             reply_markup=get_back_keyboard("numbers_menu"),
             parse_mode="Markdown"
@@ -152,7 +157,36 @@ async def process_add_number(message: types.Message, state: FSMContext):
     save_user_info(user_id, username, first_name, last_name)
     
     # Add number to queue
-    add_number_to_queue(user_id, phone_number)
+    result = add_number_to_queue(user_id, phone_number)
+    
+    if result == NUMBER_DUPLICATE:
+        await state.clear()
+        await message.answer(
+            f"⚠️ *Номер уже в очереди*\n\n"
+            f"Телефон `{phone_number}` уже добавлен другим пользователем и ожидает обработки.\n"
+            f"Повторно добавить его нельзя.",
+            reply_markup=get_numbers_menu_keyboard(),
+            parse_mode="Markdown"
+        )
+        
+        owner_id = get_active_number_owner(phone_number)
+        await notify_admins(
+            message.bot,
+            f"⚠️ *Попытка добавить дубликат номера*\n\n"
+            f"Номер: `{phone_number}`\n"
+            f"Отправитель: `{user_id}`\n"
+            f"Уже в очереди у: `{owner_id or 'неизвестно'}`"
+        )
+        return
+    
+    if result != NUMBER_ADDED:
+        await message.answer(
+            "❌ *Не удалось добавить номер*\n\n"
+            "Попробуйте еще раз немного позже.",
+            reply_markup=get_back_keyboard("numbers_menu"),
+            parse_mode="Markdown"
+        )
+        return
     
     # Сохраняем дополнительную информацию о номере
     save_phone_details(
@@ -183,7 +217,8 @@ async def callback_delete_number(callback: CallbackQuery):
     user_numbers = get_user_numbers(user_id)
     
     if not user_numbers:
-        await callback.message.answer(
+        await show_screen(
+            callback,
             "📭 *У вас нет номеров в очереди*\n\n"
             "Сначала добавьте номер через меню «➕ Добавить»",
             reply_markup=get_back_keyboard("numbers_menu"),
@@ -209,7 +244,7 @@ async def callback_delete_number(callback: CallbackQuery):
     # Get keyboard with user's numbers
     keyboard = get_delete_numbers_keyboard(user_numbers)
     
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(callback, text, reply_markup=keyboard, parse_mode="Markdown")
 
 async def callback_delete_specific_number(callback: CallbackQuery):
     """Handler for deleting a specific number"""
@@ -223,7 +258,8 @@ async def callback_delete_specific_number(callback: CallbackQuery):
     # Remove the number from queue
     remove_number_from_queue(user_id, phone_number)
     
-    await callback.message.answer(
+    await show_screen(
+        callback,
         f"✅ *Номер успешно удален!*\n\n"
         f"Телефон `{phone_number}` был удален из очереди.\n\n"
         f"Вы всегда можете добавить новые номера через кнопку «➕ Добавить»",
@@ -239,7 +275,8 @@ async def callback_show_queue(callback: CallbackQuery):
     user_numbers = get_user_numbers(user_id)
     
     if not user_numbers:
-        await callback.message.answer(
+        await show_screen(
+            callback,
             "📭 *У вас пока нет номеров в очереди*\n\nДобавьте номер с помощью кнопки «➕ Добавить»",
             reply_markup=get_back_keyboard("numbers_menu"),
             parse_mode="Markdown"
@@ -322,7 +359,7 @@ async def callback_show_queue(callback: CallbackQuery):
     # Get back keyboard
     keyboard = get_back_keyboard("numbers_menu")
     
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(callback, text, reply_markup=keyboard, parse_mode="Markdown")
 
 async def callback_show_stats(callback: CallbackQuery):
     """Handler for showing user statistics"""
@@ -365,11 +402,11 @@ async def callback_show_stats(callback: CallbackQuery):
     # Get back keyboard
     keyboard = get_back_keyboard("numbers_menu")
     
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode="Markdown")
+    await show_screen(callback, text, reply_markup=keyboard, parse_mode="Markdown")
 
-async def callback_back_to_numbers(callback: CallbackQuery, state: FSMContext):
+async def callback_back_to_numbers(callback: CallbackQuery, state: FSMContext, user_context: UserContext):
     """Handler for going back to numbers menu"""
-    await callback.answer()  # Answer the callback query
+    # callback_numbers_menu answers the callback query itself
     
     # Clear any ongoing state
     current_state = await state.get_state()
@@ -377,7 +414,7 @@ async def callback_back_to_numbers(callback: CallbackQuery, state: FSMContext):
         await state.clear()
     
     # Return to numbers menu
-    await callback_numbers_menu(callback)
+    await callback_numbers_menu(callback, user_context)
 
 def register_numbers_handlers(dp: Dispatcher):
     """Register all numbers-related handlers"""
@@ -0,0 +1,197 @@
+"""
+Проверки живости и готовности для /healthz и /readyz.
+
+Все замеры (задержка цикла событий, время ответа базы данных и Telegram)
+выполняются фоновыми задачами по таймеру, а маршруты только читают
+последние результаты. Поэтому частые запросы проверок не создают
+нагрузки на базу данных и Bot API.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Как часто замерять задержку цикла событий (в секундах)
+LOOP_LAG_INTERVAL = 1.0
+
+# Как часто проверять базу данных и Telegram (в секундах)
+DB_PROBE_INTERVAL = 10.0
+TELEGRAM_PROBE_INTERVAL = 30.0
+
+# Пороговые значения для готовности
+MAX_LOOP_LAG = 1.0           # секунды
+MAX_DB_LATENCY = 2.0         # секунды
+PROBE_STALE_FACTOR = 3       # результат устарел, если проверка не обновлялась столько интервалов
+
+_started_at = time.time()
+
+# Последние результаты проверок
+_loop_lag: float = 0.0
+_db_probe: Dict[str, Any] = {}
+_telegram_probe: Dict[str, Any] = {}
+_last_update_at: Optional[float] = None
+
+# Способ получения обновлений и признак того, что он работает
+_ingestion_mode: Optional[str] = None
+_ingestion_running: Optional[Callable[[], bool]] = None
+
+
+def mark_update_processed():
+    """Запоминает время последнего успешно обработанного обновления"""
+    global _last_update_at
+    _last_update_at = time.time()
+
+
+def set_ingestion(mode: str, is_running: Callable[[], bool]):
+    """
+    Регистрирует способ получения обновлений.
+
+    Args:
+        mode: "polling" или "webhook"
+        is_running: Функция без аргументов, возвращающая True, пока прием обновлений работает
+    """
+    global _ingestion_mode, _ingestion_running
+    _ingestion_mode = mode
+    _ingestion_running = is_running
+
+
+def _pool_status() -> Dict[str, Any]:
+    from db_init import engine
+
+    pool = engine.pool
+    status: Dict[str, Any] = {"class": type(pool).__name__}
+    try:
+        size = pool.size()
+        checked_out = pool.checkedout()
+        capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+        status.update(
+            size=size,
+            checked_out=checked_out,
+            overflow=pool.overflow(),
+            saturation=round(checked_out / capacity, 3) if capacity else 0.0
+        )
+    except (AttributeError, NotImplementedError):
+        # У некоторых пулов (например, StaticPool) нет этих счетчиков
+        pass
+    return status
+
+
+def _probe_db() -> Dict[str, Any]:
+    from sqlalchemy import text
+    from db_init import engine
+
+    started = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return {"ok": True, "latency": round(time.perf_counter() - started, 4), "checked_at": time.time()}
+    except Exception as e:
+        return {
+            "ok": False,
+            "latency": round(time.perf_counter() - started, 4),
+            "error": str(e),
+            "checked_at": time.time()
+        }
+
+
+async def _probe_telegram(bot) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        result: Dict[str, Any] = {"ok": True}
+        if _ingestion_mode == "webhook":
+            # В режиме webhook заодно видно очередь и последние ошибки доставки
+            info = await bot.get_webhook_info()
+            result.update(
+                pending_update_count=info.pending_update_count,
+                last_error_message=info.last_error_message
+            )
+        else:
+            await bot.get_me()
+        result.update(latency=round(time.perf_counter() - started, 4), checked_at=time.time())
+        return result
+    except Exception as e:
+        return {
+            "ok": False,
+            "latency": round(time.perf_counter() - started, 4),
+            "error": str(e),
+            "checked_at": time.time()
+        }
+
+
+async def _measure_loop_lag(interval: float):
+    global _loop_lag
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        # Насколько позже запланированного нас разбудили
+        _loop_lag = max(0.0, loop.time() - started - interval)
+
+
+async def _run_db_probe(interval: float):
+    global _db_probe
+    while True:
+        _db_probe = await asyncio.to_thread(_probe_db)
+        if not _db_probe["ok"]:
+            logging.warning(f"Проверка базы данных не прошла: {_db_probe['error']}")
+        await asyncio.sleep(interval)
+
+
+async def _run_telegram_probe(bot, interval: float):
+    global _telegram_probe
+    while True:
+        _telegram_probe = await _probe_telegram(bot)
+        if not _telegram_probe["ok"]:
+            logging.warning(f"Проверка Telegram API не прошла: {_telegram_probe['error']}")
+        await asyncio.sleep(interval)
+
+
+async def run_health_probes(bot):
+    """Фоновая задача: периодически обновляет результаты всех проверок"""
+    await asyncio.gather(
+        _measure_loop_lag(LOOP_LAG_INTERVAL),
+        _run_db_probe(DB_PROBE_INTERVAL),
+        _run_telegram_probe(bot, TELEGRAM_PROBE_INTERVAL)
+    )
+
+
+def liveness() -> Dict[str, Any]:
+    """Данные для /healthz: процесс жив и цикл событий отвечает"""
+    return {
+        "status": "ok",
+        "uptime": round(time.time() - _started_at, 1),
+        "event_loop_lag": round(_loop_lag, 4)
+    }
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    Данные для /readyz.
+
+    Returns:
+        Словарь с результатами проверок; ключ "ready" - итоговая готовность
+    """
+    now = time.time()
+    ingestion_running = bool(_ingestion_running and _ingestion_running())
+
+    # Зависшая проверка (например, заблокированная база) не должна оставлять старый "ok"
+    db_fresh = now - _db_probe.get("checked_at", 0) <= PROBE_STALE_FACTOR * DB_PROBE_INTERVAL
+    telegram_fresh = now - _telegram_probe.get("checked_at", 0) <= PROBE_STALE_FACTOR * TELEGRAM_PROBE_INTERVAL
+
+    checks = {
+        "event_loop": _loop_lag <= MAX_LOOP_LAG,
+        "database": bool(_db_probe.get("ok")) and db_fresh and _db_probe["latency"] <= MAX_DB_LATENCY,
+        "telegram": bool(_telegram_probe.get("ok")) and telegram_fresh,
+        "ingestion": ingestion_running
+    }
+
+    return {
+        "ready": all(checks.values()),
+        "checks": checks,
+        "event_loop_lag": round(_loop_lag, 4),
+        "database": dict(_db_probe, pool=_pool_status()),
+        "telegram": dict(_telegram_probe),
+        "ingestion": {"mode": _ingestion_mode, "running": ingestion_running},
+        "last_update_at": _last_update_at,
+        "seconds_since_last_update": round(now - _last_update_at, 1) if _last_update_at else None
+    }
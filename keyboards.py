@@ -1,50 +1,76 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from callbacks import encode_number_callback
+from templates import get_keyboard, register_keyboard
+
+# Статические клавиатуры собираются один раз при импорте (см. templates.py)
+register_keyboard("main_menu", [
+    [InlineKeyboardButton(text="📱 Номера", callback_data="numbers")],
+    [InlineKeyboardButton(text="📢 Группа", callback_data="group")],
+    [InlineKeyboardButton(text="💸 Прайсы", callback_data="prices")],
+    [InlineKeyboardButton(text="ℹ️ Информация", callback_data="info")]
+])
+
+register_keyboard("numbers_menu", [
+    [
+        InlineKeyboardButton(text="➕ Добавить", callback_data="add_number"),
+        InlineKeyboardButton(text="🗑️ Удалить", callback_data="delete_number")
+    ],
+    [
+        InlineKeyboardButton(text="📝 Очередь", callback_data="show_queue"),
+        InlineKeyboardButton(text="🌐 Статистика", callback_data="show_stats")
+    ],
+    [InlineKeyboardButton(text="⬅️ Назад в главное меню", callback_data="main_menu")]
+])
+
+register_keyboard("info", [
+    [
+        InlineKeyboardButton(text="👼 Тех.Поддержка", url="https://t.me/XRAHITELb")
+    ],
+    [
+        InlineKeyboardButton(text="👥 Группа", url="https://t.me/+j28PRQtxybplMTMy")
+    ],
+    [
+        InlineKeyboardButton(text="🛠️ Разработчик бота", url="https://t.me/Quest_Tag")
+    ],
+    [
+        InlineKeyboardButton(text="⬅️ Назад в главное меню", callback_data="main_menu")
+    ]
+])
+
+# Текст кнопки «Назад» в зависимости от того, куда она ведет
+_BACK_BUTTON_SUFFIXES = {
+    "main_menu": " в главное меню",
+    "numbers_menu": " в меню номеров",
+    "admin_menu": " в меню администратора",
+}
 
 def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     """Create main menu keyboard"""
-    buttons = [
-        [InlineKeyboardButton(text="📱 Номера", callback_data="numbers")],
-        [InlineKeyboardButton(text="📢 Группа", callback_data="group")],
-        [InlineKeyboardButton(text="💸 Прайсы", callback_data="prices")],
-        [InlineKeyboardButton(text="ℹ️ Информация", callback_data="info")]
-    ]
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-    return keyboard
+    return get_keyboard("main_menu")
 
 def get_numbers_menu_keyboard() -> InlineKeyboardMarkup:
     """Create keyboard for the numbers menu"""
-    buttons = [
-        [
-            InlineKeyboardButton(text="➕ Добавить", callback_data="add_number"),
-            InlineKeyboardButton(text="🗑️ Удалить", callback_data="delete_number")
-        ],
-        [
-            InlineKeyboardButton(text="📝 Очередь", callback_data="show_queue"),
-            InlineKeyboardButton(text="🌐 Статистика", callback_data="show_stats")
-        ],
-        [InlineKeyboardButton(text="⬅️ Назад в главное меню", callback_data="main_menu")]
-    ]
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-    return keyboard
+    return get_keyboard("numbers_menu")
+
+def get_info_keyboard() -> InlineKeyboardMarkup:
+    """Create keyboard with useful links for the info screen"""
+    return get_keyboard("info")
 
 def get_back_keyboard(back_to: str) -> InlineKeyboardMarkup:
     """Create a keyboard with only a back button"""
     # The back_to parameter determines where the back button will go
-    text = "⬅️ Назад"
-    if back_to == "main_menu":
-        text += " в главное меню"
-    elif back_to == "numbers_menu":
-        text += " в меню номеров"
-    elif back_to == "admin_menu":
-        text += " в меню администратора"
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=text, callback_data=back_to)]
-    ])
-    
-    return keyboard
+    name = f"back:{back_to}"
+    try:
+        return get_keyboard(name)
+    except KeyError:
+        # Клавиатура для нового направления собирается при первом запросе
+        text = "⬅️ Назад" + _BACK_BUTTON_SUFFIXES.get(back_to, "")
+        return register_keyboard(name, [
+            [InlineKeyboardButton(text=text, callback_data=back_to)]
+        ])
+
+for _back_to in (*_BACK_BUTTON_SUFFIXES, "admin_numbers"):
+    get_back_keyboard(_back_to)
 
 def get_my_numbers_keyboard(numbers: dict) -> InlineKeyboardMarkup:
     """Create a keyboard showing user's numbers"""
@@ -81,15 +107,15 @@ def get_delete_numbers_keyboard(numbers: dict) -> InlineKeyboardMarkup:
 
 # Клавиатуры для административной панели
 
-def get_admin_menu_keyboard(is_main_admin=False) -> InlineKeyboardMarkup:
-    """Create keyboard for admin menu"""
+def _admin_menu_rows(is_main_admin: bool) -> list:
     buttons = [
         [
             InlineKeyboardButton(text="📱 Номера", callback_data="admin_numbers"),
             InlineKeyboardButton(text="📊 Статус работы", callback_data="toggle_work")
         ],
         [
-            InlineKeyboardButton(text="👨‍💼 Статус модератора", callback_data="toggle_moderator")
+            InlineKeyboardButton(text="👨‍💼 Статус модератора", callback_data="toggle_moderator"),
+            InlineKeyboardButton(text="📡 Живая панель", callback_data="dashboard_start")
         ]
     ]
     
@@ -100,9 +126,22 @@ def get_admin_menu_keyboard(is_main_admin=False) -> InlineKeyboardMarkup:
         ])
     
     buttons.append([InlineKeyboardButton(text="⬅️ Назад в главное меню", callback_data="main_menu")])
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-    return keyboard
+    return buttons
+
+register_keyboard("admin_menu", _admin_menu_rows(is_main_admin=False))
+register_keyboard("admin_menu:main", _admin_menu_rows(is_main_admin=True))
+
+register_keyboard("work_status", [
+    [
+        InlineKeyboardButton(text="🟢 Включить", callback_data="work_status:on"),
+        InlineKeyboardButton(text="🔴 Выключить", callback_data="work_status:off")
+    ],
+    [InlineKeyboardButton(text="⬅️ Назад в меню администратора", callback_data="admin_menu")]
+])
+
+def get_admin_menu_keyboard(is_main_admin=False) -> InlineKeyboardMarkup:
+    """Create keyboard for admin menu"""
+    return get_keyboard("admin_menu:main" if is_main_admin else "admin_menu")
 
 def get_admins_list_keyboard(admin_ids: list) -> InlineKeyboardMarkup:
     """Создает клавиатуру со списком всех администраторов"""
@@ -151,32 +190,20 @@ def get_admins_list_keyboard(admin_ids: list) -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     return keyboard
 
-def get_admin_numbers_keyboard(numbers_dict: dict) -> InlineKeyboardMarkup:
+def get_admin_numbers_keyboard(numbers: list) -> InlineKeyboardMarkup:
     """Create a keyboard showing all numbers for admin"""
-    buttons = []
+    buttons = [
+        # Поиск номера в inline-режиме прямо из этого чата
+        [InlineKeyboardButton(text="🔍 Поиск номера", switch_inline_query_current_chat="")]
+    ]
     
-    # Импортируем функцию для получения эмодзи статуса
-    from utils import get_status_emoji, get_status_text
+    from storage_db import get_user_info
     
-    # Flatten the dictionary of dictionaries
-    # numbers_dict format: {user_id: {phone_number: status}}
-    for user_id, numbers in numbers_dict.items():
-        for number, status in numbers.items():
-            status_emoji = get_status_emoji(status)
-            status_short_text = get_status_text(status)
-            
-            # Получаем информацию о пользователе
-            from storage_db import get_user_info
-            user_info = get_user_info(user_id)
-            username = user_info.get("username", "")
-            user_mention = f"@{username}" if username else f"ID:{user_id}"
-            
-            buttons.append([
-                InlineKeyboardButton(
-                    text=f"{number} - {status_emoji} {status_short_text} ({user_mention})",
-                    callback_data=f"number_action:{user_id}:{number}"
-                )
-            ])
+    # numbers format: [{"id", "user_id", "phone_number", "status"}] (storage_db.get_all_number_rows)
+    for phone in numbers:
+        # Получаем информацию о пользователе
+        user_info = get_user_info(phone["user_id"])
+        buttons.append([get_admin_number_button(phone, user_info.get("username", ""))])
     
     # Back button
     buttons.append([InlineKeyboardButton(text="⬅️ Назад в меню администратора", callback_data="admin_menu")])
@@ -184,28 +211,50 @@ def get_admin_numbers_keyboard(numbers_dict: dict) -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     return keyboard
 
-def get_work_status_keyboard() -> InlineKeyboardMarkup:
-    """Create keyboard for changing work status"""
-    buttons = [
-        [
-            InlineKeyboardButton(text="🟢 Включить", callback_data="work_status:on"),
-            InlineKeyboardButton(text="🔴 Выключить", callback_data="work_status:off")
-        ],
-        [InlineKeyboardButton(text="⬅️ Назад в меню администратора", callback_data="admin_menu")]
-    ]
+def get_admin_number_button(phone: dict, username: str) -> InlineKeyboardButton:
+    """Create a button that opens admin actions for a number"""
+    from utils import get_status_emoji, get_status_text
+    
+    status_emoji = get_status_emoji(phone["status"])
+    status_short_text = get_status_text(phone["status"])
+    user_mention = f"@{username}" if username else f"ID:{phone['user_id']}"
+    
+    return InlineKeyboardButton(
+        text=f"{phone['phone_number']} - {status_emoji} {status_short_text} ({user_mention})",
+        callback_data=encode_number_callback("number_action", phone["id"])
+    )
+
+def get_number_search_keyboard(numbers: list, offset: int, page_size: int, has_more: bool) -> InlineKeyboardMarkup:
+    """Create a keyboard with one page of number search results (rows from storage_db.search_numbers)"""
+    buttons = [[get_admin_number_button(phone, phone["username"])] for phone in numbers]
+    
+    # Переход между страницами результатов
+    pages = []
+    if offset > 0:
+        pages.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"find_page:{max(offset - page_size, 0)}"))
+    if has_more:
+        pages.append(InlineKeyboardButton(text="Далее ▶️", callback_data=f"find_page:{offset + len(numbers)}"))
+    if pages:
+        buttons.append(pages)
+    
+    buttons.append([InlineKeyboardButton(text="⬅️ Назад в меню администратора", callback_data="admin_menu")])
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     return keyboard
 
-def get_admin_number_actions_keyboard(user_id: str, phone_number: str) -> InlineKeyboardMarkup:
-    """Create keyboard for admin actions with a specific number"""
+def get_work_status_keyboard() -> InlineKeyboardMarkup:
+    """Create keyboard for changing work status"""
+    return get_keyboard("work_status")
+
+def get_admin_number_actions_keyboard(phone: dict) -> InlineKeyboardMarkup:
+    """Create keyboard for admin actions with a specific number (phone is a storage_db.get_phone_by_id row)"""
     # Импортируем функции для получения информации о пользователе
-    from storage_db import get_user_info, get_phone_details
+    from storage_db import get_user_info
     from utils import format_date
     
     # Получаем информацию о пользователе
-    user_info = get_user_info(user_id)
-    phone_details = get_phone_details(user_id, phone_number)
+    user_info = get_user_info(phone["user_id"])
+    phone_id = phone["id"]
     
     # Формируем заголовок с информацией о пользователе
     user_header = []
@@ -219,8 +268,7 @@ def get_admin_number_actions_keyboard(user_id: str, phone_number: str) -> Inline
         user_display += f" (@{username})"
     
     # Добавляем информацию о номере
-    status = phone_details.get("status", "waiting")
-    added_at = phone_details.get("added_at")
+    added_at = phone.get("added_at")
     added_date = format_date(added_at) if added_at else "неизвестно"
     
     # Кнопки действий
@@ -236,19 +284,19 @@ def get_admin_number_actions_keyboard(user_id: str, phone_number: str) -> Inline
         [
             InlineKeyboardButton(
                 text="✅ Обработан", 
-                callback_data=f"set_status:{user_id}:{phone_number}:processed"
+                callback_data=encode_number_callback("set_status", phone_id, "processed")
             )
         ],
         [
             InlineKeyboardButton(
                 text="❌ Отклонен", 
-                callback_data=f"set_status:{user_id}:{phone_number}:rejected"
+                callback_data=encode_number_callback("set_status", phone_id, "rejected")
             )
         ],
         [
             InlineKeyboardButton(
                 text="⏳ В ожидании", 
-                callback_data=f"set_status:{user_id}:{phone_number}:waiting"
+                callback_data=encode_number_callback("set_status", phone_id, "waiting")
             )
         ],
         
@@ -256,19 +304,19 @@ def get_admin_number_actions_keyboard(user_id: str, phone_number: str) -> Inline
         [
             InlineKeyboardButton(
                 text="🔥 Слетел", 
-                callback_data=f"set_status:{user_id}:{phone_number}:failed"
+                callback_data=encode_number_callback("set_status", phone_id, "failed")
             )
         ],
         [
             InlineKeyboardButton(
                 text="⌛ Ожидает кода", 
-                callback_data=f"set_status:{user_id}:{phone_number}:pending"
+                callback_data=encode_number_callback("set_status", phone_id, "pending")
             )
         ],
         [
             InlineKeyboardButton(
                 text="🚫 Отменен", 
-                callback_data=f"set_status:{user_id}:{phone_number}:canceled"
+                callback_data=encode_number_callback("set_status", phone_id, "canceled")
             )
         ],
         
@@ -277,7 +325,7 @@ def get_admin_number_actions_keyboard(user_id: str, phone_number: str) -> Inline
         [
             InlineKeyboardButton(
                 text="📤 Отправить код", 
-                callback_data=f"send_code:{user_id}:{phone_number}"
+                callback_data=encode_number_callback("send_code", phone_id)
             )
         ],
         [InlineKeyboardButton(text="⬅️ Назад к списку номеров", callback_data="admin_numbers")]
@@ -1,109 +1,116 @@
 import os
-import threading
+import sys
+import asyncio
 import logging
-from flask import Flask, render_template_string
+from aiohttp import web
+
+import cluster
+import health
+import telegram_bot
+from status_page import setup_status_page
+from metrics import CONTENT_TYPE, render_metrics
 
 # Настройка логирования
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-# Создаем Flask приложение
-app = Flask(__name__)
+async def healthz(request: web.Request) -> web.Response:
+    return web.json_response(health.liveness())
 
-# Функция для запуска бота в отдельном потоке
-def run_telegram_bot():
-    try:
-        import telegram_bot
-        logging.info("Запуск Telegram бота...")
-        telegram_bot.run_bot()
-    except Exception as e:
-        logging.error(f"Ошибка при запуске бота: {e}")
+async def readyz(request: web.Request) -> web.Response:
+    # Проверки читаются из кэша фоновых задач и не обращаются к базе
+    report = health.readiness()
+    return web.json_response(report, status=200 if report["ready"] else 503)
 
-# HTML шаблон для главной страницы
-HOME_PAGE = '''
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Narkoz Team Bot</title>
-    <style>
-        body {
-            font-family: Arial, sans-serif;
-            margin: 0;
-            padding: 0;
-            background-color: #121212;
-            color: #ffffff;
-            display: flex;
-            flex-direction: column;
-            min-height: 100vh;
-            align-items: center;
-            justify-content: center;
-            text-align: center;
-        }
-        .container {
-            max-width: 800px;
-            padding: 20px;
-        }
-        h1 {
-            color: #4CAF50;
-            margin-bottom: 20px;
-        }
-        p {
-            line-height: 1.6;
-            margin-bottom: 15px;
-        }
-        .status {
-            background-color: #1e1e1e;
-            padding: 15px;
-            border-radius: 5px;
-            margin-top: 20px;
-            border-left: 4px solid #4CAF50;
-        }
-        .tg-link {
-            display: inline-block;
-            background-color: #0088cc;
-            color: white;
-            padding: 10px 20px;
-            text-decoration: none;
-            border-radius: 5px;
-            margin-top: 20px;
-            font-weight: bold;
-            transition: background-color 0.3s;
-        }
-        .tg-link:hover {
-            background-color: #006699;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>Narkoz Team Бот</h1>
-        <p>
-            Это серверная часть Telegram-бота Narkoz Team, который помогает управлять очередью номеров и другими задачами.
-        </p>
-        <div class="status">
-            <p>Статус: <span style="color: #4CAF50;">✓ Запущен</span></p>
-            <p>Бот работает в Telegram</p>
-        </div>
-        <a href="https://t.me/narkoz_team_bot" class="tg-link">Открыть в Telegram</a>
-    </div>
-</body>
-</html>
-'''
+async def metrics(request: web.Request) -> web.Response:
+    response = web.Response(text=render_metrics())
+    response.headers['Content-Type'] = CONTENT_TYPE
+    return response
 
-@app.route('/')
-def home():
-    return render_template_string(HOME_PAGE)
+def setup_polling(app: web.Application, dp, bot):
+    """Запускает long polling вместе с веб-сервером и останавливает его первым при выключении"""
+    async def start(app: web.Application):
+        polling_task = asyncio.create_task(dp.start_polling(bot, handle_signals=False))
+        app['polling_task'] = polling_task
+        health.set_ingestion("polling", lambda: not polling_task.done())
+    
+    async def stop(app: web.Application):
+        # on_shutdown срабатывает до того, как aiohttp начнет ждать завершения задач:
+        # сначала перестаем принимать обновления, затем отрабатывают хуки остановки бота,
+        # а сессию бота закрывает сам start_polling
+        polling_task = app['polling_task']
+        try:
+            await dp.stop_polling()
+        except RuntimeError:
+            # Polling не успел запуститься или уже завершился с ошибкой
+            polling_task.cancel()
+        await asyncio.gather(polling_task, return_exceptions=True)
+    
+    app.on_startup.append(start)
+    app.on_shutdown.append(stop)
 
-if __name__ == '__main__':
-    # Запускаем бота в отдельном потоке
-    bot_thread = threading.Thread(target=run_telegram_bot)
-    bot_thread.daemon = True
-    bot_thread.start()
+def setup_webhook_state(app: web.Application):
+    """Отмечает для /readyz, что маршрут webhook принимает обновления, пока сервер запущен"""
+    state = {"running": False}
+    
+    async def start(app: web.Application):
+        state["running"] = True
+    
+    async def stop(app: web.Application):
+        state["running"] = False
+    
+    app.on_startup.append(start)
+    app.on_shutdown.append(stop)
+    health.set_ingestion("webhook", lambda: state["running"])
+
+async def create_app() -> web.Application:
+    """
+    Создает единое aiohttp-приложение: страница статуса, служебные маршруты
+    и диспетчер бота в одном цикле событий.
+    """
+    app = web.Application()
+    setup_status_page(app)
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/readyz', readyz)
+    app.router.add_get('/metrics', metrics)
+    
+    api_token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not api_token:
+        logging.error("TELEGRAM_BOT_TOKEN environment variable is not set, бот не запущен")
+        return app
+    
+    # База данных и кэш готовятся до того, как сервер начнет принимать запросы
+    telegram_bot.prepare_storage()
+    
+    bot = telegram_bot.create_bot(api_token)
+    dp = telegram_bot.create_dispatcher()
     
-    # Запускаем Flask приложение
-    logging.info("Запуск веб-сервера...")
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    if telegram_bot.BOT_MODE == "webhook":
+        # Обновления приходят на маршрут этого же приложения
+        telegram_bot.setup_webhook(app, dp, bot)
+        setup_webhook_state(app)
+    else:
+        setup_polling(app, dp, bot)
+    
+    logging.info(f"Telegram бот подключен к веб-серверу. Режим: {telegram_bot.BOT_MODE}")
+    return app
+
+if __name__ == '__main__':
+    if cluster.BOT_WORKERS > 1 and not cluster.is_cluster_worker():
+        # Несколько рабочих процессов за маршрутизатором webhook
+        if telegram_bot.BOT_MODE != "webhook":
+            logging.error("BOT_WORKERS > 1 поддерживается только в режиме BOT_MODE=webhook")
+            sys.exit(1)
+        logging.info(f"Запуск кластера из {cluster.BOT_WORKERS} процессов...")
+        cluster.run_cluster(
+            telegram_bot.WEBAPP_HOST,
+            telegram_bot.WEBAPP_PORT,
+            telegram_bot.WEBHOOK_PATH,
+            telegram_bot.WEBHOOK_SECRET
+        )
+    else:
+        # Веб-сервер и бот работают в одном процессе и одном цикле событий
+        logging.info("Запуск веб-сервера...")
+        web.run_app(create_app(), host=telegram_bot.WEBAPP_HOST, port=telegram_bot.WEBAPP_PORT)
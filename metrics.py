@@ -0,0 +1,282 @@
+"""
+Метрики в текстовом формате Prometheus.
+
+Счетчики, гистограммы и датчики хранятся в памяти процесса и отдаются
+маршрутом /metrics. Значения обновляются из цикла событий и из рабочих
+потоков (запросы к базе выполняются через asyncio.to_thread), поэтому
+каждая метрика защищена своей блокировкой.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+# Границы корзин гистограмм (в секундах)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Базовый класс метрики с набором меток"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, Sequence[str], float]]:
+        """Возвращает (суффикс имени, значения меток, доп. метки, значение)"""
+        return ()
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+        for suffix, values, extra, value in self.samples():
+            names = self.labelnames + tuple(name for name, _ in extra)
+            all_values = values + tuple(v for _, v in extra)
+            lines.append(f"{self.name}{suffix}{_format_labels(names, all_values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [("_total", key, (), value) for key, value in items]
+
+
+class Histogram(Metric):
+    """Гистограмма длительностей с фиксированными корзинами"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: счетчики по корзинам (+Inf последняя), сумма
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+
+        result = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                result.append(("_bucket", key, (("le", _format_value(bound)),), cumulative))
+            result.append(("_sum", key, (), total))
+            result.append(("_count", key, (), cumulative))
+        return result
+
+
+class Gauge(Metric):
+    """
+    Текущее значение. Может задаваться явно или вычисляться в момент
+    запроса метрик функцией, возвращающей {значения меток: число}.
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self._collect is not None:
+            values = self._collect()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [("", key, (), value) for key, value in sorted(values.items())]
+
+
+# Все метрики процесса в порядке вывода
+REGISTRY: List[Metric] = []
+
+
+def register(metric: Metric) -> Metric:
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    """Формирует ответ /metrics в текстовом формате Prometheus"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _queue_depth() -> Dict[LabelValues, float]:
+    from stats import get_stats_snapshot
+
+    snapshot = get_stats_snapshot()
+    return {(status,): count for status, count in snapshot.status_counts.items()}
+
+
+# Обработка обновлений
+UPDATES_TOTAL = register(Counter(
+    "bot_updates", "Обновления, полученные от Telegram", ("type",)
+))
+HANDLER_DURATION = register(Histogram(
+    "bot_handler_duration_seconds", "Время работы обработчика", ("handler",)
+))
+HANDLER_ERRORS = register(Counter(
+    "bot_handler_errors", "Исключения в обработчиках", ("handler",)
+))
+NAVIGATION_RENDERS = register(Counter(
+    "bot_navigation_renders", "Показы экранов меню: edited, unchanged (запрос не нужен), sent", ("result",)
+))
+THROTTLED_TOTAL = register(Counter(
+    "bot_throttled_updates", "Обновления, отброшенные ограничением частоты", ("action",)
+))
+
+# Планировщик обновлений (scheduler.py)
+SCHEDULER_QUEUE_DEPTH = register(Gauge(
+    "bot_scheduler_queue_depth", "Обновления в очередях чатов (ожидающие и обрабатываемые) по частям", ("shard",)
+))
+SCHEDULER_ACTIVE = register(Gauge(
+    "bot_scheduler_active_updates", "Обновления, обрабатываемые в данный момент"
+))
+
+# База данных
+DB_QUERIES_TOTAL = register(Counter(
+    "db_queries", "Выполненные SQL-запросы", ("operation",)
+))
+DB_QUERY_DURATION = register(Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса", ("operation",), DB_BUCKETS
+))
+
+# Исходящие запросы к Telegram Bot API
+TELEGRAM_API_DURATION = register(Histogram(
+    "telegram_api_request_duration_seconds", "Время запроса к Telegram Bot API", ("method",)
+))
+TELEGRAM_API_ERRORS = register(Counter(
+    "telegram_api_errors", "Ошибки запросов к Telegram Bot API", ("method", "error")
+))
+
+# Очередь номеров
+QUEUE_DEPTH = register(Gauge(
+    "bot_queue_depth", "Количество номеров по статусам (из снимка статистики)", ("status",),
+    collect=_queue_depth
+))
+
+
+def instrument_engine(engine):
+    """
+    Подписывается на события движка SQLAlchemy и считает запросы и их длительность.
+
+    Args:
+        engine: Движок SQLAlchemy
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_time"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERIES_TOTAL.inc(operation=operation)
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # Неудачный запрос не доходит до after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start_time"):
+            connection.info["query_start_time"].pop()
+
+
+class TelegramRequestMetrics(BaseRequestMiddleware):
+    """Middleware сессии бота: длительность и ошибки запросов к Bot API"""
+
+    async def __call__(self, make_request, bot, method):
+        api_method = getattr(method, "__api_method__", type(method).__name__)
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            TELEGRAM_API_ERRORS.inc(method=api_method, error=type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_API_DURATION.observe(time.perf_counter() - started, method=api_method)
@@ -0,0 +1,235 @@
+"""
+Middleware бота.
+
+UserContextMiddleware один раз за обновление собирает контекст пользователя
+(запись пользователя, права администратора, системные настройки) и передает
+его в обработчики через аргумент `user_context`. Все данные берутся из кэша
+(cache.py), поэтому обычное обновление не обращается к базе данных.
+
+UpdateMetricsMiddleware и HandlerMetricsMiddleware считают обновления и
+время работы обработчиков для /metrics и отмечают время последнего
+обработанного обновления для /readyz.
+
+ThrottlingMiddleware ограничивает частоту действий одного пользователя,
+чтобы один клиент, заваливающий бота нажатиями, не замедлял остальных.
+
+StaleCallbackMiddleware отвечает на устаревшие и испорченные кнопки до
+поиска обработчика, то есть до запроса контекста пользователя.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from callbacks import STALE_BUTTON_TEXT, is_stale_callback
+from health import mark_update_processed
+from metrics import HANDLER_DURATION, HANDLER_ERRORS, THROTTLED_TOTAL, UPDATES_TOTAL
+from ratelimit import TokenBucket
+from storage_db import get_admin_ids, get_moderator_status, get_user_info, get_work_status
+from utils import is_main_admin
+
+
+@dataclass(frozen=True)
+class UserContext:
+    """Контекст пользователя, вычисленный один раз для текущего обновления"""
+    user_id: str
+    user_info: Dict[str, Any] = field(default_factory=dict)
+    is_admin: bool = False
+    is_main_admin: bool = False
+    work_status: bool = False
+    moderator_status: bool = False
+
+
+def build_user_context(user_id: str) -> UserContext:
+    """
+    Собирает контекст пользователя из кэша настроек, администраторов и пользователей.
+
+    Args:
+        user_id: ID пользователя Telegram
+
+    Returns:
+        Неизменяемый объект UserContext
+    """
+    user_id = str(user_id)
+    # Главные администраторы захардкожены в utils.is_main_admin
+    main_admin = is_main_admin(user_id)
+
+    return UserContext(
+        user_id=user_id,
+        user_info=get_user_info(user_id),
+        is_admin=main_admin or user_id in get_admin_ids(),
+        is_main_admin=main_admin,
+        work_status=get_work_status(),
+        moderator_status=get_moderator_status()
+    )
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Передает в обработчики контекст пользователя под ключом `user_context`"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is not None and "user_context" not in data:
+            data["user_context"] = build_user_context(user.id)
+        return await handler(event, data)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware для dp.update: считает входящие обновления по типам и время последнего из них"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        UPDATES_TOTAL.inc(type=getattr(event, "event_type", "unknown"))
+        result = await handler(event, data)
+        mark_update_processed()
+        return result
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Измеряет время работы обработчика; метка - имя функции обработчика"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, handler=name)
+
+
+# Все действия пользователя: токенов в секунду и допустимая пачка
+THROTTLE_USER_RATE = 3
+THROTTLE_USER_BURST = 10
+
+# Повтор одного и того же действия (та же кнопка, сообщения подряд)
+THROTTLE_ACTION_RATE = 1
+THROTTLE_ACTION_BURST = 3
+
+# Сколько пользователей и действий одного пользователя хранить в памяти
+THROTTLE_MAX_USERS = 10000
+THROTTLE_MAX_ACTIONS = 16
+
+THROTTLE_MESSAGE = "⏳ Слишком часто! Подождите немного и попробуйте снова."
+
+
+class _UserBuckets:
+    """Корзины одного пользователя: общая и по последним действиям"""
+
+    __slots__ = ("total", "actions")
+
+    def __init__(self):
+        self.total = TokenBucket(THROTTLE_USER_RATE, THROTTLE_USER_BURST)
+        self.actions: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def try_acquire(self, action: str) -> bool:
+        bucket = self.actions.get(action)
+        if bucket is None:
+            bucket = TokenBucket(THROTTLE_ACTION_RATE, THROTTLE_ACTION_BURST)
+            self.actions[action] = bucket
+            while len(self.actions) > THROTTLE_MAX_ACTIONS:
+                self.actions.popitem(last=False)
+        else:
+            self.actions.move_to_end(action)
+
+        # Токены забираются, только если их хватает в обеих корзинах: отказ
+        # одной из них не должен расходовать лимит другой
+        if bucket.delay() > 0 or self.total.delay() > 0:
+            return False
+        bucket.try_acquire()
+        self.total.try_acquire()
+        return True
+
+
+def _action_of(event: TelegramObject) -> Optional[str]:
+    if isinstance(event, CallbackQuery):
+        return f"callback:{event.data or ''}"
+    if isinstance(event, Message):
+        return "message"
+    return None
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Внешний middleware для dp.message и dp.callback_query: ограничивает частоту
+    действий пользователя до поиска обработчика и запросов к базе данных.
+
+    Лишние нажатия кнопок сразу получают ответ-подсказку (кнопка перестает
+    «крутиться»), лишние сообщения отбрасываются.
+    """
+
+    def __init__(self, max_users: int = THROTTLE_MAX_USERS):
+        self.max_users = max_users
+        self._users: "OrderedDict[int, _UserBuckets]" = OrderedDict()
+
+    def _user_buckets(self, user_id: int) -> _UserBuckets:
+        buckets = self._users.get(user_id)
+        if buckets is None:
+            buckets = _UserBuckets()
+            self._users[user_id] = buckets
+            # Вытесняем пользователей, которые дольше всех ничего не делали
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return buckets
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        action = _action_of(event)
+        if user is None or action is None:
+            return await handler(event, data)
+
+        if self._user_buckets(user.id).try_acquire(action):
+            return await handler(event, data)
+
+        # В метрике - только тип действия без параметров (delete_number:123 -> delete_number)
+        THROTTLED_TOTAL.inc(action=action.split(":", 2)[1] if isinstance(event, CallbackQuery) else action)
+        if isinstance(event, CallbackQuery):
+            await event.answer(THROTTLE_MESSAGE)
+        return None
+
+
+class StaleCallbackMiddleware(BaseMiddleware):
+    """
+    Внешний middleware для dp.callback_query: кнопки старого формата, неизвестной
+    версии или с испорченными данными получают предупреждение и дальше не
+    передаются. Проверяется только строка callback_data, без запросов к базе.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if isinstance(event, CallbackQuery) and is_stale_callback(event.data):
+            await event.answer(STALE_BUTTON_TEXT, show_alert=True)
+            return None
+        return await handler(event, data)
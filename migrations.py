@@ -0,0 +1,414 @@
+"""
+Миграции схемы базы данных.
+
+Base.metadata.create_all создает только недостающие таблицы: новые колонки
+и индексы в уже существующих таблицах он не добавляет. Такие изменения
+описываются здесь как пронумерованные миграции; номера примененных миграций
+хранятся в таблице schema_migrations.
+
+Миграции запускаются из db_init.init_db после create_all и написаны так,
+чтобы их можно было применить и к новой базе, где create_all уже создал
+все по текущим моделям: каждая миграция проверяет, чего не хватает.
+"""
+import datetime
+import logging
+import warnings
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, bindparam, func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SAWarning
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from models import COMPLETED_STATUSES, Admin, AdminDashboard, Base, PhoneNumber, SchemaMigration, TelegramId, User
+from phones import E164_MAX_DIGITS
+from utils import NUMBER_STATUS_CODES, reverse_phone_digits
+
+# Сколько строк заполняется за один запрос при переносе данных
+MIGRATION_BATCH_SIZE = 5000
+
+# phone_numbers до перехода на компактный формат (миграция 3): миграции 1-2
+# работают с ним, а не с моделью, в которой номер и статус уже числа
+_legacy_metadata = MetaData()
+_legacy_phone_numbers = Table(
+    "phone_numbers",
+    _legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", String(50)),
+    Column("phone_number", String(20)),
+    Column("phone_reversed", String(20)),
+    Column("status", String(50)),
+    Column("note", Text),
+)
+_legacy_active_phone_index = Index(
+    "uq_phone_numbers_active_phone",
+    _legacy_phone_numbers.c.phone_number,
+    unique=True,
+    sqlite_where=_legacy_phone_numbers.c.status.notin_(COMPLETED_STATUSES),
+    postgresql_where=_legacy_phone_numbers.c.status.notin_(COMPLETED_STATUSES)
+)
+_legacy_admins = Table(
+    "admins",
+    _legacy_metadata,
+    Column("id", String(50), primary_key=True),
+)
+_legacy_outbox = Table(
+    "notification_outbox",
+    _legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("chat_id", String(50)),
+    Column("text", Text),
+    Column("parse_mode", String(20)),
+    Column("status", String(20)),
+    Column("attempts", Integer),
+    Column("next_attempt_at", DateTime),
+    Column("created_at", DateTime),
+)
+
+# Сколько отмененных номеров перечислять в уведомлении администраторам
+DUPLICATE_REPORT_LIMIT = 40
+
+# Детали номеров в отдельной таблице, в компактном формате (миграция 3);
+# миграция 4 переносит их в phone_numbers и удаляет таблицу
+_phone_details = Table(
+    "phone_details",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("phone_number_id", Integer, ForeignKey("phone_numbers.id", ondelete="CASCADE"), nullable=False),
+    Column("processed_at", DateTime),
+    Column("processor_id", TelegramId),
+    Column("code_sent", Boolean),
+    Column("code_accepted", Boolean),
+)
+
+
+def _add_column(connection: Connection, table: str, column: str, ddl_type: str) -> bool:
+    """Добавляет колонку, если ее еще нет; возвращает True, если колонка добавлена"""
+    columns = {info["name"] for info in inspect(connection).get_columns(table)}
+    if column in columns:
+        return False
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+    return True
+
+
+def _create_indexes(connection: Connection, table: Table, unique: bool = False) -> None:
+    """Создает индексы таблицы, которых еще нет в базе (уникальные - только при unique=True)"""
+    # IF NOT EXISTS вместо checkfirst: индексы по выражениям (lower(username)) не отражаются в SQLite
+    for index in table.indexes:
+        # Уникальный индекс можно создать только после очистки дубликатов в своей миграции
+        if index.unique and not unique:
+            continue
+        connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _phone_search_indexes(connection: Connection) -> None:
+    """Колонка phone_reversed и индексы для поиска номеров администраторами"""
+    _add_column(connection, "phone_numbers", "phone_reversed", "VARCHAR(20)")
+
+    # Заполняем phone_reversed у существующих номеров пачками
+    phones = _legacy_phone_numbers.c
+    while True:
+        rows = connection.execute(
+            select(phones.id, phones.phone_number)
+            .where(phones.phone_reversed.is_(None))
+            .limit(MIGRATION_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            update(_legacy_phone_numbers)
+            .where(phones.id == bindparam("row_id"))
+            .values(phone_reversed=bindparam("reversed")),
+            [{"row_id": row.id, "reversed": reverse_phone_digits(row.phone_number)} for row in rows]
+        )
+
+    _create_indexes(connection, PhoneNumber.__table__)
+    _create_indexes(connection, User.__table__)
+
+
+def _unique_active_numbers(connection: Connection) -> None:
+    """Уникальность номера среди незавершенных номеров всех пользователей"""
+    phones = _legacy_phone_numbers.c
+    active = phones.status.notin_(COMPLETED_STATUSES)
+    duplicated = (
+        select(phones.phone_number)
+        .where(active)
+        .group_by(phones.phone_number)
+        .having(func.count(phones.id) > 1)
+    )
+
+    # Из повторов в очереди остается самый ранний номер, остальные отменяются
+    rows = connection.execute(
+        select(phones.id, phones.user_id, phones.phone_number)
+        .where(active, phones.phone_number.in_(duplicated))
+        .order_by(phones.phone_number, phones.id)
+    ).all()
+    owners = {}
+    canceled = []
+    notifications = []
+    lines = []
+    for row in rows:
+        if row.phone_number not in owners:
+            owners[row.phone_number] = row.user_id
+            continue
+        canceled.append({"row_id": row.id})
+        shown_number = row.phone_number.replace("`", "")
+        lines.append(f"`{shown_number}`: отменен у `{row.user_id}`, остался у `{owners[row.phone_number]}`")
+        notifications.append(_outbox_row(
+            row.user_id,
+            f"⚠️ *Номер снят с очереди*\n\n"
+            f"Телефон `{shown_number}` уже был в очереди у другого пользователя, "
+            f"поэтому ваша заявка на него отменена."
+        ))
+    for start in range(0, len(canceled), MIGRATION_BATCH_SIZE):
+        connection.execute(
+            update(_legacy_phone_numbers)
+            .where(phones.id == bindparam("row_id"))
+            .values(status="canceled", note="Отменен: номер уже в очереди у другого пользователя"),
+            canceled[start:start + MIGRATION_BATCH_SIZE]
+        )
+    connection.execute(CreateIndex(_legacy_active_phone_index, if_not_exists=True))
+    if not canceled:
+        return
+
+    # Владельцы отмененных номеров и администраторы узнают об отмене через outbox,
+    # в той же транзакции, что и сама отмена
+    report = "\n".join(lines[:DUPLICATE_REPORT_LIMIT])
+    if len(lines) > DUPLICATE_REPORT_LIMIT:
+        report += f"\n... и еще {len(lines) - DUPLICATE_REPORT_LIMIT}"
+    for admin_id in connection.execute(select(_legacy_admins.c.id)).scalars():
+        notifications.append(_outbox_row(
+            admin_id,
+            f"⚠️ *Повторы номеров в очереди*\n\n"
+            f"При обновлении базы отменено повторов: {len(canceled)}. "
+            f"Номер остается у пользователя, добавившего его первым.\n\n{report}"
+        ))
+    for start in range(0, len(notifications), MIGRATION_BATCH_SIZE):
+        connection.execute(_legacy_outbox.insert(), notifications[start:start + MIGRATION_BATCH_SIZE])
+    logging.warning(f"Отменено повторов номеров в очереди: {len(canceled)}")
+
+
+def _outbox_row(chat_id: str, text: str) -> dict:
+    """Строка notification_outbox с уведомлением, готовым к отправке"""
+    now = datetime.datetime.utcnow()
+    return {
+        "chat_id": str(chat_id),
+        "text": text,
+        "parse_mode": "Markdown",
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now
+    }
+
+
+def _to_telegram_id(value):
+    """Строковый Telegram ID для колонки BIGINT; ValueError, если это не число"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value.lstrip("-").isdigit():
+        raise ValueError(f"ID не число: {value!r}")
+    return value
+
+
+def _compact_user(row: dict) -> dict:
+    return dict(row, id=_to_telegram_id(row["id"]))
+
+
+def _compact_phone_number(row: dict) -> dict:
+    # От номеров, сохраненных до нормализации, остаются только цифры (без слияния разных записей)
+    phone = "+" + "".join(char for char in row["phone_number"] or "" if char.isdigit())
+    # Прежняя проверка не ограничивала длину; такой номер не помещается в BIGINT
+    if not 1 <= len(phone) - 1 <= E164_MAX_DIGITS:
+        raise ValueError(f"номер {row['phone_number']!r} не является номером E.164")
+    status = row["status"] or "waiting"
+    if status not in NUMBER_STATUS_CODES:
+        raise ValueError(f"неизвестный статус {status!r}")
+    return dict(row, user_id=_to_telegram_id(row["user_id"]), phone_number=phone, status=status)
+
+
+def _compact_phone_details(row: dict) -> dict:
+    return dict(row, processor_id=_to_telegram_id(row["processor_id"]))
+
+
+def _compact_admin_dashboard(row: dict) -> dict:
+    return dict(row, admin_id=_to_telegram_id(row["admin_id"]))
+
+
+def _rebuild_table(connection: Connection, table: Table, convert: Callable[[dict], dict]) -> None:
+    """
+    Пересоздает таблицу по ее новому описанию и переносит в нее строки.
+
+    SQLite не умеет менять тип колонки, поэтому таблица создается заново под
+    временным именем, заполняется пачками, старая удаляется, а новая
+    переименовывается. Строки, которые convert не смог преобразовать,
+    прерывают миграцию: транзакция откатывается, база остается прежней.
+    """
+    name = table.name
+    temporary = f"{name}_compact"
+    postgresql = connection.dialect.name == "postgresql"
+
+    # Ссылки новой таблицы на другие таблицы разрешаются через копию всей схемы
+    metadata = MetaData()
+    for other in Base.metadata.sorted_tables:
+        other.to_metadata(metadata)
+    target = table.to_metadata(metadata, name=temporary)
+    with warnings.catch_warnings():
+        # Индекс по lower(username) SQLite не отражает; для переноса строк он не нужен
+        warnings.simplefilter("ignore", SAWarning)
+        source = Table(name, MetaData(), autoload_with=connection)
+    columns = [column.name for column in target.columns if column.name in source.columns]
+
+    connection.execute(text(f"DROP TABLE IF EXISTS {temporary}"))
+    connection.execute(CreateTable(target))
+
+    errors = []
+    result = connection.execute(
+        select(*[source.c[column] for column in columns]).execution_options(yield_per=MIGRATION_BATCH_SIZE)
+    ).mappings()
+    for rows in result.partitions():
+        batch = []
+        for row in rows:
+            try:
+                batch.append(convert(dict(row)))
+            except ValueError as e:
+                errors.append(f"{dict(row)}: {e}")
+        if batch and not errors:
+            connection.execute(target.insert(), batch)
+    if errors:
+        raise RuntimeError(
+            f"Таблицу {name} нельзя перевести в компактный формат, строк с ошибками: {len(errors)}. "
+            f"Первые: {'; '.join(errors[:5])}"
+        )
+
+    connection.execute(text(f"DROP TABLE {name} CASCADE" if postgresql else f"DROP TABLE {name}"))
+    connection.execute(text(f"ALTER TABLE {temporary} RENAME TO {name}"))
+    if postgresql and "id" in table.columns and table.c.id.autoincrement is True:
+        # Последовательность новой таблицы продолжает нумерацию перенесенных строк
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), COALESCE(MAX(id), 1)) FROM {name}"
+        ))
+    _create_indexes(connection, table, unique=True)
+
+
+def _compact_row_format(connection: Connection) -> None:
+    """Telegram ID - BIGINT, номер - BIGINT (phones.encode_phone), статус - SMALLINT"""
+    status = {info["name"]: info["type"] for info in inspect(connection).get_columns("phone_numbers")}["status"]
+    if isinstance(status, Integer):
+        # База создана create_all уже в компактном формате
+        return
+
+    # Родительские таблицы - раньше дочерних: каждая дочерняя пересоздается со ссылками на новую
+    _rebuild_table(connection, User.__table__, _compact_user)
+    _rebuild_table(connection, Admin.__table__, _compact_user)
+    _rebuild_table(connection, PhoneNumber.__table__, _compact_phone_number)
+    if inspect(connection).has_table("phone_details"):
+        _rebuild_table(connection, _phone_details, _compact_phone_details)
+
+
+def _fold_phone_details(connection: Connection) -> None:
+    """Детали номера (обработка, код) - колонки phone_numbers вместо таблицы phone_details"""
+    _add_column(connection, "phone_numbers", "processed_at", "TIMESTAMP")
+    _add_column(connection, "phone_numbers", "processor_id", "BIGINT")
+    _add_column(connection, "phone_numbers", "code_sent", "BOOLEAN DEFAULT FALSE")
+    _add_column(connection, "phone_numbers", "code_accepted", "BOOLEAN")
+    if not inspect(connection).has_table("phone_details"):
+        return
+    phones = PhoneNumber.__table__
+    # updated_at указывается явно, иначе onupdate модели отметит изменение всех номеров
+    connection.execute(
+        update(phones).where(phones.c.code_sent.is_(None)).values(code_sent=False, updated_at=phones.c.updated_at)
+    )
+
+    # Переносим только непустые детали: у большинства номеров их нет
+    details = _phone_details.c
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(details.id, details.phone_number_id, details.processed_at, details.processor_id,
+                   details.code_sent, details.code_accepted)
+            .where(
+                details.id > last_id,
+                details.processed_at.isnot(None) | details.processor_id.isnot(None)
+                | details.code_sent.is_(True) | details.code_accepted.isnot(None)
+            )
+            .order_by(details.id)
+            .limit(MIGRATION_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            update(phones)
+            .where(phones.c.id == bindparam("row_id"))
+            .values(
+                processed_at=bindparam("processed"),
+                processor_id=bindparam("processor"),
+                code_sent=bindparam("sent"),
+                code_accepted=bindparam("accepted"),
+                updated_at=phones.c.updated_at
+            ),
+            [
+                {
+                    "row_id": row.phone_number_id,
+                    "processed": row.processed_at,
+                    "processor": row.processor_id,
+                    "sent": bool(row.code_sent),
+                    "accepted": row.code_accepted
+                }
+                for row in rows
+            ]
+        )
+        last_id = rows[-1].id
+
+    connection.execute(text("DROP TABLE phone_details"))
+
+
+def _compact_dashboard_admin_id(connection: Connection) -> None:
+    """ID администратора живой панели - BIGINT, как admins.id"""
+    if not inspect(connection).has_table("admin_dashboards"):
+        return
+    admin_id = {info["name"]: info["type"] for info in inspect(connection).get_columns("admin_dashboards")}["admin_id"]
+    if isinstance(admin_id, Integer):
+        # Таблица создана create_all уже с BIGINT
+        return
+    _rebuild_table(connection, AdminDashboard.__table__, _compact_admin_dashboard)
+
+
+# Миграции: (номер, имя, функция). Номера только растут; примененную миграцию не меняют
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "phone_search_indexes", _phone_search_indexes),
+    (2, "unique_active_numbers", _unique_active_numbers),
+    (3, "compact_row_format", _compact_row_format),
+    (4, "fold_phone_details", _fold_phone_details),
+    (5, "compact_dashboard_admin_id", _compact_dashboard_admin_id),
+]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    Применяет миграции, которых еще нет в schema_migrations.
+
+    Каждая миграция выполняется в своей транзакции вместе с записью о ней,
+    поэтому прерванная миграция при следующем запуске выполнится заново.
+
+    Args:
+        engine: Движок SQLAlchemy
+
+    Returns:
+        Номера примененных миграций
+    """
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(SchemaMigration.version)).scalars())
+
+    done = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(SchemaMigration.__table__.insert().values(version=version, name=name))
+        logging.info(f"Применена миграция {version}: {name}")
+        done.append(version)
+    return done
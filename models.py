@@ -1,20 +1,66 @@
 import os
 from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Boolean, DateTime, ForeignKey, Text, JSON, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
+from phones import decode_phone, encode_phone
+from utils import reverse_phone_digits, NUMBER_STATUS_CODES, NUMBER_STATUS_NAMES
 
 Base = declarative_base()
 
-# Инициализируем SQLAlchemy
-db = SQLAlchemy(model_class=Base)
+# Статусы, с которыми номер считается покинувшим очередь
+COMPLETED_STATUSES = ("processed", "rejected", "failed", "canceled", "expired")
+
+
+class TelegramId(TypeDecorator):
+    """Telegram ID: в базе BIGINT, в коде строка, как и раньше"""
+    impl = BigInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        return int(value) if value is not None else None
+    
+    def process_result_value(self, value, dialect):
+        return str(value) if value is not None else None
+
+
+class PhoneE164(TypeDecorator):
+    """Номер телефона: в базе BIGINT (phones.encode_phone), в коде строка E.164"""
+    impl = BigInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        # Границы диапазонов поиска передаются уже закодированными
+        if value is None or isinstance(value, int):
+            return value
+        return encode_phone(value)
+    
+    def process_result_value(self, value, dialect):
+        return decode_phone(value) if value is not None else None
+
+
+class NumberStatus(TypeDecorator):
+    """Статус номера: в базе SMALLINT (utils.NUMBER_STATUS_CODES), в коде имя статуса"""
+    impl = SmallInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value not in NUMBER_STATUS_CODES:
+            raise ValueError(f"Неизвестный статус номера: {value!r}")
+        return NUMBER_STATUS_CODES[value]
+    
+    def process_result_value(self, value, dialect):
+        return NUMBER_STATUS_NAMES.get(value, str(value)) if value is not None else None
+
 
 class User(Base):
     """Модель для хранения информации о пользователях"""
     __tablename__ = 'users'
     
-    id = Column(String(50), primary_key=True)  # Telegram user_id как строка
+    id = Column(TelegramId, primary_key=True)  # Telegram user_id
     username = Column(String(100), nullable=True)
     first_name = Column(String(100), nullable=True)
     last_name = Column(String(100), nullable=True)
@@ -24,53 +70,59 @@ class User(Base):
     # Отношения
     phone_numbers = relationship("PhoneNumber", back_populates="user", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Поиск номеров по имени пользователя без учета регистра
+        Index('ix_users_username_lower', func.lower(username)),
+    )
+    
     def __repr__(self):
         return f"<User {self.id}>"
 
 
+def _phone_reversed_default(context):
+    return reverse_phone_digits(context.get_current_parameters().get("phone_number"))
+
+
 class PhoneNumber(Base):
     """Модель для хранения номеров телефонов"""
     __tablename__ = 'phone_numbers'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(String(50), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
-    phone_number = Column(String(20), nullable=False)
-    status = Column(String(50), default="waiting")  # waiting, processed, rejected и т.д.
+    user_id = Column(TelegramId, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    phone_number = Column(PhoneE164, nullable=False, index=True)  # поиск по началу номера
+    phone_reversed = Column(String(20), default=_phone_reversed_default, index=True)  # цифры номера задом наперед, для поиска по последним цифрам
+    status = Column(NumberStatus, default="waiting")  # waiting, processed, rejected и т.д.
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     note = Column(Text, nullable=True)  # Дополнительная информация или примечания
-    
-    # Отношения
-    user = relationship("User", back_populates="phone_numbers")
-    details = relationship("PhoneDetails", back_populates="phone_number", uselist=False, cascade="all, delete-orphan")
-    
-    def __repr__(self):
-        return f"<PhoneNumber {self.phone_number} ({self.status})>"
-
-
-class PhoneDetails(Base):
-    """Модель для хранения дополнительных деталей о номере"""
-    __tablename__ = 'phone_details'
-    
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    phone_number_id = Column(Integer, ForeignKey('phone_numbers.id', ondelete='CASCADE'), nullable=False)
     processed_at = Column(DateTime, nullable=True)  # Время обработки
-    processor_id = Column(String(50), nullable=True)  # ID админа, который обработал
+    processor_id = Column(TelegramId, nullable=True)  # ID админа, который обработал
     code_sent = Column(Boolean, default=False)  # Был ли отправлен код
     code_accepted = Column(Boolean, nullable=True)  # Принял ли пользователь код
     
     # Отношения
-    phone_number = relationship("PhoneNumber", back_populates="details")
+    user = relationship("User", back_populates="phone_numbers")
+    
+    __table_args__ = (
+        # Номер может стоять в очереди только у одного пользователя; завершенные номера не учитываются
+        Index(
+            'uq_phone_numbers_active_phone',
+            phone_number,
+            unique=True,
+            sqlite_where=status.notin_(COMPLETED_STATUSES),
+            postgresql_where=status.notin_(COMPLETED_STATUSES)
+        ),
+    )
     
     def __repr__(self):
-        return f"<PhoneDetails for {self.phone_number_id}>"
+        return f"<PhoneNumber {self.phone_number} ({self.status})>"
 
 
 class Admin(Base):
     """Модель для хранения информации об администраторах"""
     __tablename__ = 'admins'
     
-    id = Column(String(50), primary_key=True)  # Telegram user_id как строка
+    id = Column(TelegramId, primary_key=True)  # Telegram user_id
     is_main_admin = Column(Boolean, default=False)  # Является ли главным админом
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -88,4 +140,79 @@ class SystemSetting(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
-        return f"<SystemSetting {self.key}>"
\ No newline at end of file
+        return f"<SystemSetting {self.key}>"
+
+
+class NotificationOutbox(Base):
+    """Модель для хранения исходящих уведомлений до их доставки (transactional outbox)"""
+    __tablename__ = 'notification_outbox'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chat_id = Column(String(50), nullable=False)  # Telegram chat_id получателя
+    text = Column(Text, nullable=False)
+    parse_mode = Column(String(20), nullable=True)
+    status = Column(String(20), default="pending", nullable=False)  # pending, sent, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Не раньше этого времени
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index('ix_notification_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    def __repr__(self):
+        return f"<NotificationOutbox {self.id} to {self.chat_id} ({self.status})>"
+
+
+class FsmState(Base):
+    """Модель для хранения состояний FSM, общих для всех процессов бота"""
+    __tablename__ = 'fsm_states'
+    
+    key = Column(String(255), primary_key=True)  # bot_id:chat_id:user_id:thread_id:destiny
+    state = Column(String(255), nullable=True)
+    data = Column(JSON, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<FsmState {self.key} ({self.state})>"
+
+
+class CacheInvalidation(Base):
+    """Журнал сбросов кэша, по которому процессы бота синхронизируют свои кэши"""
+    __tablename__ = 'cache_invalidations'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache_type = Column(String(50), nullable=False)  # settings, admin_ids, user_info, counters или all
+    key = Column(String(100), nullable=True)  # ID пользователя для user_info
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<CacheInvalidation {self.id} {self.cache_type}:{self.key}>"
+
+
+class AdminDashboard(Base):
+    """Модель для хранения закрепленных сообщений живой панели администраторов"""
+    __tablename__ = 'admin_dashboards'
+    
+    admin_id = Column(TelegramId, primary_key=True)  # одна панель на администратора
+    chat_id = Column(String(50), nullable=False)
+    message_id = Column(Integer, nullable=False)
+    view = Column(String(20), default="queue", nullable=False)  # вид панели (dashboard.DASHBOARD_VIEWS)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<AdminDashboard {self.admin_id} -> {self.chat_id}:{self.message_id}>"
+
+
+class SchemaMigration(Base):
+    """Примененные миграции схемы базы данных (см. migrations.py)"""
+    __tablename__ = 'schema_migrations'
+    
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SchemaMigration {self.version} {self.name}>"
@@ -0,0 +1,108 @@
+"""
+Навигация по меню редактированием сообщения.
+
+Переход между экранами меню (нажатие кнопки) редактирует сообщение с этой
+кнопкой вместо отправки нового: в чате остается одно сообщение меню, а на
+переход уходит один запрос к Telegram.
+
+Для каждого отредактированного или отправленного сообщения запоминается
+отпечаток содержимого (текст, разметка, клавиатура). Если экран не
+изменился (например, повторное нажатие «Очередь»), запрос к Telegram
+не выполняется вовсе. Если сообщение отредактировать нельзя (оно удалено,
+слишком старое или это фото), экран отправляется новым сообщением.
+"""
+import logging
+from collections import OrderedDict
+from typing import Any, Optional, Tuple, Union
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+
+from metrics import NAVIGATION_RENDERS
+from templates import FrozenKeyboard
+
+# Сколько отпечатков сообщений хранить в памяти
+NAVIGATION_CACHE_SIZE = 10000
+
+# (chat_id, message_id) -> отпечаток содержимого
+_rendered: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+
+
+def _fingerprint(text: str, reply_markup: Optional[InlineKeyboardMarkup], parse_mode: Optional[str]) -> int:
+    if reply_markup is None:
+        markup = ""
+    elif isinstance(reply_markup, FrozenKeyboard):
+        # У готовой клавиатуры из реестра JSON вычислен заранее
+        markup = reply_markup.fingerprint
+    else:
+        markup = reply_markup.model_dump_json(exclude_none=True)
+    return hash((text, parse_mode, markup))
+
+
+def _remember(message: Message, fingerprint: int):
+    key = (message.chat.id, message.message_id)
+    _rendered[key] = fingerprint
+    _rendered.move_to_end(key)
+    while len(_rendered) > NAVIGATION_CACHE_SIZE:
+        _rendered.popitem(last=False)
+
+
+def _is_editable(message: Any) -> bool:
+    # Недоступное (слишком старое) сообщение и сообщения без текста (фото) не редактируются
+    return isinstance(message, Message) and message.text is not None
+
+
+async def show_screen(
+    target: Union[CallbackQuery, Message],
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    parse_mode: Optional[str] = "Markdown",
+    **kwargs: Any
+) -> Optional[Message]:
+    """
+    Показывает экран меню.
+
+    Args:
+        target: Нажатая кнопка (экран заменяет сообщение с кнопкой)
+            или сообщение пользователя (экран отправляется новым сообщением)
+        text: Текст экрана
+        reply_markup: Клавиатура экрана
+        parse_mode: Режим разметки текста
+        **kwargs: Дополнительные параметры отправки (например, disable_web_page_preview)
+
+    Returns:
+        Сообщение, в котором показан экран
+    """
+    fingerprint = _fingerprint(text, reply_markup, parse_mode)
+
+    if isinstance(target, CallbackQuery):
+        message = target.message
+        if _is_editable(message):
+            key = (message.chat.id, message.message_id)
+            if _rendered.get(key) == fingerprint:
+                _rendered.move_to_end(key)
+                NAVIGATION_RENDERS.inc(result="unchanged")
+                return message
+
+            try:
+                edited = await message.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode, **kwargs)
+                _remember(message, fingerprint)
+                NAVIGATION_RENDERS.inc(result="edited")
+                return edited if isinstance(edited, Message) else message
+            except TelegramBadRequest as e:
+                if "message is not modified" in str(e):
+                    # Содержимое совпало с уже показанным (например, после перезапуска бота)
+                    _remember(message, fingerprint)
+                    NAVIGATION_RENDERS.inc(result="unchanged")
+                    return message
+                logging.debug(f"Не удалось отредактировать сообщение {key}: {e}")
+
+        # Отправляем экран новым сообщением в тот же чат
+        chat_id = message.chat.id if message is not None else target.from_user.id
+        sent = await target.bot.send_message(chat_id, text, reply_markup=reply_markup, parse_mode=parse_mode, **kwargs)
+    else:
+        sent = await target.answer(text, reply_markup=reply_markup, parse_mode=parse_mode, **kwargs)
+
+    _remember(sent, fingerprint)
+    NAVIGATION_RENDERS.inc(result="sent")
+    return sent
@@ -0,0 +1,125 @@
+"""
+Доставка уведомлений из таблицы notification_outbox.
+
+Уведомление записывается в outbox в той же транзакции, что и изменение
+данных, а фоновая задача доставляет его с повторами и отмечает как
+отправленное. Так администратор получает ответ сразу, а уведомление не
+теряется ни при ошибке отправки, ни при падении процесса.
+"""
+import asyncio
+import datetime
+import logging
+from typing import Any, Dict, Optional
+
+from broadcast import get_broadcaster
+
+# Как часто проверять outbox, если никто не разбудил задачу (в секундах)
+OUTBOX_POLL_INTERVAL = 5.0
+
+# Сколько уведомлений забирать за один проход
+OUTBOX_BATCH_SIZE = 50
+
+# Сколько попыток доставки делать, прежде чем отказаться от уведомления
+OUTBOX_MAX_ATTEMPTS = 8
+
+# Задержка перед повторной попыткой: base * 2^(attempts - 1), но не больше max (в секундах)
+OUTBOX_RETRY_BASE_DELAY = 10
+OUTBOX_RETRY_MAX_DELAY = 1800
+
+# Событие для немедленной доставки и цикл событий фоновой задачи
+_wake_event: Optional[asyncio.Event] = None
+_wake_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def wake_outbox_dispatcher():
+    """
+    Будит фоновую задачу после записи нового уведомления.
+
+    Безопасно вызывать из любого потока; без запущенной задачи ничего не делает.
+    """
+    if _wake_event is None or _wake_loop is None:
+        return
+
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+
+    if running_loop is _wake_loop:
+        _wake_event.set()
+    elif not _wake_loop.is_closed():
+        _wake_loop.call_soon_threadsafe(_wake_event.set)
+
+
+def _retry_delay(attempts: int) -> datetime.timedelta:
+    delay = min(OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1), OUTBOX_RETRY_MAX_DELAY)
+    return datetime.timedelta(seconds=delay)
+
+
+async def _deliver(bot, notification: Dict[str, Any]):
+    """Доставляет одно уведомление и записывает результат в outbox"""
+    from storage_db import mark_notification_sent, mark_notification_failed
+    from utils import get_moscow_time
+
+    # Время отправки добавляется в момент фактической доставки, как в notify_user
+    text = f"{notification['text']}\n\n_Время отправки: {get_moscow_time()}_"
+
+    kwargs = {}
+    if notification["parse_mode"]:
+        kwargs["parse_mode"] = notification["parse_mode"]
+
+    result = await get_broadcaster().send_message(bot, notification["chat_id"], text, **kwargs)
+
+    if result.ok:
+        await asyncio.to_thread(mark_notification_sent, notification["id"])
+        return
+
+    retry_at = None
+    if result.retryable and notification["attempts"] < OUTBOX_MAX_ATTEMPTS:
+        retry_at = datetime.datetime.utcnow() + _retry_delay(notification["attempts"])
+
+    logging.warning(
+        f"Не удалось доставить уведомление {notification['id']} в чат {notification['chat_id']} "
+        f"(попытка {notification['attempts']}): {result.error}"
+    )
+    await asyncio.to_thread(mark_notification_failed, notification["id"], result.error or "", retry_at)
+
+
+async def dispatch_pending(bot) -> int:
+    """
+    Забирает одну пачку готовых к отправке уведомлений и доставляет их параллельно.
+
+    Returns:
+        Количество обработанных уведомлений
+    """
+    from storage_db import claim_pending_notifications
+
+    batch = await asyncio.to_thread(claim_pending_notifications, OUTBOX_BATCH_SIZE)
+    if batch:
+        await asyncio.gather(*(_deliver(bot, notification) for notification in batch))
+    return len(batch)
+
+
+async def run_outbox_dispatcher(bot, poll_interval: float = OUTBOX_POLL_INTERVAL):
+    """Фоновая задача: доставляет уведомления из outbox сразу после записи или по таймеру"""
+    global _wake_event, _wake_loop
+    _wake_loop = asyncio.get_running_loop()
+    _wake_event = asyncio.Event()
+
+    try:
+        while True:
+            _wake_event.clear()
+            try:
+                # Пока пачки полные, сразу забираем следующую
+                while await dispatch_pending(bot) >= OUTBOX_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                logging.error(f"Ошибка при доставке уведомлений из outbox: {e}")
+
+            try:
+                await asyncio.wait_for(_wake_event.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _wake_event = None
+        _wake_loop = None
@@ -0,0 +1,449 @@
+"""
+Нормализация и проверка телефонных номеров.
+
+Приводит номер, введенный в любом привычном виде («+7 (999) 123-45-67»,
+«8 999 1234567», «0079991234567», «9991234567»), к формату E.164
+(«+79991234567») и определяет страну и оператора по таблице префиксов.
+
+Таблица префиксов компилируется один раз при импорте: для каждой длины
+префикса (1-4 цифры) строится массив «префикс -> запись», поэтому страна
+находится за четыре обращения по индексу, без перебора. Операторы хранятся
+так же: «страна * 1000 + первые три цифры номера -> оператор».
+
+Пакеты номеров (списки или массивы NumPy) обрабатываются за один
+векторизованный проход по матрице символов, если установлен NumPy;
+без NumPy используется тот же алгоритм для каждого номера по отдельности.
+"""
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него пакеты обрабатываются по одному номеру
+    np = None
+
+# Страна по умолчанию для номеров без кода страны: код, префикс выхода на
+# междугороднюю связь (одна цифра) и длина национального номера
+# («8 999 123-45-67» -> +79991234567)
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "7")
+PHONE_DEFAULT_TRUNK_PREFIX = os.getenv("PHONE_DEFAULT_TRUNK_PREFIX", "8")
+PHONE_DEFAULT_NATIONAL_LENGTH = int(os.getenv("PHONE_DEFAULT_NATIONAL_LENGTH", "10"))
+
+# Максимальное количество цифр в номере E.164
+E164_MAX_DIGITS = 15
+# Номер страны, которой нет в COUNTRY_PREFIXES, принимается без проверки
+# длины национального номера, если в нем от E164_MIN_DIGITS до E164_MAX_DIGITS цифр
+E164_MIN_DIGITS = 8
+
+# Символы, допустимые между цифрами при вводе
+_SEPARATORS = " -()."
+
+# Префиксы: цифры в начале номера E.164 -> (страна, длина кода страны,
+# минимальная и максимальная длина национального номера). Побеждает самый
+# длинный подходящий префикс: так +77... относится к Казахстану, а не к России.
+# Таблица только уточняет проверку: номера остальных стран проходят по общим
+# правилам E.164, страна для них не определяется.
+COUNTRY_PREFIXES: Dict[str, Tuple[str, int, int, int]] = {
+    "1": ("US", 1, 10, 10),      # США, Канада и другие страны NANP
+    "7": ("RU", 1, 10, 10),
+    "76": ("KZ", 1, 10, 10),
+    "77": ("KZ", 1, 10, 10),
+    "20": ("EG", 2, 10, 10),
+    "33": ("FR", 2, 9, 9),
+    "34": ("ES", 2, 9, 9),
+    "39": ("IT", 2, 9, 10),
+    "44": ("GB", 2, 10, 10),
+    "48": ("PL", 2, 9, 9),
+    "49": ("DE", 2, 7, 11),
+    "52": ("MX", 2, 10, 10),
+    "55": ("BR", 2, 10, 11),
+    "62": ("ID", 2, 9, 12),
+    "63": ("PH", 2, 10, 10),
+    "66": ("TH", 2, 9, 9),
+    "84": ("VN", 2, 9, 10),
+    "86": ("CN", 2, 11, 11),
+    "90": ("TR", 2, 10, 10),
+    "91": ("IN", 2, 10, 10),
+    "234": ("NG", 3, 10, 10),
+    "370": ("LT", 3, 8, 8),
+    "371": ("LV", 3, 8, 8),
+    "372": ("EE", 3, 7, 8),
+    "373": ("MD", 3, 8, 8),
+    "374": ("AM", 3, 8, 8),
+    "375": ("BY", 3, 9, 9),
+    "380": ("UA", 3, 9, 9),
+    "966": ("SA", 3, 9, 9),
+    "971": ("AE", 3, 9, 9),
+    "972": ("IL", 3, 9, 9),
+    "992": ("TJ", 3, 9, 9),
+    "993": ("TM", 3, 8, 8),
+    "994": ("AZ", 3, 9, 9),
+    "995": ("GE", 3, 9, 9),
+    "996": ("KG", 3, 9, 9),
+    "998": ("UZ", 3, 9, 9),
+}
+
+# Операторы мобильной связи по первым цифрам национального номера (по исходному
+# выделению кодов; номер, перенесенный к другому оператору, определится неверно)
+MOBILE_OPERATORS: Dict[str, Dict[str, str]] = {
+    "RU": {
+        "901": "Tele2", "902": "Tele2", "904": "Tele2", "908": "Tele2", "950": "Tele2",
+        "951": "Tele2", "952": "Tele2", "953": "Tele2", "977": "Tele2", "991": "Tele2",
+        "903": "Билайн", "905": "Билайн", "906": "Билайн", "909": "Билайн", "96": "Билайн",
+        "91": "МТС", "98": "МТС", "978": "МТС",
+        "92": "МегаФон", "93": "МегаФон", "999": "МегаФон",
+    },
+    "KZ": {
+        "700": "Altel", "708": "Altel", "701": "Activ", "775": "Activ", "778": "Activ",
+        "702": "Kcell", "705": "Beeline", "771": "Beeline", "776": "Beeline", "777": "Beeline",
+        "707": "Tele2", "747": "Tele2",
+    },
+    "UA": {
+        "50": "Vodafone", "66": "Vodafone", "95": "Vodafone", "99": "Vodafone",
+        "67": "Київстар", "68": "Київстар", "96": "Київстар", "97": "Київстар", "98": "Київстар",
+        "63": "lifecell", "73": "lifecell", "93": "lifecell",
+    },
+    "BY": {"25": "life:)", "29": "A1/МТС", "33": "МТС", "44": "A1"},
+}
+
+
+@dataclass(frozen=True)
+class PhoneInfo:
+    """Результат разбора номера"""
+    e164: Optional[str]
+    country: Optional[str] = None
+    operator: Optional[str] = None
+
+    @property
+    def valid(self) -> bool:
+        return self.e164 is not None
+
+
+# --- Компиляция таблиц ---
+
+_COUNTRIES: List[str] = sorted({country for country, _, _, _ in COUNTRY_PREFIXES.values()})
+_COUNTRY_INDEX = {country: index for index, country in enumerate(_COUNTRIES)}
+_OPERATORS: List[str] = sorted({name for table in MOBILE_OPERATORS.values() for name in table.values()})
+_OPERATOR_INDEX = {name: index for index, name in enumerate(_OPERATORS)}
+_MAX_PREFIX = max(len(prefix) for prefix in COUNTRY_PREFIXES)
+
+# Длина национального номера по индексу страны (у одной страны могут быть разные префиксы)
+_NATIONAL_LENGTHS: Dict[int, Tuple[int, int]] = {}
+# Префикс -> (индекс страны, длина кода страны)
+_PREFIX_TABLE: Dict[str, Tuple[int, int]] = {}
+for _prefix, (_country, _code_length, _min_length, _max_length) in COUNTRY_PREFIXES.items():
+    _PREFIX_TABLE[_prefix] = (_COUNTRY_INDEX[_country], _code_length)
+    _NATIONAL_LENGTHS[_COUNTRY_INDEX[_country]] = (_min_length, _max_length)
+
+# (индекс страны, первые три цифры национального номера) -> индекс оператора;
+# двузначные префиксы раскрываются в десять трехзначных, более длинные их уточняют
+_OPERATOR_TABLE: Dict[Tuple[int, str], int] = {}
+for _country, _table in MOBILE_OPERATORS.items():
+    for _prefix, _name in sorted(_table.items(), key=lambda item: len(item[0])):
+        for _suffix in ([""] if len(_prefix) == 3 else [str(digit) for digit in range(10)]):
+            _OPERATOR_TABLE[(_COUNTRY_INDEX[_country], _prefix + _suffix)] = _OPERATOR_INDEX[_name]
+
+if np is not None:
+    # Те же таблицы в виде массивов: префикс из k цифр -> номер записи (-1 - нет записи)
+    _entries = list(_PREFIX_TABLE.items())
+    _ENTRY_COUNTRY = np.array([country for _, (country, _) in _entries], dtype=np.int16)
+    _ENTRY_CODE_LENGTH = np.array([code_length for _, (_, code_length) in _entries], dtype=np.int8)
+    _PREFIX_ARRAYS = []
+    for _length in range(1, _MAX_PREFIX + 1):
+        _array = np.full(10 ** _length, -1, dtype=np.int16)
+        for _index, (_prefix, _) in enumerate(_entries):
+            if len(_prefix) == _length:
+                _array[int(_prefix)] = _index
+        _PREFIX_ARRAYS.append(_array)
+    _MIN_LENGTH = np.array([_NATIONAL_LENGTHS[index][0] for index in range(len(_COUNTRIES))], dtype=np.int8)
+    _MAX_LENGTH = np.array([_NATIONAL_LENGTHS[index][1] for index in range(len(_COUNTRIES))], dtype=np.int8)
+    _OPERATOR_ARRAY = np.full(len(_COUNTRIES) * 1000, -1, dtype=np.int16)
+    for (_country_index, _digits), _operator_index in _OPERATOR_TABLE.items():
+        _OPERATOR_ARRAY[_country_index * 1000 + int(_digits)] = _operator_index
+    _DEFAULT_CODE_DIGITS = np.array([int(digit) for digit in PHONE_DEFAULT_COUNTRY_CODE], dtype=np.int8)
+
+    # Классы символов по коду ASCII; код 128 обозначает любой не-ASCII символ
+    _INVALID, _DIGIT, _PLUS, _SEPARATOR, _SPACE = range(5)
+    _CHAR_CLASSES = np.full(129, _INVALID, dtype=np.int8)
+    _CHAR_CLASSES[ord("0"):ord("9") + 1] = _DIGIT
+    _CHAR_CLASSES[ord("+")] = _PLUS
+    _CHAR_CLASSES[[ord(char) for char in _SEPARATORS]] = _SEPARATOR
+    # Пробел и нулевой символ (дополнение строк NumPy до общей длины) пропускаются при поиске «+»
+    _CHAR_CLASSES[[ord(" "), 0]] = _SPACE
+
+
+# --- Один номер ---
+
+def _to_international_digits(raw: str) -> Optional[str]:
+    """Цифры номера с кодом страны или None, если строка не похожа на номер"""
+    text = (raw or "").strip(" ")
+    has_plus = text.startswith("+")
+    body = text[1:] if has_plus else text
+    if not body or any(char not in _SEPARATORS and not ("0" <= char <= "9") for char in body):
+        return None
+
+    digits = "".join(char for char in body if "0" <= char <= "9")
+    if has_plus:
+        return digits
+    if digits.startswith("00"):
+        return digits[2:]
+    if len(digits) == PHONE_DEFAULT_NATIONAL_LENGTH + 1 and digits.startswith(PHONE_DEFAULT_TRUNK_PREFIX):
+        return PHONE_DEFAULT_COUNTRY_CODE + digits[1:]
+    if len(digits) == PHONE_DEFAULT_NATIONAL_LENGTH:
+        return PHONE_DEFAULT_COUNTRY_CODE + digits
+    return digits
+
+
+def parse_phone(raw: str) -> PhoneInfo:
+    """
+    Разбирает номер телефона.
+
+    Args:
+        raw: Номер в том виде, в каком его ввел пользователь
+
+    Returns:
+        PhoneInfo с номером в формате E.164, страной и оператором;
+        для некорректного номера e164 равен None, для страны не из
+        COUNTRY_PREFIXES страна и оператор равны None
+    """
+    digits = _to_international_digits(raw)
+    if not digits or len(digits) > E164_MAX_DIGITS:
+        return PhoneInfo(None)
+
+    for length in range(min(_MAX_PREFIX, len(digits)), 0, -1):
+        entry = _PREFIX_TABLE.get(digits[:length])
+        if entry is not None:
+            break
+    else:
+        # Страны нет в таблице: достаточно, что номер похож на E.164
+        if len(digits) < E164_MIN_DIGITS or digits.startswith("0"):
+            return PhoneInfo(None)
+        return PhoneInfo(e164="+" + digits)
+
+    country_index, code_length = entry
+    min_length, max_length = _NATIONAL_LENGTHS[country_index]
+    if not min_length <= len(digits) - code_length <= max_length:
+        return PhoneInfo(None)
+
+    operator_index = _OPERATOR_TABLE.get((country_index, digits[code_length:code_length + 3]))
+    return PhoneInfo(
+        e164="+" + digits,
+        country=_COUNTRIES[country_index],
+        operator=_OPERATORS[operator_index] if operator_index is not None else None
+    )
+
+
+def normalize_phone(raw: str) -> Optional[str]:
+    """Номер в формате E.164 или None, если номер некорректен"""
+    return parse_phone(raw).e164
+
+
+# --- Пакеты номеров ---
+
+def _normalize_matrix(values) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    Векторизованная нормализация: пакет строк - матрица кодов символов, без копирования.
+
+    Returns:
+        (номера E.164 ("" для некорректных), индексы стран, индексы операторов; -1 - нет)
+    """
+    strings = np.asarray(values)
+    if strings.dtype.kind not in "SU":
+        strings = strings.astype("U")
+    strings = np.ascontiguousarray(strings)
+    count = strings.shape[0]
+    # Строки Unicode - по 4 байта на символ, байтовые строки - по одному
+    code_type = np.uint32 if strings.dtype.kind == "U" else np.uint8
+    width = strings.dtype.itemsize // np.dtype(code_type).itemsize
+    if width == 0:
+        empty = np.full(count, -1, dtype=np.int16)
+        return np.full(count, "", dtype=f"U{E164_MAX_DIGITS + 1}"), empty, empty
+    chars = strings.view(code_type).reshape(count, width)
+
+    # Класс каждого символа одним обращением к таблице; все не-ASCII символы недопустимы
+    classes = _CHAR_CLASSES[np.minimum(chars, 128)]
+    is_digit = classes == _DIGIT
+    is_plus = classes == _PLUS
+    digit_count = is_digit.sum(axis=1)
+
+    # «+» допустим один раз и только первым символом (не считая пробелов)
+    has_plus = is_plus.any(axis=1)
+    first_char = np.argmax(classes != _SPACE, axis=1)
+    valid = (
+        (classes != _INVALID).all(axis=1)
+        & (is_plus.sum(axis=1) <= 1)
+        & (~has_plus | (np.argmax(is_plus, axis=1) == first_char))
+        & (digit_count > 0)
+    )
+
+    # Цифры каждой строки сдвигаются в начало с сохранением порядка
+    max_digits = E164_MAX_DIGITS + 2
+    rows, columns = np.nonzero(is_digit)
+    ranks = np.cumsum(is_digit, axis=1, dtype=np.int16)[rows, columns] - 1
+    keep = ranks < max_digits
+    digits = np.zeros((count, max_digits), dtype=np.int32)
+    digits[rows[keep], ranks[keep]] = chars[rows[keep], columns[keep]] - 48
+
+    # Те же правила, что в _to_international_digits: 00..., 8... и номер без кода страны
+    national_input = ~has_plus
+    international = national_input & (digit_count >= 2) & (digits[:, 0] == 0) & (digits[:, 1] == 0)
+    trunk = (
+        national_input & ~international
+        & (digit_count == PHONE_DEFAULT_NATIONAL_LENGTH + 1)
+        & (digits[:, 0] == int(PHONE_DEFAULT_TRUNK_PREFIX))
+    )
+    without_code = national_input & ~international & ~trunk & (digit_count == PHONE_DEFAULT_NATIONAL_LENGTH)
+    skip = np.where(international, 2, np.where(trunk, 1, 0))
+    code_length = len(_DEFAULT_CODE_DIGITS)
+    prepend = np.where(trunk | without_code, code_length, 0)
+    total = digit_count - skip + prepend
+    valid &= (total > 0) & (total <= E164_MAX_DIGITS)
+
+    positions = np.arange(E164_MAX_DIGITS)[None, :]
+    in_number = positions < total[:, None]
+    source = np.clip(positions - prepend[:, None] + skip[:, None], 0, max_digits - 1)
+    normalized = np.take_along_axis(digits, source, axis=1)
+    for position, digit in enumerate(_DEFAULT_CODE_DIGITS):
+        normalized[:, position] = np.where(prepend > position, digit, normalized[:, position])
+    normalized[~in_number] = 0
+
+    # Страна: самый длинный префикс, для которого есть запись
+    entry = np.full(count, -1, dtype=np.int16)
+    prefix = np.zeros(count, dtype=np.int32)
+    prefix_values = []
+    for length in range(1, _MAX_PREFIX + 1):
+        prefix = prefix * 10 + normalized[:, length - 1]
+        prefix_values.append(np.where(total >= length, prefix, -1))
+    for length in range(_MAX_PREFIX, 0, -1):
+        values_at_length = prefix_values[length - 1]
+        found = _PREFIX_ARRAYS[length - 1][np.maximum(values_at_length, 0)]
+        entry = np.where((entry < 0) & (values_at_length >= 0), found, entry)
+    known = entry >= 0
+
+    safe_entry = np.maximum(entry, 0)
+    country = np.where(valid & known, _ENTRY_COUNTRY[safe_entry], -1)
+    country_code_length = _ENTRY_CODE_LENGTH[safe_entry].astype(np.int32)
+    national_length = total - country_code_length
+    safe_country = np.maximum(country, 0).astype(np.int32)
+    # Длина проверяется только для стран из таблицы, остальным достаточно правил E.164
+    valid &= np.where(
+        known,
+        (national_length >= _MIN_LENGTH[safe_country]) & (national_length <= _MAX_LENGTH[safe_country]),
+        (total >= E164_MIN_DIGITS) & (normalized[:, 0] != 0)
+    )
+    country = np.where(valid & known, country, -1)
+
+    # Оператор: первые три цифры национального номера
+    first_national = np.take_along_axis(
+        normalized, country_code_length[:, None] + np.arange(3)[None, :], axis=1
+    )
+    national_prefix = first_national[:, 0] * 100 + first_national[:, 1] * 10 + first_national[:, 2]
+    operator = np.where(valid & known, _OPERATOR_ARRAY[safe_country * 1000 + national_prefix], -1)
+
+    # Строки "+цифры" собираются прямо в памяти массива Unicode; у некорректных номеров - ""
+    output = np.zeros((count, E164_MAX_DIGITS + 1), dtype=np.uint32)
+    output[:, 0] = 43
+    output[:, 1:] = np.where(in_number, normalized + 48, 0)
+    output[~valid] = 0
+    e164 = output.view(f"U{E164_MAX_DIGITS + 1}").ravel()
+    return e164, country, operator
+
+
+def normalize_phone_array(values) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    Нормализует массив номеров за один векторизованный проход (требуется NumPy).
+
+    Args:
+        values: Массив NumPy или список строк
+
+    Returns:
+        (массив номеров E.164, где "" - некорректный номер;
+         массив кодов стран ISO, где "" - страна не определена;
+         массив операторов, где "" - оператор не определен)
+    """
+    if np is None:
+        raise RuntimeError("Для normalize_phone_array требуется NumPy")
+    e164, country, operator = _normalize_matrix(values)
+    countries = np.array(_COUNTRIES + [""])
+    operators = np.array(_OPERATORS + [""])
+    return e164, countries[country], operators[operator]
+
+
+def normalize_phones(values: Iterable[str]) -> List[Optional[str]]:
+    """
+    Нормализует пакет номеров.
+
+    Args:
+        values: Список (или массив NumPy) номеров в любом виде
+
+    Returns:
+        Номера в формате E.164 в том же порядке; None для некорректных
+    """
+    values = values if np is not None and isinstance(values, np.ndarray) else list(values)
+    if np is None or len(values) == 0:
+        return [normalize_phone(value) for value in values]
+    e164, _, _ = normalize_phone_array(values)
+    return [value or None for value in e164.tolist()]
+
+
+def parse_phones(values: Iterable[str]) -> List[PhoneInfo]:
+    """Разбирает пакет номеров: номер E.164, страна и оператор для каждого"""
+    values = values if np is not None and isinstance(values, np.ndarray) else list(values)
+    if np is None or len(values) == 0:
+        return [parse_phone(value) for value in values]
+    e164, countries, operators = normalize_phone_array(values)
+    return [
+        PhoneInfo(number, country or None, operator or None) if number else PhoneInfo(None)
+        for number, country, operator in zip(e164.tolist(), countries.tolist(), operators.tolist())
+    ]
+
+
+# --- Хранение в базе данных ---
+
+# Номер хранится 64-битным целым: цифры, дополненные нулями справа до
+# E164_MAX_DIGITS, умноженные на 16, плюс количество цифр. Числа упорядочены
+# так же, как строки номеров, поэтому поиск по началу номера остается одним
+# диапазоном индекса. Самое большое значение (~1.6e16) помещается в BIGINT.
+_STORED_LENGTH_BASE = 16
+
+
+def encode_phone(phone: str) -> int:
+    """
+    Номер в виде целого числа для колонки BIGINT.
+
+    Args:
+        phone: Номер в формате E.164 («+79991234567»); «+» необязателен
+
+    Returns:
+        Закодированный номер; ValueError, если в номере не только цифры
+    """
+    digits = phone[1:] if phone.startswith("+") else phone
+    if not digits or not digits.isascii() or not digits.isdigit() or len(digits) > E164_MAX_DIGITS:
+        raise ValueError(f"Номер нельзя сохранить как число: {phone!r}")
+    return int(digits.ljust(E164_MAX_DIGITS, "0")) * _STORED_LENGTH_BASE + len(digits)
+
+
+def decode_phone(value: int) -> str:
+    """Номер в формате E.164 из закодированного encode_phone числа"""
+    length = value % _STORED_LENGTH_BASE
+    return "+" + str(value // _STORED_LENGTH_BASE).zfill(E164_MAX_DIGITS)[:length]
+
+
+def encoded_prefix_range(prefix: str) -> Tuple[int, int]:
+    """
+    Границы закодированных номеров, начинающихся с prefix.
+
+    Args:
+        prefix: Начало номера из цифр («+7999» или «7999»)
+
+    Returns:
+        (low, high): номер начинается с prefix, если low <= значение < high
+    """
+    digits = prefix.lstrip("+")
+    if len(digits) > E164_MAX_DIGITS:
+        return 0, 0
+    scale = 10 ** (E164_MAX_DIGITS - len(digits)) * _STORED_LENGTH_BASE
+    start = int(digits) if digits else 0
+    # Более короткий номер («+8» при prefix «80») кодируется тем же числом с меньшей длиной
+    return start * scale + len(digits), (start + 1) * scale
@@ -0,0 +1,122 @@
+"""
+Запросы только для чтения на уровне SQLAlchemy Core.
+
+Горячие пути чтения (номера пользователя, все номера, счетчики, список
+администраторов, информация о пользователе) раньше загружали полные
+объекты ORM: каждая строка становилась объектом модели, попадала в
+identity map сессии и только потом превращалась в словарь. Здесь те же
+данные читаются запросами select() по таблицам и возвращаются как
+обычные кортежи.
+
+Запросы собираются один раз при импорте, параметры передаются через
+bindparam, поэтому ключ кэша у каждого запроса постоянный: SQLAlchemy
+компилирует его один раз на диалект и дальше берет SQL из кэша движка.
+Преобразование типов колонок (TelegramId, PhoneE164, NumberStatus)
+выполняется и здесь, результаты совпадают с прежними.
+
+Ошибки базы данных не перехватываются: их обрабатывают функции storage_db.
+"""
+import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.engine import Row
+
+from db_init import engine
+from models import Admin, PhoneNumber, User
+
+_phones = PhoneNumber.__table__.c
+_users = User.__table__.c
+
+USER_NUMBERS = select(_phones.phone_number, _phones.status).where(_phones.user_id == bindparam("user_id"))
+USER_QUEUE_COUNT = select(func.count()).select_from(PhoneNumber.__table__).where(_phones.user_id == bindparam("user_id"))
+ALL_NUMBERS = select(_phones.user_id, _phones.phone_number, _phones.status)
+QUEUE_COUNT = select(func.count()).select_from(PhoneNumber.__table__)
+ADMIN_IDS = select(Admin.__table__.c.id)
+USER_INFO = select(_users.username, _users.first_name, _users.last_name, _users.created_at).where(
+    _users.id == bindparam("user_id")
+)
+EXPORT_NUMBERS = select(
+    _phones.id, _phones.phone_number, _phones.status, _phones.user_id,
+    _users.username, _users.first_name, _users.last_name,
+    _phones.created_at, _phones.updated_at, _phones.processed_at, _phones.processor_id,
+    _phones.code_sent, _phones.code_accepted, _phones.note
+).select_from(PhoneNumber.__table__.outerjoin(User.__table__, _users.id == _phones.user_id)).order_by(_phones.id)
+
+# Сколько строк выгрузки читается из базы за раз
+EXPORT_BATCH_SIZE = 2000
+
+
+def user_numbers(user_id: str) -> List[Tuple[str, str]]:
+    """Номера пользователя: [(номер, статус), ...]"""
+    with engine.connect() as connection:
+        return connection.execute(USER_NUMBERS, {"user_id": user_id}).all()
+
+
+def user_queue_count(user_id: str) -> int:
+    """Количество номеров пользователя"""
+    with engine.connect() as connection:
+        return connection.execute(USER_QUEUE_COUNT, {"user_id": user_id}).scalar() or 0
+
+
+def all_numbers() -> List[Tuple[str, str, str]]:
+    """Все номера: [(ID пользователя, номер, статус), ...]"""
+    with engine.connect() as connection:
+        return connection.execute(ALL_NUMBERS).all()
+
+
+def queue_count() -> int:
+    """Общее количество номеров"""
+    with engine.connect() as connection:
+        return connection.execute(QUEUE_COUNT).scalar() or 0
+
+
+def admin_ids() -> List[str]:
+    """ID всех администраторов"""
+    with engine.connect() as connection:
+        return list(connection.execute(ADMIN_IDS).scalars())
+
+
+def user_info(user_id: str) -> Optional[Dict[str, Any]]:
+    """Имя и дата регистрации пользователя или None, если его нет"""
+    with engine.connect() as connection:
+        row = connection.execute(USER_INFO, {"user_id": user_id}).first()
+    if row is None:
+        return None
+    return {
+        "username": row.username,
+        "first_name": row.first_name,
+        "last_name": row.last_name,
+        "created_at": row.created_at.timestamp() if row.created_at else None
+    }
+
+
+def export_rows(
+    statuses: Iterable[str] = (),
+    created_from: Optional[datetime.datetime] = None,
+    created_to: Optional[datetime.datetime] = None
+) -> Iterator[Row]:
+    """
+    Номера с данными пользователя и обработки, по одной строке, в порядке добавления.
+
+    Строки читаются пачками по EXPORT_BATCH_SIZE (в PostgreSQL - серверным
+    курсором), поэтому память не зависит от количества номеров.
+
+    Args:
+        statuses: Только номера с этими статусами (пусто - все)
+        created_from: Добавлены не раньше этого времени
+        created_to: Добавлены раньше этого времени
+    """
+    statement = EXPORT_NUMBERS
+    statuses = list(statuses)
+    if statuses:
+        statement = statement.where(_phones.status.in_(statuses))
+    if created_from is not None:
+        statement = statement.where(_phones.created_at >= created_from)
+    if created_to is not None:
+        statement = statement.where(_phones.created_at < created_to)
+
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=EXPORT_BATCH_SIZE).execute(statement)
+        for row in result:
+            yield row
@@ -0,0 +1,62 @@
+"""
+Ограничение частоты по алгоритму token bucket.
+"""
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Корзина токенов: пополняется со скоростью `rate` токенов в секунду
+    и вмещает не более `capacity` токенов.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """
+        Забирает токены без ожидания.
+
+        Returns:
+            True, если токенов хватило
+        """
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens: float = 1) -> float:
+        """Через сколько секунд будет доступно нужное количество токенов"""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1):
+        """Ждет, пока токенов станет достаточно, и забирает их"""
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.delay(tokens))
+
+    def pause(self, seconds: float):
+        """Опустошает корзину так, чтобы следующий токен появился через `seconds` секунд"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def is_idle(self) -> bool:
+        """Корзина полностью заполнена, то есть давно не использовалась"""
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
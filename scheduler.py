@@ -0,0 +1,172 @@
+"""
+Планировщик обработки обновлений.
+
+aiogram запускает каждое обновление отдельной задачей без ограничений:
+тысяча одновременных обновлений - это тысяча задач, которые одновременно
+ходят в базу, а два быстрых нажатия в одном чате могут обработаться
+в обратном порядке и сломать диалог FSM.
+
+UpdateScheduler задает явную политику:
+- обновления одного чата обрабатываются строго по очереди, в порядке
+  поступления (FIFO);
+- обновления разных чатов обрабатываются параллельно, но одновременно
+  не более SCHEDULER_CONCURRENCY;
+- медленный обработчик в одном чате занимает один слот и не задерживает
+  остальные чаты, пока есть свободные слоты.
+
+Очереди чатов разбиты на SCHEDULER_SHARDS частей по ID чата; глубина
+очереди каждой части видна в /metrics.
+"""
+import asyncio
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+
+from metrics import SCHEDULER_ACTIVE, SCHEDULER_QUEUE_DEPTH
+
+# Сколько обновлений обрабатывается одновременно
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "100"))
+
+# На сколько частей разбиты очереди чатов
+SCHEDULER_SHARDS = int(os.getenv("SCHEDULER_SHARDS", "16"))
+
+
+def chat_key_of(update: Update) -> Optional[int]:
+    """ID чата (или пользователя, если чата нет), по которому упорядочиваются обновления"""
+    chat, user, _ = UserContextMiddleware.resolve_event_context(update)
+    if chat is not None:
+        return chat.id
+    if user is not None:
+        return user.id
+    return None
+
+
+class _Shard:
+    """Очереди чатов одной части: ID чата -> ожидающие обновления"""
+
+    __slots__ = ("index", "chats", "depth")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.chats: Dict[int, Deque[asyncio.Future]] = {}
+        self.depth = 0
+
+    def _report(self):
+        SCHEDULER_QUEUE_DEPTH.set(self.depth, shard=str(self.index))
+
+    async def acquire(self, chat_id: int):
+        """Ждет очереди чата; первое обновление чата проходит сразу"""
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self.chats.setdefault(chat_id, deque())
+        queue.append(waiter)
+        self.depth += 1
+        self._report()
+        if len(queue) == 1:
+            waiter.set_result(None)
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Очередь уже дошла до этого обновления: передаем ее следующему
+                self.release(chat_id)
+            else:
+                # Отмененное обновление могло уже оказаться первым в очереди
+                was_first = queue[0] is waiter
+                queue.remove(waiter)
+                self.depth -= 1
+                self._report()
+                if not queue:
+                    del self.chats[chat_id]
+                elif was_first:
+                    queue[0].set_result(None)
+            raise
+
+    def release(self, chat_id: int):
+        """Завершает обработку обновления и пропускает следующее обновление чата"""
+        queue = self.chats[chat_id]
+        queue.popleft()
+        self.depth -= 1
+        self._report()
+        if queue:
+            # Отмененное ожидание удалит себя из очереди само и передаст ее дальше
+            if not queue[0].done():
+                queue[0].set_result(None)
+        else:
+            del self.chats[chat_id]
+
+
+class UpdateScheduler:
+    """Очереди чатов и общий лимит одновременно обрабатываемых обновлений"""
+
+    def __init__(self, concurrency: int = SCHEDULER_CONCURRENCY, shards: int = SCHEDULER_SHARDS):
+        self.concurrency = concurrency
+        self.shards = [_Shard(index) for index in range(shards)]
+        self.active = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        for shard in self.shards:
+            shard._report()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Семафор создается лениво, внутри работающего цикла событий
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _run_limited(self, call):
+        async with self._get_semaphore():
+            self.active += 1
+            SCHEDULER_ACTIVE.set(self.active)
+            try:
+                return await call()
+            finally:
+                self.active -= 1
+                SCHEDULER_ACTIVE.set(self.active)
+
+    async def run(self, chat_id: Optional[int], call):
+        """
+        Выполняет обработку обновления в очереди его чата.
+
+        Args:
+            chat_id: ID чата; None - обновление без чата, только общий лимит
+            call: Функция без аргументов, возвращающая корутину обработки
+
+        Returns:
+            Результат обработки
+        """
+        if chat_id is None:
+            return await self._run_limited(call)
+
+        # Слот общего лимита занимается только после того, как подошла очередь чата,
+        # иначе обновления, ждущие медленный чат, заняли бы все слоты
+        shard = self.shards[chat_id % len(self.shards)]
+        await shard.acquire(chat_id)
+        try:
+            return await self._run_limited(call)
+        finally:
+            shard.release(chat_id)
+
+
+class ScheduledDispatcher(Dispatcher):
+    """
+    Диспетчер, обрабатывающий обновления через UpdateScheduler.
+
+    Очередь чата занимается в feed_update, то есть раньше middleware,
+    которые читают состояние FSM: иначе два обновления одного чата могли бы
+    поменяться местами, пока ждут базу данных.
+    """
+
+    def __init__(self, *args: Any, scheduler: Optional[UpdateScheduler] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler or UpdateScheduler()
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        parent = super()
+        return await self.scheduler.run(
+            chat_key_of(update),
+            lambda: parent.feed_update(bot, update, **kwargs)
+        )
@@ -0,0 +1,159 @@
+"""
+Общий снимок глобальной статистики.
+
+Глобальные значения (размер очереди, количество номеров по статусам,
+количество администраторов) одинаковы для всех пользователей, поэтому
+они пересчитываются фоновой задачей, а меню только читают готовый
+неизменяемый снимок без блокировок.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+# Интервал периодического обновления снимка (в секундах)
+STATS_REFRESH_INTERVAL = 5.0
+
+# Минимальный интервал между обновлениями при частых изменениях данных (в секундах)
+STATS_MIN_REFRESH_INTERVAL = 0.5
+
+# Окно для расчета пропускной способности (в секундах)
+STATS_THROUGHPUT_WINDOW = 3600
+
+
+@dataclass(frozen=True)
+class StatsSnapshot:
+    """Неизменяемый снимок глобальной статистики"""
+    status_counts: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+    total_numbers: int = 0
+    total_users: int = 0
+    admin_count: int = 0
+    completed_recently: int = 0          # номеров покинуло очередь за STATS_THROUGHPUT_WINDOW
+    active_admins: int = 0               # администраторов, менявших статусы за то же окно
+    last_admin_action_at: Optional[float] = None
+    work_status: bool = False
+    moderator_status: bool = False
+    generated_at: float = 0.0
+
+    def count(self, status: str) -> int:
+        """Количество номеров с указанным статусом"""
+        return self.status_counts.get(status, 0)
+
+    @property
+    def throughput_per_hour(self) -> float:
+        """Сколько номеров обрабатывается за час при текущем темпе"""
+        return self.completed_recently * 3600 / STATS_THROUGHPUT_WINDOW
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Оценка времени до обработки всей очереди; None, если темп нулевой"""
+        if not self.throughput_per_hour:
+            return None
+        return self.count("waiting") / self.throughput_per_hour * 3600
+
+
+# Текущий снимок; заменяется целиком, поэтому читается без блокировок
+_snapshot: Optional[StatsSnapshot] = None
+
+# Событие для внеочередного обновления и цикл событий фоновой задачи
+_refresh_event: Optional[asyncio.Event] = None
+_refresh_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def refresh_stats_snapshot() -> StatsSnapshot:
+    """
+    Пересчитывает снимок статистики из базы данных.
+
+    Returns:
+        Новый снимок (или предыдущий, если база данных недоступна)
+    """
+    global _snapshot
+    from storage_db import get_global_stats
+
+    data = get_global_stats()
+    if not data:
+        return _snapshot or StatsSnapshot()
+
+    _snapshot = StatsSnapshot(
+        status_counts=MappingProxyType(dict(data["status_counts"])),
+        total_numbers=data["total_numbers"],
+        total_users=data["total_users"],
+        admin_count=data["admin_count"],
+        completed_recently=data["completed_recently"],
+        active_admins=data["active_admins"],
+        last_admin_action_at=data["last_admin_action_at"],
+        work_status=data["work_status"],
+        moderator_status=data["moderator_status"],
+        generated_at=time.time()
+    )
+    return _snapshot
+
+
+def get_stats_snapshot() -> StatsSnapshot:
+    """
+    Возвращает текущий снимок статистики.
+
+    Если фоновая задача еще ни разу не отработала, снимок вычисляется сразу.
+    """
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = refresh_stats_snapshot()
+    return snapshot
+
+
+def mark_stats_dirty():
+    """
+    Сообщает фоновой задаче, что данные изменились и снимок нужно обновить.
+
+    Безопасно вызывать из любого потока; без запущенной задачи ничего не делает.
+    """
+    if _refresh_event is None or _refresh_loop is None:
+        return
+
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+
+    if running_loop is _refresh_loop:
+        _refresh_event.set()
+    elif not _refresh_loop.is_closed():
+        _refresh_loop.call_soon_threadsafe(_refresh_event.set)
+
+
+async def run_stats_refresher(
+    interval: float = STATS_REFRESH_INTERVAL,
+    min_interval: float = STATS_MIN_REFRESH_INTERVAL
+):
+    """
+    Фоновая задача: обновляет снимок раз в `interval` секунд или сразу после
+    изменения данных, но не чаще одного раза в `min_interval` секунд.
+    """
+    global _refresh_event, _refresh_loop
+    _refresh_loop = asyncio.get_running_loop()
+    _refresh_event = asyncio.Event()
+
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                # Запрос к базе выполняется вне цикла событий
+                await asyncio.to_thread(refresh_stats_snapshot)
+            except Exception as e:
+                logging.error(f"Ошибка при обновлении статистики: {e}")
+
+            # Склеиваем серию изменений в одно обновление
+            elapsed = time.monotonic() - started
+            if elapsed < min_interval:
+                await asyncio.sleep(min_interval - elapsed)
+
+            try:
+                await asyncio.wait_for(_refresh_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            _refresh_event.clear()
+    finally:
+        _refresh_event = None
+        _refresh_loop = None
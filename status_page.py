@@ -0,0 +1,297 @@
+"""
+Страница статуса бота с живыми данными очереди.
+
+Страница строится из снимка статистики (stats.py) один раз на каждый новый
+снимок, а все посетители получают готовые байты. ETag позволяет браузеру
+не скачивать страницу повторно (ответ 304), а поток событий /events
+(server-sent events) присылает обновленный блок, только когда данные
+действительно изменились.
+"""
+import asyncio
+import hashlib
+import html
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from aiohttp import web
+
+# Поток /events можно отключить, например, за прокси, который буферизует ответы
+STATUS_PAGE_SSE = os.getenv("STATUS_PAGE_SSE", "1") != "0"
+
+# Как часто проверять, не появился ли новый снимок (в секундах)
+STATUS_CHECK_INTERVAL = 1.0
+
+# Как часто отправлять комментарий-пинг в пустой поток событий (в секундах)
+SSE_HEARTBEAT_INTERVAL = 15.0
+
+# Порядок и подписи статусов в таблице
+STATUS_ORDER = ("waiting", "in_progress", "pending", "processed", "rejected", "failed", "canceled", "expired")
+
+# HTML шаблон страницы; блок #live заменяется целиком при обновлении
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Narkoz Team Bot</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            margin: 0;
+            padding: 0;
+            background-color: #121212;
+            color: #ffffff;
+            display: flex;
+            flex-direction: column;
+            min-height: 100vh;
+            align-items: center;
+            justify-content: center;
+            text-align: center;
+        }
+        .container {
+            max-width: 800px;
+            padding: 20px;
+        }
+        h1 {
+            color: #4CAF50;
+            margin-bottom: 20px;
+        }
+        p {
+            line-height: 1.6;
+            margin-bottom: 15px;
+        }
+        .status {
+            background-color: #1e1e1e;
+            padding: 15px;
+            border-radius: 5px;
+            margin-top: 20px;
+            border-left: 4px solid #4CAF50;
+        }
+        .status.warning {
+            border-left-color: #FF9800;
+        }
+        table {
+            margin: 10px auto;
+            border-collapse: collapse;
+        }
+        td {
+            padding: 4px 12px;
+            text-align: left;
+        }
+        td.count {
+            text-align: right;
+            font-weight: bold;
+        }
+        .tg-link {
+            display: inline-block;
+            background-color: #0088cc;
+            color: white;
+            padding: 10px 20px;
+            text-decoration: none;
+            border-radius: 5px;
+            margin-top: 20px;
+            font-weight: bold;
+            transition: background-color 0.3s;
+        }
+        .tg-link:hover {
+            background-color: #006699;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>Narkoz Team Бот</h1>
+        <p>
+            Это серверная часть Telegram-бота Narkoz Team, который помогает управлять очередью номеров и другими задачами.
+        </p>
+        <div id="live">{live}</div>
+        <a href="https://t.me/narkoz_team_bot" class="tg-link">Открыть в Telegram</a>
+    </div>
+    {script}
+</body>
+</html>
+'''
+
+# Подписка на обновления; без поддержки EventSource страница остается статичной
+SSE_SCRIPT = '''<script>
+        if (window.EventSource) {
+            new EventSource("/events").onmessage = function (event) {
+                document.getElementById("live").innerHTML = JSON.parse(event.data).html;
+            };
+        }
+    </script>'''
+
+
+@dataclass(frozen=True)
+class RenderedStatus:
+    """Готовые ответы для одного состояния страницы"""
+    etag: str
+    page: bytes      # полная HTML-страница
+    event: bytes     # сообщение для потока /events
+
+
+# Последний результат отрисовки: (снимок, готовность) -> RenderedStatus
+_rendered: Optional[Tuple[object, bool, RenderedStatus]] = None
+_checked_at: float = 0.0
+
+
+def render_live_block(snapshot, ready: bool) -> str:
+    """
+    Формирует HTML блока с текущим состоянием очереди.
+
+    Args:
+        snapshot: Снимок статистики StatsSnapshot
+        ready: Итог проверки готовности (health.readiness)
+
+    Returns:
+        HTML-фрагмент
+    """
+    from utils import format_date, format_duration, get_status_emoji, get_status_text
+
+    if ready:
+        state = '<div class="status"><p>Статус: <span style="color: #4CAF50;">✓ Запущен</span></p>'
+    else:
+        state = '<div class="status warning"><p>Статус: <span style="color: #FF9800;">⚠ Есть проблемы</span></p>'
+    state += f"<p>Прием номеров: {'открыт' if snapshot.work_status else 'закрыт'}</p></div>"
+
+    # Известные статусы в фиксированном порядке, затем все остальные
+    statuses = [status for status in STATUS_ORDER if snapshot.count(status)]
+    statuses += sorted(status for status in snapshot.status_counts if status not in STATUS_ORDER)
+    rows = "".join(
+        f"<tr><td>{get_status_emoji(status)} {html.escape(get_status_text(status))}</td>"
+        f"<td class=\"count\">{snapshot.count(status)}</td></tr>"
+        for status in statuses
+    )
+    queue = (
+        f'<div class="status"><p>Очередь: <b>{snapshot.count("waiting")}</b> в ожидании, '
+        f"всего номеров {snapshot.total_numbers}</p>"
+        f"<table>{rows}</table></div>"
+    )
+
+    if not snapshot.count("waiting"):
+        eta = "очередь пуста"
+    elif snapshot.eta_seconds is None:
+        eta = "нет данных (за последний час номера не обрабатывались)"
+    else:
+        eta = format_duration(snapshot.eta_seconds)
+    throughput = (
+        f'<div class="status"><p>Обработано за час: <b>{snapshot.completed_recently}</b></p>'
+        f"<p>Ожидаемое время обработки очереди: {eta}</p></div>"
+    )
+
+    last_action = format_date(snapshot.last_admin_action_at) if snapshot.last_admin_action_at else "—"
+    admins = (
+        f'<div class="status"><p>Администраторов: {snapshot.admin_count}, '
+        f"активны за последний час: {snapshot.active_admins}</p>"
+        f"<p>Последнее действие администратора: {last_action}</p></div>"
+    )
+
+    return state + queue + throughput + admins
+
+
+def render_status(snapshot, ready: bool) -> RenderedStatus:
+    """Строит страницу, ETag и сообщение для потока событий"""
+    live = render_live_block(snapshot, ready)
+    page = PAGE_TEMPLATE.replace("{live}", live).replace("{script}", SSE_SCRIPT if STATUS_PAGE_SSE else "")
+    page_bytes = page.encode("utf-8")
+
+    # ETag зависит только от содержимого, поэтому не меняется, пока не изменились данные
+    etag = f'"{hashlib.sha1(page_bytes).hexdigest()[:20]}"'
+    payload = json.dumps({"html": live}, ensure_ascii=False)
+    event = f"id: {etag}\ndata: {payload}\n\n".encode("utf-8")
+
+    return RenderedStatus(etag=etag, page=page_bytes, event=event)
+
+
+def get_rendered_status() -> RenderedStatus:
+    """
+    Возвращает готовую страницу для текущего снимка.
+
+    Снимок и готовность проверяются не чаще раза в STATUS_CHECK_INTERVAL,
+    а страница перерисовывается только при их изменении.
+    """
+    global _rendered, _checked_at
+    from health import readiness
+    from stats import get_stats_snapshot
+
+    now = time.monotonic()
+    if _rendered is not None and now - _checked_at < STATUS_CHECK_INTERVAL:
+        return _rendered[2]
+    _checked_at = now
+
+    snapshot = get_stats_snapshot()
+    ready = readiness()["ready"]
+    if _rendered is None or _rendered[0] is not snapshot or _rendered[1] != ready:
+        _rendered = (snapshot, ready, render_status(snapshot, ready))
+    return _rendered[2]
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(
+        candidate == etag or candidate == f"W/{etag}" for candidate in candidates
+    )
+
+
+async def status_page(request: web.Request) -> web.Response:
+    """Главная страница; поддерживает условный запрос по If-None-Match"""
+    rendered = get_rendered_status()
+    headers = {"ETag": rendered.etag, "Cache-Control": "no-cache"}
+
+    if _etag_matches(request.headers.get("If-None-Match"), rendered.etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=rendered.page, content_type="text/html", charset="utf-8", headers=headers)
+
+
+async def status_events(request: web.Request) -> web.StreamResponse:
+    """Поток server-sent events: новый блок страницы при каждом изменении данных"""
+    stopping: asyncio.Event = request.app["status_page_stopping"]
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    await response.prepare(request)
+
+    # Переподключившийся браузер присылает id последнего полученного события
+    last_sent = request.headers.get("Last-Event-ID")
+    idle = 0.0
+    try:
+        while not stopping.is_set():
+            rendered = get_rendered_status()
+            if rendered.etag != last_sent:
+                await response.write(rendered.event)
+                last_sent = rendered.etag
+                idle = 0.0
+            elif idle >= SSE_HEARTBEAT_INTERVAL:
+                await response.write(b": ping\n\n")
+                idle = 0.0
+
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=STATUS_CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                idle += STATUS_CHECK_INTERVAL
+    except ConnectionResetError:
+        # Посетитель закрыл страницу
+        pass
+    return response
+
+
+def setup_status_page(app: web.Application):
+    """Регистрирует страницу статуса и поток событий в приложении"""
+    app["status_page_stopping"] = asyncio.Event()
+
+    async def stop_streams(app: web.Application):
+        # Открытые потоки завершаются сразу, а не по таймауту остановки сервера
+        app["status_page_stopping"].set()
+
+    app.on_shutdown.append(stop_streams)
+    app.router.add_get("/", status_page)
+    if STATUS_PAGE_SSE:
+        app.router.add_get("/events", status_events)
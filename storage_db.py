@@ -1,18 +1,55 @@
 import datetime
 import json
-from typing import Dict, List, Optional, Union, Any
-from sqlalchemy import and_
-from sqlalchemy.exc import SQLAlchemyError
-from models import User, PhoneNumber, PhoneDetails, Admin, SystemSetting
+from typing import Dict, List, Optional, Tuple, Union, Any
+from sqlalchemy import and_, func, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from models import (
+    User,
+    PhoneNumber,
+    Admin,
+    SystemSetting,
+    NotificationOutbox,
+    FsmState,
+    CacheInvalidation,
+    AdminDashboard,
+    COMPLETED_STATUSES
+)
 from db_init import Session
-from cache import cached_setting, cached_admin_ids, cached_user_info, clear_cache, clear_user_cache
+import queries
+from cache import (
+    cached_setting,
+    cached_admin_ids,
+    cached_user_info,
+    cached_counter,
+    clear_cache,
+    clear_user_cache,
+    prime_setting,
+    prime_admin_ids,
+    prime_user_info,
+    prime_counter,
+    load_snapshot
+)
+from stats import mark_stats_dirty, STATS_THROUGHPUT_WINDOW
+from outbox import wake_outbox_dispatcher
+from phones import encoded_prefix_range
+from dedup import NUMBER_FILTER_LOAD_BATCH, number_might_exist, rebuild_number_filter, remember_number
 
-def add_number_to_queue(user_id: Union[int, str], phone_number: str) -> bool:
-    """Add a phone number to the queue for a specific user"""
+# Результаты add_number_to_queue
+NUMBER_ADDED = "added"
+NUMBER_DUPLICATE = "duplicate"
+NUMBER_ADD_FAILED = "failed"
+
+def _is_active_number_conflict(error: IntegrityError) -> bool:
+    """Whether the insert failed on uq_phone_numbers_active_phone and not on another constraint"""
+    # PostgreSQL называет индекс, SQLite - колонку («UNIQUE constraint failed: phone_numbers.phone_number»)
+    message = str(error.orig)
+    return "uq_phone_numbers_active_phone" in message or "phone_numbers.phone_number" in message
+
+def _queue_number(user_id: str, phone_number: str, probe: bool) -> str:
+    """Insert or re-queue a number; with probe=False the number is inserted without lookups"""
     session = None
     try:
         session = Session()
-        user_id = str(user_id)
         
         # Проверяем существование пользователя
         user = session.query(User).filter(User.id == user_id).first()
@@ -21,9 +58,20 @@ def add_number_to_queue(user_id: Union[int, str], phone_number: str) -> bool:
             session.add(user)
             session.flush()
         
-        existing_phone = session.query(PhoneNumber).filter(
-            and_(PhoneNumber.user_id == user_id, PhoneNumber.phone_number == phone_number)
-        ).first()
+        existing_phone = None
+        if probe:
+            # Номер уже в очереди у другого пользователя
+            owner = session.query(PhoneNumber.id).filter(
+                PhoneNumber.phone_number == phone_number,
+                PhoneNumber.user_id != user_id,
+                PhoneNumber.status.notin_(COMPLETED_STATUSES)
+            ).first()
+            if owner:
+                return NUMBER_DUPLICATE
+            
+            existing_phone = session.query(PhoneNumber).filter(
+                and_(PhoneNumber.user_id == user_id, PhoneNumber.phone_number == phone_number)
+            ).first()
         
         if existing_phone:
             existing_phone.status = "waiting"
@@ -35,15 +83,81 @@ def add_number_to_queue(user_id: Union[int, str], phone_number: str) -> bool:
                 status="waiting"
             )
             session.add(new_phone)
-            session.add(PhoneDetails(phone_number=new_phone))
         
         session.commit()
-        return True
+        return NUMBER_ADDED
+    except IntegrityError as e:
+        if session:
+            session.rollback()
+        if not _is_active_number_conflict(e):
+            # Например, тот же пользователь одновременно создан другим запросом
+            print(f"Database error in add_number_to_queue: {str(e)}")
+            return NUMBER_ADD_FAILED
+        # Сработал уникальный индекс: номер уже в очереди у другого пользователя
+        return NUMBER_DUPLICATE
     except SQLAlchemyError as e:
         if session:
             session.rollback()
         print(f"Database error in add_number_to_queue: {str(e)}")
-        return False
+        return NUMBER_ADD_FAILED
+    finally:
+        if session:
+            session.close()
+
+def add_number_to_queue(user_id: Union[int, str], phone_number: str) -> str:
+    """
+    Add a phone number to the queue for a specific user.
+    
+    Returns NUMBER_ADDED, NUMBER_DUPLICATE if another user already has the number
+    in the queue, or NUMBER_ADD_FAILED on a database error.
+    """
+    user_id = str(user_id)
+    
+    # Номера, которых фильтр точно не видел, вставляем без проверочных запросов
+    probe = number_might_exist(phone_number)
+    result = _queue_number(user_id, phone_number, probe)
+    if result == NUMBER_DUPLICATE and not probe:
+        # Номер добавлен другим процессом после построения фильтра: разбираемся запросами
+        result = _queue_number(user_id, phone_number, True)
+    
+    if result == NUMBER_ADDED:
+        remember_number(phone_number)
+        
+        # Очищаем кэш глобальных счетчиков
+        clear_cache('counters')
+        mark_stats_dirty()
+    
+    return result
+
+def get_active_number_owner(phone_number: str) -> Optional[str]:
+    """Get the ID of the user whose queue currently holds the number"""
+    session = None
+    try:
+        session = Session()
+        row = session.query(PhoneNumber.user_id).filter(
+            PhoneNumber.phone_number == phone_number,
+            PhoneNumber.status.notin_(COMPLETED_STATUSES)
+        ).first()
+        return row.user_id if row else None
+    except SQLAlchemyError as e:
+        print(f"Database error in get_active_number_owner: {str(e)}")
+        return None
+    finally:
+        if session:
+            session.close()
+
+def build_number_filter() -> int:
+    """Rebuild the in-memory duplicate filter from all stored numbers; returns their count"""
+    session = None
+    try:
+        session = Session()
+        expected = session.query(func.count(PhoneNumber.id)).scalar() or 0
+        numbers = session.execute(select(PhoneNumber.phone_number).execution_options(yield_per=NUMBER_FILTER_LOAD_BATCH)).scalars()
+        rebuild_number_filter(numbers, expected)
+        return expected
+    except SQLAlchemyError as e:
+        print(f"Database error in build_number_filter: {str(e)}")
+        return 0
     finally:
         if session:
             session.close()
@@ -61,9 +175,14 @@ def remove_number_from_queue(user_id: Union[int, str], phone_number: str) -> boo
         ).first()
         
         if phone:
-            # Удаляем номер (каскадное удаление сработает для details)
+            # Удаляем номер
             session.delete(phone)
             session.commit()
+            
+            # Очищаем кэш глобальных счетчиков
+            clear_cache('counters')
+            mark_stats_dirty()
+            
             return True
         return False
     except SQLAlchemyError as e:
@@ -77,59 +196,29 @@ def remove_number_from_queue(user_id: Union[int, str], phone_number: str) -> boo
 
 def get_user_numbers(user_id: Union[int, str]) -> Dict[str, str]:
     """Get all phone numbers in queue for a specific user"""
-    session = None
     try:
-        session = Session()
-        user_id = str(user_id)
-        
-        # Получаем все номера пользователя
-        phones = session.query(PhoneNumber).filter(PhoneNumber.user_id == user_id).all()
-        
         # Преобразуем в нужный формат {phone_number: status}
-        result = {phone.phone_number: phone.status for phone in phones}
-        session.close()
-        return result
+        return {phone_number: status for phone_number, status in queries.user_numbers(str(user_id))}
     except SQLAlchemyError as e:
         print(f"Database error in get_user_numbers: {str(e)}")
         return {}
-    finally:
-        if session:
-            session.close()
 
 def get_user_queue_count(user_id: Union[int, str]) -> int:
     """Get the count of phone numbers in queue for a specific user"""
-    session = None
     try:
-        session = Session()
-        user_id = str(user_id)
-        
-        # Считаем количество номеров пользователя
-        count = session.query(PhoneNumber).filter(PhoneNumber.user_id == user_id).count()
-        session.close()
-        return count
+        return queries.user_queue_count(str(user_id))
     except SQLAlchemyError as e:
         print(f"Database error in get_user_queue_count: {str(e)}")
         return 0
-    finally:
-        if session:
-            session.close()
 
+@cached_counter("queue_count")
 def get_queue_count() -> int:
     """Get the total count of phone numbers in queue across all users"""
-    session = None
     try:
-        session = Session()
-        
-        # Считаем общее количество номеров
-        count = session.query(PhoneNumber).count()
-        session.close()
-        return count
+        return queries.queue_count()
     except SQLAlchemyError as e:
         print(f"Database error in get_queue_count: {str(e)}")
         return 0
-    finally:
-        if session:
-            session.close()
 
 @cached_setting("work_status")
 def get_work_status() -> bool:
@@ -178,6 +267,7 @@ def set_work_status(status: bool) -> bool:
         
         # Очищаем кэш для этой настройки
         clear_cache('settings')
+        mark_stats_dirty()
         
         session.close()
         return True
@@ -237,6 +327,7 @@ def set_moderator_status(status: bool) -> bool:
         
         # Очищаем кэш для этой настройки
         clear_cache('settings')
+        mark_stats_dirty()
         
         session.close()
         return True
@@ -300,10 +391,11 @@ def update_number_status(user_id: Union[int, str], phone_number: str, new_status
             phone.updated_at = datetime.datetime.utcnow()
             
             # Если статус "processed", обновляем время обработки
-            if new_status == "processed" and phone.details:
-                phone.details.processed_at = datetime.datetime.utcnow()
+            if new_status == "processed":
+                phone.processed_at = datetime.datetime.utcnow()
             
             session.commit()
+            mark_stats_dirty()
             return True
         return False
     except SQLAlchemyError as e:
@@ -318,22 +410,11 @@ def update_number_status(user_id: Union[int, str], phone_number: str, new_status
 @cached_admin_ids
 def get_admin_ids() -> List[str]:
     """Get the list of admin IDs"""
-    session = None
     try:
-        session = Session()
-        
-        # Получаем всех администраторов
-        admins = session.query(Admin).all()
-        admin_ids = [admin.id for admin in admins]
-        
-        session.close()
-        return admin_ids
+        return queries.admin_ids()
     except SQLAlchemyError as e:
         print(f"Database error in get_admin_ids: {str(e)}")
         return []
-    finally:
-        if session:
-            session.close()
 
 def add_admin_id(admin_id: Union[int, str]) -> bool:
     """Add an admin ID to the list"""
@@ -353,6 +434,7 @@ def add_admin_id(admin_id: Union[int, str]) -> bool:
             
             # Очищаем кэш администраторов
             clear_cache('admin_ids')
+            mark_stats_dirty()
             
             return True
         return False  # Администратор уже существует
@@ -379,10 +461,13 @@ def remove_admin_id(admin_id: Union[int, str]) -> bool:
             # Проверяем, не является ли он главным администратором
             if not admin.is_main_admin:
                 session.delete(admin)
+                # Панель бывшего администратора больше не обновляется
+                session.query(AdminDashboard).filter(AdminDashboard.admin_id == admin_id).delete()
                 session.commit()
                 
                 # Очищаем кэш администраторов
                 clear_cache('admin_ids')
+                mark_stats_dirty()
                 
                 return True
             return False  # Нельзя удалить главного администратора
@@ -398,26 +483,114 @@ def remove_admin_id(admin_id: Union[int, str]) -> bool:
 
 def get_all_numbers() -> Dict[str, Dict[str, str]]:
     """Get all phone numbers in the system"""
-    session = None
     try:
-        session = Session()
-        
-        # Получаем все номера
-        phones = session.query(PhoneNumber).all()
-        
         # Преобразуем в нужный формат {user_id: {phone_number: status}}
         result = {}
-        for phone in phones:
-            user_id = phone.user_id
+        for user_id, phone_number, status in queries.all_numbers():
             if user_id not in result:
                 result[user_id] = {}
-            result[user_id][phone.phone_number] = phone.status
-        
-        session.close()
+            result[user_id][phone_number] = status
         return result
     except SQLAlchemyError as e:
         print(f"Database error in get_all_numbers: {str(e)}")
         return {}
+
+def get_all_number_rows() -> List[Dict[str, Any]]:
+    """Get all phone numbers with their primary keys, oldest first"""
+    session = None
+    try:
+        session = Session()
+        
+        rows = session.query(
+            PhoneNumber.id, PhoneNumber.user_id, PhoneNumber.phone_number, PhoneNumber.status
+        ).order_by(PhoneNumber.id).all()
+        
+        return [
+            {"id": row.id, "user_id": row.user_id, "phone_number": row.phone_number, "status": row.status}
+            for row in rows
+        ]
+    except SQLAlchemyError as e:
+        print(f"Database error in get_all_number_rows: {str(e)}")
+        return []
+    finally:
+        if session:
+            session.close()
+
+def get_phone_by_id(phone_id: int) -> Dict[str, Any]:
+    """Get a phone number by its primary key"""
+    session = None
+    try:
+        session = Session()
+        
+        phone = session.get(PhoneNumber, phone_id)
+        if not phone:
+            return {}
+        
+        return {
+            "id": phone.id,
+            "user_id": phone.user_id,
+            "phone_number": phone.phone_number,
+            "status": phone.status,
+            "added_at": phone.created_at.timestamp() if phone.created_at else None
+        }
+    except SQLAlchemyError as e:
+        print(f"Database error in get_phone_by_id: {str(e)}")
+        return {}
+    finally:
+        if session:
+            session.close()
+
+def search_numbers(query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Search numbers for admins: "+7999" by number prefix, "4567" by last digits, "@name" by username prefix.
+    
+    Every mode is a range scan over its own index, ordered by that index, so a page costs
+    the same on a thousand rows and on a million. An empty query returns the newest numbers.
+    """
+    session = None
+    try:
+        session = Session()
+        query = (query or "").strip()
+        compact = "".join(char for char in query if char not in " -()")
+        
+        lowered_username = func.lower(User.username)
+        rows = session.query(
+            PhoneNumber.id, PhoneNumber.user_id, PhoneNumber.phone_number, PhoneNumber.status, User.username
+        ).join(User, User.id == PhoneNumber.user_id)
+        
+        # Верхняя граница диапазона: любая строка с этим началом меньше key + "\uffff"
+        if not compact:
+            rows = rows.order_by(PhoneNumber.id.desc())
+        elif compact.startswith("+") and (compact == "+" or compact[1:].isdigit()):
+            # Номера хранятся числами в порядке строк, начало номера - тоже диапазон
+            low, high = encoded_prefix_range(compact)
+            rows = rows.filter(
+                PhoneNumber.phone_number >= low, PhoneNumber.phone_number < high
+            ).order_by(PhoneNumber.phone_number, PhoneNumber.id)
+        elif compact.isdigit():
+            key = compact[::-1]
+            rows = rows.filter(
+                PhoneNumber.phone_reversed >= key, PhoneNumber.phone_reversed < key + "\uffff"
+            ).order_by(PhoneNumber.phone_reversed, PhoneNumber.id)
+        else:
+            name = query.lstrip("@").lower()
+            rows = rows.filter(
+                lowered_username >= name, lowered_username < name + "\uffff"
+            ).order_by(lowered_username, PhoneNumber.id)
+        
+        return [
+            {
+                "id": row.id,
+                "user_id": row.user_id,
+                "phone_number": row.phone_number,
+                "status": row.status,
+                "username": row.username or ""
+            }
+            for row in rows.offset(offset).limit(limit).all()
+        ]
+    except SQLAlchemyError as e:
+        print(f"Database error in search_numbers: {str(e)}")
+        return []
     finally:
         if session:
             session.close()
@@ -466,32 +639,11 @@ def save_user_info(user_id: Union[int, str], username: str, first_name: str, las
 @cached_user_info
 def get_user_info(user_id: Union[int, str]) -> Dict[str, Any]:
     """Get information about a user"""
-    session = None
     try:
-        session = Session()
-        user_id = str(user_id)
-        
-        # Получаем пользователя
-        user = session.query(User).filter(User.id == user_id).first()
-        
-        if user:
-            # Преобразуем в словарь
-            result = {
-                "username": user.username,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "created_at": user.created_at.timestamp() if user.created_at else None
-            }
-            session.close()
-            return result
-        session.close()
-        return {}
+        return queries.user_info(str(user_id)) or {}
     except SQLAlchemyError as e:
         print(f"Database error in get_user_info: {str(e)}")
         return {}
-    finally:
-        if session:
-            session.close()
 
 def save_phone_details(user_id: Union[int, str], phone_number: str, status: Optional[str] = None, note: Optional[str] = None) -> bool:
     """Save additional details about a phone number"""
@@ -513,11 +665,6 @@ def save_phone_details(user_id: Union[int, str], phone_number: str, status: Opti
                 status=status or "waiting"
             )
             session.add(phone)
-            session.flush()  # Чтобы получить ID нового номера
-            
-            # Создаем запись с деталями
-            details = PhoneDetails(phone_number=phone)
-            session.add(details)
         
         # Если статус указан, обновляем его
         if status:
@@ -531,6 +678,12 @@ def save_phone_details(user_id: Union[int, str], phone_number: str, status: Opti
         phone.updated_at = datetime.datetime.utcnow()
         
         session.commit()
+        remember_number(phone_number)
+        
+        # Очищаем кэш глобальных счетчиков
+        clear_cache('counters')
+        mark_stats_dirty()
+        
         return True
     except SQLAlchemyError as e:
         if session:
@@ -559,18 +712,13 @@ def get_phone_details(user_id: Union[int, str], phone_number: str) -> Dict[str,
                 "status": phone.status,
                 "added_at": phone.created_at.timestamp() if phone.created_at else None,
                 "updated_at": phone.updated_at.timestamp() if phone.updated_at else None,
-                "note": phone.note
+                "note": phone.note,
+                "processed_at": phone.processed_at.timestamp() if phone.processed_at else None,
+                "processor_id": phone.processor_id,
+                "code_sent": phone.code_sent,
+                "code_accepted": phone.code_accepted
             }
             
-            # Если есть дополнительные детали, добавляем их
-            if phone.details:
-                result.update({
-                    "processed_at": phone.details.processed_at.timestamp() if phone.details.processed_at else None,
-                    "processor_id": phone.details.processor_id,
-                    "code_sent": phone.details.code_sent,
-                    "code_accepted": phone.details.code_accepted
-                })
-            
             session.close()
             return result
         
@@ -583,17 +731,35 @@ def get_phone_details(user_id: Union[int, str], phone_number: str) -> Dict[str,
         if session:
             session.close()
 
-def update_number_status_with_notification(user_id: Union[int, str], phone_number: str, new_status: str, note: Optional[str] = None) -> bool:
-    """Update the status of a phone number and save details for notification"""
+def update_number_status_with_notification(
+    user_id: Union[int, str],
+    phone_number: str,
+    new_status: str,
+    note: Optional[str] = None,
+    notification_text: Optional[str] = None,
+    processor_id: Optional[Union[int, str]] = None,
+    phone_id: Optional[int] = None
+) -> bool:
+    """
+    Update the status of a phone number and save details for notification.
+    
+    If notification_text is given, the notification for the user is written to the
+    outbox in the same transaction and delivered later by the outbox dispatcher.
+    processor_id records the admin who changed the status.
+    If phone_id is given, the number is looked up by primary key.
+    """
     session = None
     try:
         session = Session()
         user_id = str(user_id)
         
         # Находим номер
-        phone = session.query(PhoneNumber).filter(
-            and_(PhoneNumber.user_id == user_id, PhoneNumber.phone_number == phone_number)
-        ).first()
+        if phone_id is not None:
+            phone = session.get(PhoneNumber, phone_id)
+        else:
+            phone = session.query(PhoneNumber).filter(
+                and_(PhoneNumber.user_id == user_id, PhoneNumber.phone_number == phone_number)
+            ).first()
         
         if phone:
             # Обновляем статус и примечание
@@ -604,11 +770,26 @@ def update_number_status_with_notification(user_id: Union[int, str], phone_numbe
             # Обновляем время
             phone.updated_at = datetime.datetime.utcnow()
             
-            # Если статус "processed", обновляем время обработки в деталях
-            if new_status == "processed" and phone.details:
-                phone.details.processed_at = datetime.datetime.utcnow()
+            # Если статус "processed", обновляем время обработки
+            if new_status == "processed":
+                phone.processed_at = datetime.datetime.utcnow()
+            
+            # Запоминаем, какой администратор изменил статус
+            if processor_id is not None:
+                phone.processor_id = str(processor_id)
+            
+            # Уведомление сохраняется в той же транзакции, что и новый статус
+            if notification_text:
+                session.add(NotificationOutbox(
+                    chat_id=user_id,
+                    text=notification_text,
+                    parse_mode="Markdown"
+                ))
             
             session.commit()
+            mark_stats_dirty()
+            if notification_text:
+                wake_outbox_dispatcher()
             return True
         return False
     except SQLAlchemyError as e:
@@ -620,6 +801,499 @@ def update_number_status_with_notification(user_id: Union[int, str], phone_numbe
         if session:
             session.close()
 
+def claim_pending_notifications(limit: int = 50, lease_seconds: int = 60) -> List[Dict[str, Any]]:
+    """
+    Claim a batch of due outbox notifications for delivery.
+    
+    Claimed rows are postponed by lease_seconds, so a dispatcher that dies mid-delivery
+    does not lose them: they become due again after the lease expires.
+    """
+    session = None
+    try:
+        session = Session()
+        now = datetime.datetime.utcnow()
+        
+        # Несколько процессов могут забирать уведомления одновременно: строки, уже
+        # заблокированные другим процессом, пропускаются (в SQLite игнорируется)
+        rows = session.query(NotificationOutbox).filter(
+            and_(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now)
+        ).order_by(NotificationOutbox.id).limit(limit).with_for_update(skip_locked=True).all()
+        
+        result = []
+        for row in rows:
+            row.next_attempt_at = now + datetime.timedelta(seconds=lease_seconds)
+            row.attempts += 1
+            result.append({
+                "id": row.id,
+                "chat_id": row.chat_id,
+                "text": row.text,
+                "parse_mode": row.parse_mode,
+                "attempts": row.attempts
+            })
+        
+        session.commit()
+        return result
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in claim_pending_notifications: {str(e)}")
+        return []
+    finally:
+        if session:
+            session.close()
+
+def mark_notification_sent(notification_id: int) -> bool:
+    """Mark an outbox notification as delivered"""
+    session = None
+    try:
+        session = Session()
+        
+        row = session.get(NotificationOutbox, notification_id)
+        if row:
+            row.status = "sent"
+            row.sent_at = datetime.datetime.utcnow()
+            row.last_error = None
+            session.commit()
+            return True
+        return False
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in mark_notification_sent: {str(e)}")
+        return False
+    finally:
+        if session:
+            session.close()
+
+def mark_notification_failed(notification_id: int, error: str, retry_at: Optional[datetime.datetime] = None) -> bool:
+    """Record a failed delivery; without retry_at the notification is given up on"""
+    session = None
+    try:
+        session = Session()
+        
+        row = session.get(NotificationOutbox, notification_id)
+        if row:
+            row.last_error = error
+            if retry_at:
+                row.next_attempt_at = retry_at
+            else:
+                row.status = "failed"
+            session.commit()
+            return True
+        return False
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in mark_notification_failed: {str(e)}")
+        return False
+    finally:
+        if session:
+            session.close()
+
+def get_global_stats() -> Dict[str, Any]:
+    """Get system-wide statistics shared by all menus"""
+    session = None
+    try:
+        session = Session()
+        
+        # Количество номеров по статусам одним запросом
+        status_counts = {
+            status: count
+            for status, count in session.query(PhoneNumber.status, func.count(PhoneNumber.id)).group_by(PhoneNumber.status).all()
+        }
+        
+        # Количество пользователей, у которых есть номера
+        total_users = session.query(func.count(func.distinct(PhoneNumber.user_id))).scalar() or 0
+        
+        admin_count = session.query(func.count(Admin.id)).scalar() or 0
+        
+        # Пропускная способность: сколько номеров покинуло очередь за последний час
+        window_start = datetime.datetime.utcnow() - datetime.timedelta(seconds=STATS_THROUGHPUT_WINDOW)
+        completed_recently = session.query(func.count(PhoneNumber.id)).filter(
+            PhoneNumber.status.in_(COMPLETED_STATUSES),
+            PhoneNumber.updated_at >= window_start
+        ).scalar() or 0
+        
+        # Активность администраторов по отметкам в номерах
+        active_admins, last_admin_action = session.query(
+            func.count(func.distinct(PhoneNumber.processor_id)).filter(PhoneNumber.updated_at >= window_start),
+            func.max(PhoneNumber.updated_at)
+        ).filter(
+            PhoneNumber.processor_id.isnot(None)
+        ).one()
+        
+        settings = {
+            setting.key: bool(setting.value)
+            for setting in session.query(SystemSetting).filter(
+                SystemSetting.key.in_(["work_status", "moderator_status"])
+            ).all()
+        }
+        
+        return {
+            "status_counts": status_counts,
+            "total_numbers": sum(status_counts.values()),
+            "total_users": total_users,
+            "admin_count": admin_count,
+            "completed_recently": completed_recently,
+            "active_admins": active_admins or 0,
+            "last_admin_action_at": (
+                last_admin_action.replace(tzinfo=datetime.timezone.utc).timestamp() if last_admin_action else None
+            ),
+            "work_status": settings.get("work_status", False),
+            "moderator_status": settings.get("moderator_status", False)
+        }
+    except SQLAlchemyError as e:
+        print(f"Database error in get_global_stats: {str(e)}")
+        return {}
+    finally:
+        if session:
+            session.close()
+
+def get_recent_users(limit: int = 200) -> Dict[str, Dict[str, Any]]:
+    """Get information about the most recently active users"""
+    session = None
+    try:
+        session = Session()
+        
+        # Последние активные пользователи - по времени последнего обновления
+        users = session.query(User).order_by(User.updated_at.desc()).limit(limit).all()
+        
+        result = {
+            user.id: {
+                "username": user.username,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "created_at": user.created_at.timestamp() if user.created_at else None
+            }
+            for user in users
+        }
+        return result
+    except SQLAlchemyError as e:
+        print(f"Database error in get_recent_users: {str(e)}")
+        return {}
+    finally:
+        if session:
+            session.close()
+
+def warm_up_cache(snapshot_path: Optional[str] = None, snapshot_max_age: float = 600, recent_users: int = 200) -> Dict[str, str]:
+    """
+    Preload admins, settings, global counters and recently active users into the cache.
+    
+    If a snapshot file is given and fresh enough, its contents are loaded first and
+    only the missing parts are read from the database.
+    
+    Returns:
+        Mapping of cache type to its source ('snapshot' or 'db')
+    """
+    sources = {}
+    
+    if snapshot_path:
+        for cache_type in load_snapshot(snapshot_path, snapshot_max_age):
+            sources[cache_type] = "snapshot"
+    
+    if "admin_ids" not in sources:
+        session = None
+        try:
+            session = Session()
+            admin_ids = [admin_id for (admin_id,) in session.query(Admin.id).all()]
+            prime_admin_ids(admin_ids)
+            sources["admin_ids"] = "db"
+        except SQLAlchemyError as e:
+            print(f"Database error in warm_up_cache (admin_ids): {str(e)}")
+        finally:
+            if session:
+                session.close()
+    
+    if "settings" not in sources:
+        session = None
+        try:
+            session = Session()
+            # Обе настройки читаются одним запросом
+            settings = session.query(SystemSetting).filter(
+                SystemSetting.key.in_(["work_status", "moderator_status"])
+            ).all()
+            for setting in settings:
+                prime_setting(setting.key, bool(setting.value))
+            sources["settings"] = "db"
+        except SQLAlchemyError as e:
+            print(f"Database error in warm_up_cache (settings): {str(e)}")
+        finally:
+            if session:
+                session.close()
+    
+    if "counters" not in sources:
+        session = None
+        try:
+            session = Session()
+            prime_counter("queue_count", session.query(PhoneNumber).count())
+            sources["counters"] = "db"
+        except SQLAlchemyError as e:
+            print(f"Database error in warm_up_cache (counters): {str(e)}")
+        finally:
+            if session:
+                session.close()
+    
+    if "user_info" not in sources and recent_users > 0:
+        for user_id, info in get_recent_users(recent_users).items():
+            prime_user_info(user_id, info)
+        sources["user_info"] = "db"
+    
+    return sources
+
+def get_fsm_record(key: str) -> Dict[str, Any]:
+    """Get the FSM state and data stored under the key"""
+    session = None
+    try:
+        session = Session()
+        record = session.get(FsmState, key)
+        if not record:
+            return {}
+        return {"state": record.state, "data": record.data or {}}
+    except SQLAlchemyError as e:
+        print(f"Database error in get_fsm_record: {str(e)}")
+        return {}
+    finally:
+        if session:
+            session.close()
+
+def save_fsm_record(key: str, state: Optional[str], data: Dict[str, Any]) -> bool:
+    """Save the FSM state and data under the key; an empty record is deleted"""
+    session = None
+    try:
+        session = Session()
+        record = session.get(FsmState, key)
+        
+        if state is None and not data:
+            # Пустые записи не храним, чтобы таблица не росла
+            if record:
+                session.delete(record)
+        elif record:
+            record.state = state
+            record.data = data
+            record.updated_at = datetime.datetime.utcnow()
+        else:
+            session.add(FsmState(key=key, state=state, data=data))
+        
+        session.commit()
+        return True
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in save_fsm_record: {str(e)}")
+        return False
+    finally:
+        if session:
+            session.close()
+
+def save_fsm_records(records: Dict[str, Any]) -> bool:
+    """
+    Save several FSM records in one transaction.
+    
+    records maps a key to a (state, data) pair; records without state and data are deleted.
+    """
+    session = None
+    try:
+        session = Session()
+        
+        # Существующие записи читаются одним запросом
+        existing = {
+            record.key: record
+            for record in session.query(FsmState).filter(FsmState.key.in_(list(records))).all()
+        }
+        
+        for key, (state, data) in records.items():
+            record = existing.get(key)
+            if state is None and not data:
+                if record:
+                    session.delete(record)
+            elif record:
+                record.state = state
+                record.data = data
+                # Время обновляется даже без изменений: по нему истекают брошенные состояния
+                record.updated_at = datetime.datetime.utcnow()
+            else:
+                session.add(FsmState(key=key, state=state, data=data))
+        
+        session.commit()
+        return True
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in save_fsm_records: {str(e)}")
+        return False
+    finally:
+        if session:
+            session.close()
+
+def delete_expired_fsm_records(older_than_seconds: int) -> int:
+    """Delete FSM records that have not been updated for the given time"""
+    session = None
+    try:
+        session = Session()
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=older_than_seconds)
+        deleted = session.query(FsmState).filter(
+            FsmState.updated_at < cutoff
+        ).delete(synchronize_session=False)
+        session.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in delete_expired_fsm_records: {str(e)}")
+        return 0
+    finally:
+        if session:
+            session.close()
+
+def add_cache_invalidations(entries: List[Tuple[str, Optional[str]]]) -> bool:
+    """Record cache resets ((cache_type, key) pairs) in one transaction so that other bot processes apply them too"""
+    session = None
+    try:
+        session = Session()
+        session.add_all([CacheInvalidation(cache_type=cache_type, key=key) for cache_type, key in entries])
+        session.commit()
+        return True
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in add_cache_invalidations: {str(e)}")
+        return False
+    finally:
+        if session:
+            session.close()
+
+def get_cache_invalidations(after_id: int, limit: int = 500) -> List[Dict[str, Any]]:
+    """Get cache resets recorded after the given id, oldest first"""
+    session = None
+    try:
+        session = Session()
+        rows = session.query(CacheInvalidation).filter(
+            CacheInvalidation.id > after_id
+        ).order_by(CacheInvalidation.id).limit(limit).all()
+        return [{"id": row.id, "cache_type": row.cache_type, "key": row.key} for row in rows]
+    except SQLAlchemyError as e:
+        print(f"Database error in get_cache_invalidations: {str(e)}")
+        return []
+    finally:
+        if session:
+            session.close()
+
+def get_last_cache_invalidation_id() -> int:
+    """Get the id of the most recent cache reset"""
+    session = None
+    try:
+        session = Session()
+        return session.query(func.max(CacheInvalidation.id)).scalar() or 0
+    except SQLAlchemyError as e:
+        print(f"Database error in get_last_cache_invalidation_id: {str(e)}")
+        return 0
+    finally:
+        if session:
+            session.close()
+
+def prune_cache_invalidations(older_than_seconds: int = 3600) -> int:
+    """Delete cache resets that every process has long since applied"""
+    session = None
+    try:
+        session = Session()
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=older_than_seconds)
+        deleted = session.query(CacheInvalidation).filter(
+            CacheInvalidation.created_at < cutoff
+        ).delete(synchronize_session=False)
+        session.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in prune_cache_invalidations: {str(e)}")
+        return 0
+    finally:
+        if session:
+            session.close()
+
+def save_admin_dashboard(admin_id: Union[int, str], chat_id: Union[int, str], message_id: int, view: str = "queue") -> Dict[str, Any]:
+    """
+    Save the live dashboard message of an admin, replacing the previous one.
+    
+    Returns the replaced dashboard ({"chat_id", "message_id", "view"}) or an empty dict.
+    """
+    session = None
+    try:
+        session = Session()
+        admin_id = str(admin_id)
+        
+        dashboard = session.get(AdminDashboard, admin_id)
+        previous = {}
+        if dashboard:
+            previous = {"chat_id": dashboard.chat_id, "message_id": dashboard.message_id, "view": dashboard.view}
+        else:
+            dashboard = AdminDashboard(admin_id=admin_id)
+            session.add(dashboard)
+        
+        dashboard.chat_id = str(chat_id)
+        dashboard.message_id = message_id
+        dashboard.view = view
+        dashboard.created_at = datetime.datetime.utcnow()
+        
+        session.commit()
+        return previous
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in save_admin_dashboard: {str(e)}")
+        return {}
+    finally:
+        if session:
+            session.close()
+
+def remove_admin_dashboard(admin_id: Union[int, str], message_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Remove the live dashboard of an admin (only if it is message_id, when given).
+    
+    Returns the removed dashboard ({"chat_id", "message_id", "view"}) or an empty dict.
+    """
+    session = None
+    try:
+        session = Session()
+        
+        dashboard = session.get(AdminDashboard, str(admin_id))
+        if not dashboard or (message_id is not None and dashboard.message_id != message_id):
+            return {}
+        
+        removed = {"chat_id": dashboard.chat_id, "message_id": dashboard.message_id, "view": dashboard.view}
+        session.delete(dashboard)
+        session.commit()
+        return removed
+    except SQLAlchemyError as e:
+        if session:
+            session.rollback()
+        print(f"Database error in remove_admin_dashboard: {str(e)}")
+        return {}
+    finally:
+        if session:
+            session.close()
+
+def get_admin_dashboards() -> List[Dict[str, Any]]:
+    """Get all live dashboards of admins"""
+    session = None
+    try:
+        session = Session()
+        return [
+            {
+                "admin_id": dashboard.admin_id,
+                "chat_id": dashboard.chat_id,
+                "message_id": dashboard.message_id,
+                "view": dashboard.view
+            }
+            for dashboard in session.query(AdminDashboard).all()
+        ]
+    except SQLAlchemyError as e:
+        print(f"Database error in get_admin_dashboards: {str(e)}")
+        return []
+    finally:
+        if session:
+            session.close()
+
 # Функция для инициализации хранилища
 def initialize_db_storage():
     """Initialize the database storage if needed"""
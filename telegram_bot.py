@@ -2,23 +2,219 @@
 import asyncio
 import logging
 import os
+import secrets
 import time
+from typing import List, Optional
+
+from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from handlers.menu import register_menu_handlers
 from handlers.numbers import register_numbers_handlers
 from handlers.info import register_info_handlers
 from handlers.admin import register_admin_handlers
-from storage_db import initialize_db_storage
+from middlewares import (
+    HandlerMetricsMiddleware,
+    StaleCallbackMiddleware,
+    ThrottlingMiddleware,
+    UpdateMetricsMiddleware,
+    UserContextMiddleware
+)
+from metrics import TelegramRequestMetrics
+from stats import refresh_stats_snapshot, run_stats_refresher
+from outbox import run_outbox_dispatcher
+from health import run_health_probes
+from dashboard import run_dashboard_refresher
+from scheduler import ScheduledDispatcher
+from storage_db import initialize_db_storage, warm_up_cache, build_number_filter
+from cache import save_snapshot
+from cache_sync import enable_cache_sync, flush_invalidations, run_cache_sync
+from cluster import BOT_WORKERS, is_primary_worker
+from fsm_storage import DatabaseStorage
 
 # Настраиваем логирование
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Файл снимка кэша (необязательно): загружается при старте и записывается при остановке
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH")
+CACHE_SNAPSHOT_MAX_AGE = float(os.getenv("CACHE_SNAPSHOT_MAX_AGE", "600"))
+
+# Способ получения обновлений: "polling" (по умолчанию) или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+
+# Настройки webhook
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL")  # Публичный адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "5000"))
+
+# Хранилище состояний FSM: "database" (переживает перезапуск, обязательно при нескольких
+# процессах) или "memory"
+FSM_STORAGE = os.getenv("FSM_STORAGE", "database").lower()
+
+# Адрес Bot API (например, локальный сервер Bot API или заглушка для нагрузочных тестов)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Фоновые задачи, запущенные при старте бота
+_background_tasks: List[asyncio.Task] = []
+
+def create_bot(token: str) -> Bot:
+    """Create the bot, optionally pointed at a custom Bot API server"""
+    session = None
+    if TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    bot = Bot(token=token, session=session)
+    
+    # Длительность и ошибки запросов к Bot API для /metrics
+    bot.session.middleware(TelegramRequestMetrics())
+    return bot
+
+def create_dispatcher() -> Dispatcher:
+    """Create the dispatcher with middlewares, handlers and lifecycle hooks"""
+    storage = DatabaseStorage() if FSM_STORAGE == "database" else MemoryStorage()
+    dp = ScheduledDispatcher(storage=storage)
+    
+    # Метрики: количество обновлений и время работы обработчиков
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    dp.inline_query.middleware(HandlerMetricsMiddleware())
+    
+    # Ограничение частоты проверяется до поиска обработчика и запросов к базе
+    throttling = ThrottlingMiddleware()
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
+    
+    # Устаревшие и испорченные кнопки отклоняются до запроса контекста пользователя
+    dp.callback_query.outer_middleware(StaleCallbackMiddleware())
+    
+    # Контекст пользователя вычисляется один раз на обновление
+    dp.message.middleware(UserContextMiddleware())
+    dp.callback_query.middleware(UserContextMiddleware())
+    
+    # Register handlers
+    register_menu_handlers(dp)
+    register_numbers_handlers(dp)
+    register_info_handlers(dp)
+    register_admin_handlers(dp)
+    
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    
+    return dp
+
+def prepare_storage():
+    """Initialize the database and warm up caches before updates are accepted"""
+    # Initialize database first
+    initialize_db_storage()
+    
+    # Несколько процессов сообщают друг другу о сбросах кэша через базу данных
+    if BOT_WORKERS > 1:
+        enable_cache_sync()
+    
+    # Прогреваем кэш до начала приема обновлений
+    sources = warm_up_cache(CACHE_SNAPSHOT_PATH, CACHE_SNAPSHOT_MAX_AGE)
+    logging.info(f"Кэш прогрет: {sources}")
+    
+    # Фильтр номеров избавляет от проверки дубликатов в базе при добавлении новых номеров
+    logging.info(f"Фильтр номеров построен: {build_number_filter()} номеров")
+    
+    # Первый снимок статистики строится до начала приема обновлений
+    refresh_stats_snapshot()
+
+async def on_startup(bot: Bot, dispatcher: Dispatcher):
+    """Dispatcher startup hook: bot commands, webhook and background tasks"""
+    # Set bot commands
+    await bot.set_my_commands([
+        BotCommand(command="start", description="Главное меню"),
+        BotCommand(command="info", description="Полезная информация"),
+        BotCommand(command="work", description="Панель админа")
+    ])
+    
+    # При нескольких процессах webhook устанавливает только первый из них
+    if BOT_MODE == "webhook" and WEBHOOK_BASE_URL and is_primary_worker():
+        await bot.set_webhook(
+            url=f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+            max_connections=WEBHOOK_MAX_CONNECTIONS
+        )
+        logging.info(f"Webhook установлен на {WEBHOOK_BASE_URL}{WEBHOOK_PATH}")
+    
+    _background_tasks.append(asyncio.create_task(run_stats_refresher()))
+    _background_tasks.append(asyncio.create_task(run_outbox_dispatcher(bot)))
+    _background_tasks.append(asyncio.create_task(run_health_probes(bot)))
+    # Панели администраторов обновляет один процесс, чтобы не редактировать их дважды
+    if is_primary_worker():
+        _background_tasks.append(asyncio.create_task(run_dashboard_refresher(bot)))
+    if BOT_WORKERS > 1:
+        _background_tasks.append(asyncio.create_task(run_cache_sync()))
+
+async def on_shutdown(bot: Bot, dispatcher: Dispatcher):
+    """Dispatcher shutdown hook: stop background tasks, flush FSM states and persist the cache"""
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    
+    # Сбросы кэша, которые фоновая задача не успела записать в журнал
+    if BOT_WORKERS > 1:
+        await asyncio.to_thread(flush_invalidations)
+    
+    # Несохраненные изменения состояний FSM записываются в базу
+    await dispatcher.storage.close()
+    
+    # Сохраняем снимок кэша для быстрого старта после перезапуска
+    if CACHE_SNAPSHOT_PATH and save_snapshot(CACHE_SNAPSHOT_PATH):
+        logging.info(f"Снимок кэша сохранен в {CACHE_SNAPSHOT_PATH}")
+
+def setup_webhook(app: web.Application, dp: Dispatcher, bot: Bot):
+    """
+    Attach webhook ingestion to an aiohttp application.
+    
+    Updates are acknowledged right away and processed in background tasks,
+    so a slow handler never holds up Telegram's request.
+    """
+    global WEBHOOK_SECRET
+    if not WEBHOOK_SECRET:
+        # Без секрета любой мог бы слать нам поддельные обновления
+        WEBHOOK_SECRET = secrets.token_urlsafe(32)
+        logging.warning("WEBHOOK_SECRET не задан, сгенерирован случайный секрет")
+    
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=WEBHOOK_SECRET,
+        handle_in_background=True
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+async def run_webhook(dp: Dispatcher, bot: Bot, app: Optional[web.Application] = None):
+    """Serve webhook updates on aiohttp in the current event loop"""
+    app = app or web.Application()
+    setup_webhook(app, dp, bot)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBAPP_HOST, port=WEBAPP_PORT)
+    await site.start()
+    logging.info(f"Прием webhook на {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+    
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
 async def main():
     """Main function to start the bot"""
     API_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -26,40 +222,28 @@ async def main():
     if not API_TOKEN:
         logging.error("TELEGRAM_BOT_TOKEN environment variable is not set")
         return
-
+    
     start_time = time.time()
     logging.info("Запуск Telegram бота Narkoz Team...")
     
     try:
-        # Initialize database first
-        initialize_db_storage()
+        prepare_storage()
         
         # Initialize bot and dispatcher
-        bot = Bot(token=API_TOKEN)
-        storage = MemoryStorage()
-        dp = Dispatcher(storage=storage)
-        
-        # Register handlers
-        register_menu_handlers(dp)
-        register_numbers_handlers(dp)
-        register_info_handlers(dp)
-        register_admin_handlers(dp)
-        
-        # Set bot commands
-        await bot.set_my_commands([
-            BotCommand(command="start", description="Главное меню"),
-            BotCommand(command="info", description="Полезная информация"),
-            BotCommand(command="work", description="Панель админа")
-        ])
+        bot = create_bot(API_TOKEN)
+        dp = create_dispatcher()
         
         init_time = time.time() - start_time
-        logging.info(f"Бот запущен! Время инициализации: {init_time:.2f} сек.")
+        logging.info(f"Бот запущен! Время инициализации: {init_time:.2f} сек. Режим: {BOT_MODE}")
         
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
     except Exception as e:
         logging.error(f"Ошибка при инициализации бота: {e}")
         raise
-    
+
 def run_bot():
     """Function to start the bot from external modules"""
     try:
@@ -72,4 +256,4 @@ def run_bot():
         print(f"Произошла ошибка: {e}")
 
 if __name__ == "__main__":
-    run_bot()
\ No newline at end of file
+    run_bot()
@@ -0,0 +1,149 @@
+"""
+Реестр готовых клавиатур и шаблонов сообщений.
+
+Статические клавиатуры (главное меню, меню номеров, кнопки «Назад» и т.д.)
+раньше собирались заново на каждое обновление: каждая кнопка - это модель
+pydantic с валидацией, и сборка клавиатуры из 5-7 кнопок занимает десятки
+микросекунд. Теперь такие клавиатуры собираются один раз при импорте
+модуля и хранятся в реестре как неизменяемые объекты FrozenKeyboard,
+а их JSON-отпечаток вычисляется один раз (его использует navigation.py).
+
+Длинные тексты сообщений регистрируются как MessageTemplate: при
+регистрации текст делится на куски постоянного текста и поля, а при
+отправке куски склеиваются с отформатированными значениями полей (время,
+счетчики), без повторного разбора шаблона, как у str.format. Текст без
+полей возвращается как есть.
+"""
+from string import Formatter
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from pydantic import ConfigDict, PrivateAttr
+
+
+class FrozenKeyboard(InlineKeyboardMarkup):
+    """
+    Неизменяемая клавиатура: общий экземпляр для всех обновлений.
+
+    Присваивание полей запрещено, чтобы обработчик случайно не изменил
+    клавиатуру, которую используют другие обновления. Чтобы получить
+    изменяемую копию, используйте model_copy(deep=True).
+    """
+    model_config = ConfigDict(frozen=True)
+
+    _fingerprint: str = PrivateAttr(default="")
+
+    def model_post_init(self, __context) -> None:
+        super().model_post_init(__context)
+        self._fingerprint = self.model_dump_json(exclude_none=True)
+
+    @property
+    def fingerprint(self) -> str:
+        """JSON клавиатуры, вычисленный при создании"""
+        return self._fingerprint
+
+
+# Преобразования полей «{value!r}», как в str.format
+_CONVERSIONS = {"s": str, "r": repr, "a": ascii}
+
+
+class MessageTemplate:
+    """Текст сообщения, разобранный один раз; при отправке подставляются только поля"""
+
+    __slots__ = ("name", "text", "fields", "_segments", "_tail")
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        # Куски (постоянный текст, поле, преобразование, формат); текст после последнего поля - в _tail
+        segments: List[Tuple[str, str, Optional[str], str]] = []
+        literal = ""
+        for literal_text, field, format_spec, conversion in Formatter().parse(text):
+            literal += literal_text
+            if field is None:
+                continue
+            if not field.isidentifier():
+                raise ValueError(f"Шаблон {name}: поле {{{field}}} должно быть именем")
+            if "{" in format_spec:
+                raise ValueError(f"Шаблон {name}: вложенные поля в формате {{{field}}} не поддерживаются")
+            segments.append((literal, field, conversion, format_spec))
+            literal = ""
+        self._segments = tuple(segments)
+        self._tail = literal
+        self.fields: FrozenSet[str] = frozenset(field for _, field, _, _ in segments)
+
+    def render(self, **slots) -> str:
+        """
+        Склеивает заранее разобранные куски текста со значениями полей.
+
+        Args:
+            **slots: Значения всех полей шаблона
+
+        Returns:
+            Готовый текст сообщения
+
+        Raises:
+            KeyError: Не передано значение поля
+        """
+        if not self.fields:
+            return self.text
+        parts = []
+        for literal, field, conversion, format_spec in self._segments:
+            value = slots[field]
+            if conversion:
+                value = _CONVERSIONS[conversion](value)
+            parts.append(literal)
+            parts.append(format(value, format_spec))
+        parts.append(self._tail)
+        return "".join(parts)
+
+
+_keyboards: Dict[str, FrozenKeyboard] = {}
+_templates: Dict[str, MessageTemplate] = {}
+
+
+def register_keyboard(name: str, rows: List[List[InlineKeyboardButton]]) -> FrozenKeyboard:
+    """
+    Собирает клавиатуру и сохраняет ее в реестре.
+
+    Args:
+        name: Имя клавиатуры в реестре
+        rows: Ряды кнопок
+
+    Returns:
+        Собранная неизменяемая клавиатура
+    """
+    if name in _keyboards:
+        raise ValueError(f"Клавиатура {name} уже зарегистрирована")
+    keyboard = FrozenKeyboard(inline_keyboard=rows)
+    _keyboards[name] = keyboard
+    return keyboard
+
+
+def get_keyboard(name: str) -> FrozenKeyboard:
+    """Готовая клавиатура из реестра по имени"""
+    return _keyboards[name]
+
+
+def register_template(name: str, text: str) -> MessageTemplate:
+    """
+    Разбирает шаблон сообщения и сохраняет его в реестре.
+
+    Args:
+        name: Имя шаблона в реестре
+        text: Текст с полями в формате str.format, например "{moscow_time}"
+
+    Returns:
+        Шаблон сообщения
+    """
+    if name in _templates:
+        raise ValueError(f"Шаблон {name} уже зарегистрирован")
+    template = MessageTemplate(name, text)
+    _templates[name] = template
+    return template
+
+
+def get_template(name: str) -> MessageTemplate:
+    """Шаблон сообщения из реестра по имени"""
+    return _templates[name]
+
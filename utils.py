@@ -3,42 +3,35 @@ import os
 import datetime
 
 def format_phone_number(phone: str) -> str:
-    """Format a phone number for display"""
+    """Format a phone number in E.164 (+79991234567), see phones.normalize_phone"""
     if not phone:
         return ""
     
-    # Basic formatting, can be expanded to include country-specific formats
-    if phone.startswith('+'):
-        # Just return as is for now
-        return phone
+    from phones import normalize_phone
+    normalized = normalize_phone(phone)
+    if normalized:
+        return normalized
     
     # Add '+' if missing
-    return f"+{phone}"
+    return phone if phone.startswith('+') else f"+{phone}"
 
 def validate_phone_number(phone: str) -> bool:
     """
     Validate a phone number
     
-    Simple validation:
-    - Should start with '+'
-    - Should contain only digits after '+'
-    - Should be at least 10 digits long
+    The number is accepted in any common format ("+7 (999) 123-45-67", "8 999 1234567",
+    "0079991234567") if it normalizes to a valid E.164 number (8-15 digits). For countries
+    known to phones.COUNTRY_PREFIXES the national number length is checked as well.
     """
     if not phone or not isinstance(phone, str):
         return False
     
-    if not phone.startswith('+'):
-        return False
-    
-    # Check if everything after '+' is digit
-    if not phone[1:].isdigit():
-        return False
-    
-    # Check length (at least 10 digits after '+')
-    if len(phone[1:]) < 10:
-        return False
-    
-    return True
+    from phones import normalize_phone
+    return normalize_phone(phone) is not None
+
+def reverse_phone_digits(phone: str) -> str:
+    """Digits of a phone number in reverse order, used to search numbers by their last digits"""
+    return "".join(char for char in reversed(phone or "") if char.isdigit())
 
 def filter_waiting_numbers(numbers: Dict[str, str]) -> Dict[str, str]:
     """Filter numbers to get only those with 'waiting' status"""
@@ -52,6 +45,20 @@ def filter_rejected_numbers(numbers: Dict[str, str]) -> Dict[str, str]:
     """Filter numbers to get only those with 'rejected' status"""
     return {num: status for num, status in numbers.items() if status == "rejected"}
 
+# Коды статусов номера в базе данных (колонка phone_numbers.status).
+# Коды не меняются: новый статус получает следующий свободный код
+NUMBER_STATUS_CODES = {
+    "waiting": 0,
+    "processed": 1,
+    "rejected": 2,
+    "in_progress": 3,
+    "failed": 4,
+    "pending": 5,
+    "canceled": 6,
+    "expired": 7
+}
+NUMBER_STATUS_NAMES = {code: status for status, code in NUMBER_STATUS_CODES.items()}
+
 def get_status_emoji(status: str) -> str:
     """Return an appropriate emoji for a given status"""
     statuses = {
@@ -123,6 +130,16 @@ def format_date(timestamp: Optional[float] = None) -> str:
     # Форматируем дату с указанием часового пояса
     return date.strftime("%d.%m.%Y %H:%M:%S (MSK)")
 
+def format_duration(seconds: float) -> str:
+    """Format a duration as an approximate number of hours and minutes"""
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return "меньше минуты"
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"≈ {hours} ч {minutes:02d} мин"
+    return f"≈ {minutes} мин"
+
 # Функция для получения текущего времени в Москве
 def get_moscow_time() -> str:
     """Получить текущее время в Москве в форматированном виде"""
@@ -138,22 +155,26 @@ async def notify_user(bot, user_id: Union[int, str], message: str) -> bool:
     Returns:
         bool: True если успешно, False в противном случае
     """
-    try:
-        user_id = str(user_id)
-        # Добавляем текущее московское время к сообщению
-        moscow_time = get_moscow_time()
-        message_with_time = f"{message}\n\n_Время отправки: {moscow_time}_"
-        
-        await bot.send_message(
-            chat_id=user_id,
-            text=message_with_time,
-            parse_mode="Markdown"
-        )
+    from broadcast import get_broadcaster
+    
+    user_id = str(user_id)
+    # Добавляем текущее московское время к сообщению
+    moscow_time = get_moscow_time()
+    message_with_time = f"{message}\n\n_Время отправки: {moscow_time}_"
+    
+    # Отправка идет через общий ограничитель частоты с повторами
+    result = await get_broadcaster().send_message(
+        bot,
+        user_id,
+        message_with_time,
+        parse_mode="Markdown"
+    )
+    
+    if result.ok:
         print(f"Уведомление отправлено пользователю {user_id}")
-        return True
-    except Exception as e:
-        print(f"Ошибка при отправке уведомления: {e}")
-        return False
+    else:
+        print(f"Ошибка при отправке уведомления: {result.error}")
+    return result.ok
 
 async def notify_admins(bot, message: str) -> list:
     """
@@ -162,26 +183,27 @@ async def notify_admins(bot, message: str) -> list:
     Returns:
         list: Список ID администраторов, которым успешно было отправлено сообщение
     """
+    from broadcast import get_broadcaster
     from storage_db import get_admin_ids
     admin_ids = get_admin_ids()
     
+    # Добавляем текущее московское время к сообщению
+    moscow_time = get_moscow_time()
+    message_with_time = f"{message}\n\n_Время отправки: {moscow_time}_"
+    
+    # Рассылаем всем администраторам параллельно с учетом лимитов Telegram
+    report = await get_broadcaster().broadcast(
+        bot,
+        admin_ids,
+        message_with_time,
+        parse_mode="Markdown"
+    )
+    
+    for result in report.results:
+        if result.ok:
+            print(f"Уведомление отправлено администратору {result.chat_id}")
+        else:
+            print(f"Ошибка при отправке уведомления администратору {result.chat_id}: {result.error}")
+    
     # Список администраторов, которым успешно отправлено сообщение
-    notified_admins = []
-    
-    for admin_id in admin_ids:
-        try:
-            # Добавляем текущее московское время к сообщению
-            moscow_time = get_moscow_time()
-            message_with_time = f"{message}\n\n_Время отправки: {moscow_time}_"
-            
-            await bot.send_message(
-                chat_id=admin_id, 
-                text=message_with_time, 
-                parse_mode="Markdown"
-            )
-            notified_admins.append(admin_id)
-            print(f"Уведомление отправлено администратору {admin_id}")
-        except Exception as e:
-            print(f"Ошибка при отправке уведомления администратору {admin_id}: {str(e)}")
-    
-    return notified_admins
+    return report.delivered